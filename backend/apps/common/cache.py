@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def _viewer_state_key(user: AbstractUser) -> str:
+    return f'viewer-state:{user.id}'
+
+
+def get_viewer_state_changed(user: AbstractUser) -> datetime:
+    """Get time of the last change to user's favorites, cart or follows.
+
+    If the time is not known (e.g. cache entry was evicted), current time
+    is stored and returned, so nothing is ever considered unchanged by
+    mistake.
+
+    Args:
+        user (AbstractUser): Viewing user.
+
+    Returns:
+        datetime: Time of the last change.
+    """
+    return cache.get_or_set(
+        _viewer_state_key(user),
+        timezone.now,
+        timeout=None,
+    )
+
+
+def touch_viewer_state(user: AbstractUser) -> None:
+    """Mark user's favorites, cart or follows as changed.
+
+    Args:
+        user (AbstractUser): User whose lists were changed.
+    """
+    cache.set(_viewer_state_key(user), timezone.now(), timeout=None)
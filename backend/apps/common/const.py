@@ -7,3 +7,34 @@ MAX_SLUG_LENGTH = 32
 MAX_URL_LENGTH = 200
 
 BOOLEAN_NUMBER_CHOICES = [[0, 0], [1, 1]]
+
+# Uploaded images with more pixels are rejected before being decoded
+MAX_IMAGE_PIXELS = 40_000_000
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Base64 is decoded by chunks of this many characters (multiple of 4)
+BASE64_CHUNK_SIZE = 64 * 1024
+# Decoded images larger than this are spooled to disk
+IMAGE_SPOOL_SIZE = 1024 * 1024
+
+# Widths of responsive image variants, never wider than the original
+IMAGE_VARIANT_WIDTHS = (160, 320, 640, 1280)
+IMAGE_VARIANT_QUALITY = 80
+# Where variants are rendered, see `IMAGE_VARIANTS_RENDERING` setting
+VARIANTS_RENDERING_COMMAND = 'command'
+VARIANTS_RENDERING_THREAD = 'thread'
+VARIANTS_RENDERING_INLINE = 'inline'
+# Background threads generating variants in every process
+IMAGE_VARIANT_WORKERS = 2
+# Seconds between checks of `generate_image_variants --watch`
+IMAGE_VARIANT_POLL_INTERVAL = 5
+
+# Content addressed files are stored under this directory of media root
+BLOB_DIRECTORY = 'blobs'
+# Seconds since the last save during which an unused blob is kept, so
+# rows referencing it can be committed
+BLOB_GRACE_PERIOD = 60 * 60
+
+# Defaults of `reencode_images` command
+IMAGE_REENCODE_QUALITY = 85
+IMAGE_REENCODE_MAX_DIMENSION = 2048
+IMAGE_REENCODE_BATCH_SIZE = 100
@@ -0,0 +1,177 @@
+"""Denormalized counters of related rows.
+
+A counter is a column which holds the number of rows of another model
+pointing to the row through a foreign key, e.g. number of favorites of a
+recipe. Counters are changed by `F()` updates in the same transaction as
+the counted rows are created or deleted, so counts are read without
+aggregation. Full saves of models with counters leave the counter
+columns out, see `CounterModelMixin`. Drift (e.g. after raw SQL changes)
+is repaired with `reconcile_counters` management command.
+"""
+
+from typing import NamedTuple, Optional
+
+from django.db.models import (
+    Count,
+    F,
+    IntegerField,
+    Model,
+    OuterRef,
+    QuerySet,
+    Subquery,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+
+
+class Counter(NamedTuple):
+    model: type[Model]
+    field: str
+    source: type[Model]
+    source_field: str
+
+    def __str__(self) -> str:
+        return f'{self.model._meta.label}.{self.field}'
+
+
+# Filled by the apps which own counted models
+COUNTERS: list[Counter] = []
+
+
+def change_counter(counter: Counter, pk: int, delta: int) -> None:
+    """Add delta to counter of a single row.
+
+    Args:
+        counter (Counter): Changed counter.
+        pk (int): Primary key of the counting row.
+        delta (int): Change of the count.
+    """
+    # Clamped, so a drifted counter fails no constraint but gets repaired
+    counter.model.objects.filter(pk=pk).update(
+        **{counter.field: Greatest(F(counter.field) + delta, 0)}
+    )
+
+
+class CounterModelMixin:
+    """Mixin for models with counter columns.
+
+    Counters are changed only by `F()` updates, so saving an instance
+    read before such an update would write the stale count back. Full
+    saves of existing rows update every field except counters instead.
+    """
+
+    def save(
+        self,
+        force_insert: bool = False,
+        force_update: bool = False,
+        using: Optional[str] = None,
+        update_fields: Optional[list[str]] = None,
+    ) -> None:
+        if (
+            update_fields is None
+            and not force_insert
+            and not self._state.adding
+            and self.pk is not None
+        ):
+            counters = {
+                counter.field
+                for counter in COUNTERS
+                if counter.model is self._meta.concrete_model
+            }
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in counters
+                and field.attname not in deferred
+            ]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+def register_counter(
+    model: type[Model],
+    field: str,
+    source: type[Model],
+    source_field: str,
+) -> Counter:
+    """Keep counter up to date with rows of source model.
+
+    Args:
+        model (type[Model]): Model with the counter column.
+        field (str): Name of the counter column.
+        source (type[Model]): Counted model.
+        source_field (str): Foreign key of source model to `model`.
+
+    Returns:
+        Counter: Registered counter.
+    """
+    counter = Counter(model, field, source, source_field)
+    COUNTERS.append(counter)
+    attname = source._meta.get_field(source_field).attname
+
+    def count_created(sender, instance: Model, created: bool, **kwargs):
+        if created:
+            change_counter(counter, getattr(instance, attname), 1)
+
+    def count_deleted(sender, instance: Model, **kwargs):
+        # Affects nothing if the counting row is deleted by the same cascade
+        change_counter(counter, getattr(instance, attname), -1)
+
+    post_save.connect(
+        count_created,
+        sender=source,
+        weak=False,
+        dispatch_uid=f'count-created:{counter}',
+    )
+    post_delete.connect(
+        count_deleted,
+        sender=source,
+        weak=False,
+        dispatch_uid=f'count-deleted:{counter}',
+    )
+    return counter
+
+
+def actual_count(counter: Counter) -> Coalesce:
+    """Build expression counting source rows of every counting row."""
+    return Coalesce(
+        Subquery(
+            counter.source.objects.filter(
+                **{counter.source_field: OuterRef('pk')}
+            )
+            .order_by()
+            .values(counter.source_field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def find_drift(counter: Counter) -> QuerySet:
+    """Find rows whose counter differs from the actual count.
+
+    Returns:
+        QuerySet: Rows annotated with `actual_count`.
+    """
+    return (
+        counter.model.objects.annotate(actual_count=actual_count(counter))
+        .exclude(**{counter.field: F('actual_count')})
+        .order_by('pk')
+    )
+
+
+def reconcile_counter(counter: Counter) -> int:
+    """Set counter of every drifted row to the actual count.
+
+    Returns:
+        int: Number of repaired rows.
+    """
+    drifted = list(find_drift(counter).values_list('pk', flat=True))
+    if not drifted:
+        return 0
+    return counter.model.objects.filter(pk__in=drifted).update(
+        **{counter.field: actual_count(counter)}
+    )
@@ -0,0 +1,60 @@
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.signals import post_delete
+
+from .storage import blob_storage
+
+
+class ContentAddressedImageFieldFile(ImageFieldFile):
+    def delete(self, save: bool = True) -> None:
+        """Detach the file and release it once the row is saved.
+
+        The file is deleted only if no other row references it. With
+        `save=False` the file is kept.
+        """
+        if not self:
+            return
+        name = self.name
+        if hasattr(self, '_dimensions_cache'):
+            del self._dimensions_cache
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        if save:
+            self.instance.save(update_fields=[self.field.attname])
+            # The row no longer references the file, others may do
+            self.storage.delete(name)
+
+
+class ContentAddressedImageField(models.ImageField):
+    """Image field stored in content addressed storage by default.
+
+    See `common.storage`. Files are released when they are replaced
+    through `delete()` or when the row is deleted.
+    """
+
+    attr_class = ContentAddressedImageFieldFile
+
+    def __init__(self, *args, **kwargs) -> None:
+        kwargs.setdefault('storage', blob_storage)
+        # References are looked up by name before deleting a file
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    def contribute_to_class(self, cls, name, **kwargs) -> None:
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_delete.connect(
+                self._release,
+                sender=cls,
+                weak=False,
+                dispatch_uid=f'release-file:{cls._meta.label}.{name}',
+            )
+
+    def _release(self, sender, instance: models.Model, **kwargs) -> None:
+        file = getattr(instance, self.attname)
+        if file:
+            file.storage.delete(file.name)
@@ -0,0 +1,110 @@
+"""Cheap validation of uploaded images.
+
+Images are checked by header only: Pillow reads format and dimensions
+without decoding pixels, so oversized or decompression bomb images are
+rejected before any memory is spent on them.
+"""
+
+import binascii
+import re
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+from typing import IO, NamedTuple
+
+from PIL import Image, UnidentifiedImageError
+from rest_framework.serializers import ValidationError
+
+from .const import (
+    BASE64_CHUNK_SIZE,
+    IMAGE_FORMATS,
+    IMAGE_SPOOL_SIZE,
+    MAX_IMAGE_PIXELS,
+)
+
+WHITESPACE = re.compile(r'\s+')
+INVALID_BASE64 = 'Некорректные данные Base64.'
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+
+
+def check_image_size(size: int, max_size: int) -> None:
+    """Reject image larger than max_size bytes."""
+    if size > max_size:
+        raise ValidationError(
+            f'Размер изображения превышает {max_size // 1024} КБ.'
+        )
+
+
+def probe_image(file: IO[bytes]) -> ImageInfo:
+    """Read format and dimensions of image from its header.
+
+    Args:
+        file (IO[bytes]): Seekable image file, rewound afterwards.
+
+    Raises:
+        ValidationError: The file is not an image of allowed format or has
+            too many pixels.
+
+    Returns:
+        ImageInfo: Image format and dimensions.
+    """
+    file.seek(0)
+    try:
+        # Only the header is read until pixels are accessed
+        with Image.open(file, formats=IMAGE_FORMATS) as image:
+            info = ImageInfo(image.format, *image.size)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValidationError(
+            'Загрузите корректное изображение '
+            f'({", ".join(IMAGE_FORMATS)}).'
+        )
+    finally:
+        file.seek(0)
+    if info.width * info.height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f'Изображение {info.width}x{info.height} слишком большое.'
+        )
+    return info
+
+
+def decode_base64(data: str, max_size: int) -> SpooledTemporaryFile:
+    """Decode Base64 by chunks into a spooled temporary file.
+
+    Args:
+        data (str): Base64 encoded content.
+        max_size (int): Max size of decoded content in bytes.
+
+    Raises:
+        ValidationError: Content is not valid Base64 or is too large.
+
+    Returns:
+        SpooledTemporaryFile: Decoded content, kept in memory while small.
+    """
+    file = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+    size = 0
+    leftover = ''
+    try:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            chunk = leftover + WHITESPACE.sub(
+                '', data[start : start + BASE64_CHUNK_SIZE]
+            )
+            complete = len(chunk) - len(chunk) % 4
+            leftover = chunk[complete:]
+            try:
+                decoded = b64decode(chunk[:complete], validate=True)
+            except (binascii.Error, ValueError):
+                raise ValidationError(INVALID_BASE64)
+            size += len(decoded)
+            check_image_size(size, max_size)
+            file.write(decoded)
+        if leftover or not size:
+            raise ValidationError(INVALID_BASE64)
+    except ValidationError:
+        file.close()
+        raise
+    file.seek(0)
+    return file
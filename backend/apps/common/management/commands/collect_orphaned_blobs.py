@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.const import BLOB_GRACE_PERIOD
+from common.storage import blob_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Удалить загруженные файлы, на которые не ссылается ни одна '
+        'запись, вместе с их вариантами.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=BLOB_GRACE_PERIOD,
+            help='Файлы, сохранённые за это количество секунд, не '
+            'удаляются: ссылающиеся на них записи могут быть ещё не '
+            'сохранены.',
+        )
+
+    def handle(self, *args, grace: int, **options) -> None:
+        if grace < 0:
+            raise CommandError('Значение grace не может быть меньше 0')
+        saved_before = time.time() - grace
+        deleted = sum(
+            blob_storage.collect(name, saved_before)
+            for name in list(blob_storage.blob_names())
+        )
+        self.stdout.write(f'Удалено файлов: {deleted}')
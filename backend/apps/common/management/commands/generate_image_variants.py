@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common.const import IMAGE_VARIANT_POLL_INTERVAL
+from common.variants import (
+    generate_variants,
+    outdated_rows,
+    VARIANT_FIELDS,
+    VariantField,
+)
+
+
+class Command(BaseCommand):
+    help = 'Создать недостающие варианты загруженных изображений.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='regenerate_all',
+            help='Пересоздать варианты всех изображений, например после '
+            'изменения размеров.',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Не завершаться и создавать варианты новых изображений, '
+            'как только они загружены.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=IMAGE_VARIANT_POLL_INTERVAL,
+            help='Секунды между проверками в режиме --watch.',
+        )
+
+    def handle(
+        self,
+        *args,
+        regenerate_all: bool,
+        watch: bool,
+        interval: float,
+        **options,
+    ) -> None:
+        while True:
+            for variant_field in VARIANT_FIELDS:
+                generated = self._generate(variant_field, regenerate_all)
+                if generated or not watch:
+                    self.stdout.write(
+                        f'{variant_field}: обработано записей: {generated}'
+                    )
+            if not watch:
+                return
+            regenerate_all = False
+            # Database may have been restarted while waiting
+            close_old_connections()
+            time.sleep(interval)
+
+    def _generate(
+        self, variant_field: VariantField, regenerate_all: bool
+    ) -> int:
+        model = variant_field.model
+        rows = (
+            model.objects.all()
+            if regenerate_all
+            else outdated_rows(variant_field)
+        )
+        generated = 0
+        for pk in rows.values_list('pk', flat=True).order_by('pk').iterator():
+            generated += generate_variants(variant_field, pk)
+        return generated
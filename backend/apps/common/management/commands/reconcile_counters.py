@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.counters import COUNTERS, find_drift, reconcile_counter
+
+# Max number of drifted rows printed per counter
+MAX_REPORTED_DRIFTS = 20
+
+
+class Command(BaseCommand):
+    help = 'Проверить и исправить денормализованные счётчики.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не изменяя.',
+        )
+
+    def handle(self, *args, check: bool, **options) -> None:
+        if not check:
+            for counter in COUNTERS:
+                count = reconcile_counter(counter)
+                self.stdout.write(f'{counter}: исправлено записей: {count}')
+
+        total = 0
+        for counter in COUNTERS:
+            drifted = list(
+                find_drift(counter).values_list(
+                    'pk', counter.field, 'actual_count'
+                )
+            )
+            total += len(drifted)
+            for pk, stored, actual in drifted[:MAX_REPORTED_DRIFTS]:
+                self.stdout.write(
+                    f'{counter}, запись {pk}: '
+                    f'ожидалось {actual}, сохранено {stored}'
+                )
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        raise CommandError(f'Найдено расхождений: {total}')
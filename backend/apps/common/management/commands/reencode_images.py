@@ -0,0 +1,225 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import features, Image, UnidentifiedImageError
+
+from common.const import (
+    IMAGE_REENCODE_BATCH_SIZE,
+    IMAGE_REENCODE_MAX_DIMENSION,
+    IMAGE_REENCODE_QUALITY,
+)
+from common.reencode import (
+    EncodeOptions,
+    reencode_file,
+    replace_file,
+)
+from common.variants import (
+    FORMAT_EXTENSIONS,
+    VARIANT_FIELDS,
+    VariantField,
+    WEBP,
+)
+
+
+def _format_size(size: int) -> str:
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+class Totals:
+    def __init__(self) -> None:
+        self.files = 0
+        self.replaced = 0
+        self.skipped = 0
+        self.failed = 0
+        self.size = 0
+        self.new_size = 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Перекодировать загруженные изображения рецептов и аватары: '
+        'удалить метаданные, уменьшить слишком большие изображения и '
+        'сохранить в заданном формате, если файл становится меньше.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--format',
+            default='JPEG',
+            type=str.upper,
+            choices=sorted(FORMAT_EXTENSIONS),
+            help='Формат перекодированных изображений. Изображения с '
+            'прозрачностью сохраняются в PNG вместо JPEG.',
+        )
+        parser.add_argument(
+            '--quality', type=int, default=IMAGE_REENCODE_QUALITY
+        )
+        parser.add_argument(
+            '--max-dimension',
+            type=int,
+            default=IMAGE_REENCODE_MAX_DIMENSION,
+            help='Изображения больше по ширине или высоте уменьшаются.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Количество процессов, перекодирующих изображения.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMAGE_REENCODE_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл, в котором сохраняется прогресс. Прерванная '
+            'обработка продолжается с места остановки.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Начать обработку заново, не читая контрольную точку.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только оценить экономию, ничего не изменяя.',
+        )
+
+    def handle(
+        self,
+        *args,
+        format: str,
+        quality: int,
+        max_dimension: int,
+        workers: int,
+        batch_size: int,
+        checkpoint: Optional[str],
+        reset: bool,
+        dry_run: bool,
+        **options,
+    ) -> None:
+        for name, value in (
+            ('quality', quality),
+            ('max_dimension', max_dimension),
+            ('workers', workers),
+            ('batch_size', batch_size),
+        ):
+            if value < 1:
+                raise CommandError(f'Значение {name} должно быть больше 0')
+        if format == WEBP and not features.check(WEBP.lower()):
+            raise CommandError(f'Формат {format} не поддерживается Pillow')
+        encode_options = EncodeOptions(format, quality, max_dimension)
+
+        self.checkpoint = checkpoint
+        self.progress = {'options': encode_options._asdict(), 'fields': {}}
+        if checkpoint and not reset and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                progress = json.load(file)
+            if progress['options'] != self.progress['options']:
+                raise CommandError(
+                    'Контрольная точка создана с другими параметрами, '
+                    'используйте --reset.'
+                )
+            self.progress = progress
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for variant_field in VARIANT_FIELDS:
+                totals = self._reencode_field(
+                    variant_field,
+                    encode_options,
+                    executor,
+                    batch_size,
+                    dry_run,
+                )
+                self._report(variant_field, totals, dry_run)
+
+    def _save_progress(self, variant_field: VariantField, pk: int) -> None:
+        self.progress['fields'][str(variant_field)] = pk
+        if not self.checkpoint:
+            return
+        # Replaced at once, so an interrupted write keeps the old progress
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.progress, file)
+        os.replace(temporary, self.checkpoint)
+
+    def _reencode_field(
+        self,
+        variant_field: VariantField,
+        encode_options: EncodeOptions,
+        executor: ProcessPoolExecutor,
+        batch_size: int,
+        dry_run: bool,
+    ) -> Totals:
+        model, field, _ = variant_field
+        storage = model._meta.get_field(field).storage
+        last_pk = self.progress['fields'].get(str(variant_field), 0)
+        totals = Totals()
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .exclude(**{field: ''})
+                .order_by('pk')
+                .values_list('pk', field)[:batch_size]
+            )
+            if not rows:
+                return totals
+            # Files shared by rows are re-encoded once
+            pks_by_name = defaultdict(list)
+            for pk, name in rows:
+                pks_by_name[name].append(pk)
+            futures = {
+                name: executor.submit(
+                    reencode_file, storage.path(name), encode_options
+                )
+                for name in pks_by_name
+            }
+            for name, future in futures.items():
+                totals.files += 1
+                try:
+                    reencoded = future.result()
+                except (
+                    OSError,
+                    UnidentifiedImageError,
+                    Image.DecompressionBombError,
+                ) as error:
+                    totals.failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                totals.size += reencoded.size
+                if reencoded.content is None:
+                    totals.skipped += 1
+                    totals.new_size += reencoded.size
+                    continue
+                totals.replaced += 1
+                totals.new_size += len(reencoded.content)
+                if not dry_run:
+                    replace_file(
+                        variant_field,
+                        pks_by_name[name],
+                        name,
+                        reencoded,
+                        storage,
+                    )
+            last_pk = rows[-1][0]
+            if not dry_run:
+                self._save_progress(variant_field, last_pk)
+
+    def _report(
+        self, variant_field: VariantField, totals: Totals, dry_run: bool
+    ) -> None:
+        saved = totals.size - totals.new_size
+        percent = saved / totals.size * 100 if totals.size else 0
+        replaced = 'будет заменено' if dry_run else 'заменено'
+        self.stdout.write(
+            f'{variant_field}: файлов: {totals.files}, {replaced}: '
+            f'{totals.replaced}, без изменений: {totals.skipped}, '
+            f'ошибок: {totals.failed}, '
+            f'{_format_size(totals.size)} -> '
+            f'{_format_size(totals.new_size)} '
+            f'(экономия {_format_size(saved)}, {percent:.0f}%)'
+        )
@@ -1,5 +1,196 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+from typing import NamedTuple, Optional
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Model, Q, QuerySet
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import View
+
+
+class KeysetCursor(NamedTuple):
+    # Whether the page precedes the position instead of following it
+    reverse: bool
+    # Values of ordering fields of the row the page is adjacent to
+    position: list
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'limit'
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Keyset pagination by the whole ordering tuple.
+
+    DRF cursor pagination seeks by the first ordering field only and skips
+    rows sharing its value with OFFSET. Here the opaque cursor holds values
+    of every ordering field of the boundary row, e.g. (pub_date, id), so
+    every page is a single index range whatever the ties. Ordering fields
+    must be model fields or annotations of the queryset whose values
+    survive a round trip through `str()` (e.g. floats), and the last one
+    must be unique.
+    """
 
-class PageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Request,
+        view: View = None,
+    ) -> Optional[list]:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.cursor is not None and self.cursor.reverse:
+            ordering = tuple(_reverse_ordering(name) for name in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                _seek(queryset, ordering, self.cursor.position)
+            )
+        rows = list(queryset[: self.page_size + 1])
+        self.page = rows[: self.page_size]
+        has_more = len(rows) > self.page_size
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(
+            KeysetCursor(False, self._position(self.page[-1]))
+        )
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(
+            KeysetCursor(True, self._position(self.page[0]))
+        )
+
+    def _position(self, row: Model) -> list:
+        position = []
+        for name in self.ordering:
+            name = name.lstrip('-')
+            try:
+                field = row._meta.get_field(name)
+            except FieldDoesNotExist:
+                # Annotation
+                position.append(str(getattr(row, name)))
+            else:
+                position.append(field.value_to_string(row))
+        return position
+
+    def encode_cursor(self, cursor: KeysetCursor) -> str:
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def decode_cursor(self, request: Request) -> Optional[KeysetCursor]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, position = json.loads(urlsafe_b64decode(encoded))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        # Positions are built of field values serialized to strings
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+            or not all(isinstance(value, str) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return KeysetCursor(bool(reverse), position)
+
+
+def _reverse_ordering(name: str) -> str:
+    return name[1:] if name.startswith('-') else f'-{name}'
+
+
+def _seek(queryset: QuerySet, ordering: tuple[str, ...], position: list) -> Q:
+    """Build condition selecting rows after position in ordering.
+
+    For ('-pub_date', '-id') it is
+    `pub_date < p OR (pub_date = p AND id < i)`.
+    """
+    conditions = []
+    equal = {}
+    for name, value in zip(ordering, position):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        name = name.lstrip('-')
+        if name in queryset.query.annotations:
+            field = queryset.query.annotations[name].output_field
+        else:
+            field = queryset.model._meta.get_field(name)
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(CursorPagination.invalid_cursor_message)
+        conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+        equal[name] = value
+    return reduce(or_, conditions)
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """Page number pagination with opt-in cursor (keyset) mode.
+
+    Cursor mode is enabled with `?pagination=cursor` on views which define
+    `cursor_ordering`, unless it is None for the request. It does not count
+    rows and seeks by the ordering values instead of using OFFSET, so deep
+    pages stay as fast as the first.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    cursor_paginator = None
+
+    def paginate_queryset(
+        self,
+        queryset,
+        request: Request,
+        view: View = None,
+    ) -> list:
+        ordering = getattr(view, 'cursor_ordering', None)
+        if (
+            ordering is None
+            or request.query_params.get(self.mode_query_param)
+            != self.cursor_mode
+        ):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = CursorPagination()
+        self.cursor_paginator.ordering = ordering
+        return self.cursor_paginator.paginate_queryset(
+            queryset,
+            request,
+            view,
+        )
+
+    def get_paginated_response(self, data: list) -> Response:
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,131 @@
+"""Re-encoding of stored images to reclaim disk space and bandwidth.
+
+Images are decoded and encoded by worker processes, so the CPU-bound
+part runs in parallel and never in web workers. Rows are switched to
+the re-encoded file by a conditional update, so a row whose image was
+replaced meanwhile keeps the new image, and the old file is released
+once the update is committed.
+"""
+
+import os
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .variants import (
+    convert_for_format,
+    FORMAT_EXTENSIONS,
+    schedule_variants,
+    VariantField,
+)
+
+# Used instead of formats which can not store transparency
+TRANSPARENT_FORMAT = 'PNG'
+FORMATS_WITHOUT_ALPHA = ('JPEG',)
+
+
+class EncodeOptions(NamedTuple):
+    format: str
+    quality: int
+    max_dimension: int
+
+
+class Reencoded(NamedTuple):
+    # Size of the original file in bytes
+    size: int
+    # Re-encoded content, None if the image is kept as is
+    content: Optional[bytes]
+    format: Optional[str]
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def reencode_file(path: str, options: EncodeOptions) -> Reencoded:
+    """Re-encode image file without metadata.
+
+    Pixels are rotated by EXIF orientation and images larger than
+    `max_dimension` are downscaled. Runs in worker processes, so Django
+    is not used here.
+
+    Args:
+        path (str): Path of the image file.
+        options (EncodeOptions): Target format, quality and dimension.
+
+    Returns:
+        Reencoded: Re-encoded content, None if the image is animated or
+            would not get smaller.
+    """
+    size = os.path.getsize(path)
+    with Image.open(path) as image:
+        if getattr(image, 'is_animated', False):
+            return Reencoded(size, None, None)
+        limit = (options.max_dimension, options.max_dimension)
+        # JPEG is decoded at a reduced scale if it is much larger
+        image.draft('RGB', limit)
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > options.max_dimension:
+            image.thumbnail(limit, Image.LANCZOS)
+        format = options.format
+        if format in FORMATS_WITHOUT_ALPHA and _has_alpha(image):
+            format = TRANSPARENT_FORMAT
+        content = BytesIO()
+        convert_for_format(image, format).save(
+            content,
+            format,
+            quality=options.quality,
+            optimize=True,
+        )
+    if content.tell() >= size:
+        return Reencoded(size, None, None)
+    return Reencoded(size, content.getvalue(), format)
+
+
+def replace_file(
+    variant_field: VariantField,
+    pks: list[int],
+    name: str,
+    reencoded: Reencoded,
+    storage: Storage,
+) -> int:
+    """Store re-encoded image and switch rows still referencing the old one.
+
+    Variants of switched rows are rendered again and the old file is
+    deleted unless other rows still reference it.
+
+    Args:
+        variant_field (VariantField): Image field of the rows.
+        pks (list[int]): Primary keys of rows referencing the image.
+        name (str): Storage name of the original image.
+        reencoded (Reencoded): Result of `reencode_file`.
+        storage (Storage): Storage of the image field.
+
+    Returns:
+        int: Number of switched rows.
+    """
+    model, field, on_ready = variant_field
+    stem = os.path.splitext(os.path.basename(name))[0]
+    new_name = storage.save(
+        f'{stem}{FORMAT_EXTENSIONS[reencoded.format]}',
+        ContentFile(reencoded.content),
+    )
+    with transaction.atomic():
+        updated = model.objects.filter(pk__in=pks, **{field: name}).update(
+            **{field: new_name}
+        )
+        # Both are deleted only if no row references them
+        transaction.on_commit(lambda: storage.delete(name))
+        if not updated:
+            transaction.on_commit(lambda: storage.delete(new_name))
+        for pk in pks:
+            if on_ready is not None:
+                transaction.on_commit(lambda pk=pk: on_ready(pk))
+            schedule_variants(variant_field, pk)
+    return updated
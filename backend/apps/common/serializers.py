@@ -1,20 +1,124 @@
-import base64
+import json
+from io import SEEK_END
+from typing import Optional
 
-from django.core.files.base import ContentFile
-from rest_framework.serializers import ImageField
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework.serializers import (
+    Field,
+    FileField,
+    ImageField,
+    ValidationError,
+)
+from rest_framework.utils import html
 
+from .images import check_image_size, decode_base64, probe_image
 from .util import generate_token
+from .variants import current_variants, image_format
 
 
 class Base64ImageField(ImageField):
+    """Image given as Base64 data URI or uploaded file.
+
+    Base64 is decoded by chunks into a spooled temporary file and images
+    are validated by header only, instead of full Pillow verification.
+
+    Args:
+        max_size (Optional[int]): Max image size in bytes,
+            `MAX_IMAGE_UPLOAD_SIZE` setting if None.
+    """
+
+    def __init__(self, *args, max_size: Optional[int] = None, **kwargs):
+        self.max_size = max_size
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
+        max_size = self.max_size or settings.MAX_IMAGE_UPLOAD_SIZE
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(
-                base64.b64decode(imgstr),
-                name=f'{generate_token(16)}.{ext}',
+            return FileField.to_internal_value(
+                self, self._decode(data, max_size)
             )
+        # Full Pillow verification of ImageField is replaced by probing
+        file = FileField.to_internal_value(self, data)
+        check_image_size(file.size, max_size)
+        probe_image(file)
+        return file
+
+    @staticmethod
+    def _decode(data: str, max_size: int) -> UploadedFile:
+        _, _, encoded = data.partition(';base64,')
+        file = decode_base64(encoded, max_size)
+        size = file.seek(0, SEEK_END)
+        extension = probe_image(file).format.lower()
+        return UploadedFile(
+            file,
+            name=f'{generate_token(16)}.{extension}',
+            content_type=f'image/{extension}',
+            size=size,
+        )
+
+
+class MultiPartJSONMixin:
+    """Serializer mixin accepting multipart forms with a JSON part.
+
+    Nested fields (e.g. recipe ingredients) can not be sent as plain form
+    fields, so multipart requests send every non-file field as a JSON
+    object in `data` part, while files are sent as binary parts.
+    """
+
+    json_part = 'data'
 
+    def to_internal_value(self, data):
+        if html.is_html_input(data) and self.json_part in data:
+            try:
+                fields = json.loads(data[self.json_part])
+            except ValueError:
+                fields = None
+            if not isinstance(fields, dict):
+                raise ValidationError(
+                    {self.json_part: ['Ожидался JSON-объект.']}
+                )
+            data = fields | {
+                name: data[name] for name in data if name != self.json_part
+            }
         return super().to_internal_value(data)
+
+
+class ImageSrcsetField(Field):
+    """Srcset of responsive variants of image by format, see
+    `common.variants`.
+
+    Until variants are rendered, the original image is the only source.
+
+    Args:
+        image_field (str): Name of the image field of the model.
+    """
+
+    def __init__(self, image_field: str, **kwargs) -> None:
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def _url(self, name: str, storage) -> str:
+        url = storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, instance) -> dict[str, str]:
+        image = getattr(instance, self.image_field)
+        if not image:
+            return {}
+        variants = current_variants(
+            image, getattr(instance, f'{self.image_field}_variants')
+        )
+        if not variants:
+            format = (image_format(image.name) or 'image').lower()
+            return {format: self._url(image.name, image.storage)}
+        return {
+            format: ', '.join(
+                f'{self._url(name, image.storage)} {width}w'
+                for width, name in sizes
+            )
+            for format, sizes in variants.items()
+        }
@@ -0,0 +1,184 @@
+"""Content addressed media storage.
+
+Files are named by SHA-256 of their content, e.g.
+`blobs/ab/cd/abcd...ef.png`, so identical uploads are stored once and a
+name never changes its content, which lets the web server cache files
+forever. A blob is shared by every row referencing it, so it is deleted
+only when no file field of this storage references it any more.
+
+An upload of content which is already stored only refreshes modification
+time of the blob, and the row referencing it may be committed later. So
+blobs saved within `BLOB_GRACE_PERIOD` are never deleted, and the check
+and the deletion run under a lock held by uploads as well. Blobs skipped
+this way are deleted by `collect_orphaned_blobs` command.
+
+Files derived from a blob (e.g. image variants) are stored next to it in
+`variants/` directory under names starting with its hash and are deleted
+together with the blob.
+"""
+
+import fcntl
+import hashlib
+import os
+import re
+import time
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+from typing import Iterator
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField, Model
+
+from .const import BLOB_DIRECTORY, BLOB_GRACE_PERIOD
+
+VARIANTS_DIRECTORY = 'variants'
+LOCK_NAME = f'{BLOB_DIRECTORY}/.lock'
+BLOB_FILENAME_REGEX = re.compile(r'[0-9a-f]{64}(\.\w+)?')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def _is_blob_path(self, name: str) -> bool:
+        return name.startswith(f'{BLOB_DIRECTORY}/')
+
+    def _is_derived(self, name: str) -> bool:
+        return f'/{VARIANTS_DIRECTORY}/' in name
+
+    def save(self, name, content, max_length=None) -> str:
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if self._is_blob_path(name):
+            # Derived from a blob, so the same name means the same content
+            if self._is_derived(name) and self.exists(name):
+                return name
+            return self._save(name, content)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return self._save(
+            f'{BLOB_DIRECTORY}/{hexdigest[:2]}/{hexdigest[2:4]}/'
+            f'{hexdigest}{extension}',
+            content,
+        )
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        path = self.path(LOCK_NAME)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def _touch(self, full_path: str) -> bool:
+        # Renewed, so the file is not collected before the row is committed
+        try:
+            os.utime(full_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _save(self, name: str, content: File) -> str:
+        full_path = self.path(name)
+        with self._lock():
+            if self._touch(full_path):
+                return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Written aside and linked, so concurrent uploads of the same
+        # content never expose a partially written file
+        with NamedTemporaryFile(dir=directory, delete=False) as temporary:
+            for chunk in content.chunks():
+                temporary.write(chunk)
+        try:
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary.name, self.file_permissions_mode)
+            with self._lock():
+                try:
+                    os.link(temporary.name, full_path)
+                except FileExistsError:
+                    self._touch(full_path)
+        finally:
+            os.unlink(temporary.name)
+        return name
+
+    def _file_fields(self) -> Iterator[tuple[type[Model], FileField]]:
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, FileField) and isinstance(
+                    field.storage, ContentAddressedStorage
+                ):
+                    yield model, field
+
+    def is_referenced(self, name: str) -> bool:
+        """Check if any row references the file."""
+        return any(
+            model._base_manager.filter(**{field.attname: name}).exists()
+            for model, field in self._file_fields()
+        )
+
+    def _derived_names(self, name: str) -> list[str]:
+        directory, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        variants_directory = f'{directory}/{VARIANTS_DIRECTORY}'
+        if not self.exists(variants_directory):
+            return []
+        return [
+            f'{variants_directory}/{filename}'
+            for filename in self.listdir(variants_directory)[1]
+            if filename.startswith(f'{stem}-')
+        ]
+
+    def blob_names(self) -> Iterator[str]:
+        """Iterate over names of every stored blob."""
+        root = self.path(BLOB_DIRECTORY)
+        for directory, directories, filenames in os.walk(root):
+            if VARIANTS_DIRECTORY in directories:
+                directories.remove(VARIANTS_DIRECTORY)
+            for filename in filenames:
+                if BLOB_FILENAME_REGEX.fullmatch(filename):
+                    path = os.path.join(directory, filename)
+                    yield os.path.relpath(path, self.location).replace(
+                        os.sep, '/'
+                    )
+
+    def collect(self, name: str, saved_before: float) -> bool:
+        """Delete the file with derived ones if it is no longer used.
+
+        Args:
+            name (str): Storage name of the file.
+            saved_before (float): Timestamp, files saved later are kept.
+
+        Returns:
+            bool: True if the file was deleted.
+        """
+        with self._lock():
+            try:
+                saved_at = os.stat(self.path(name)).st_mtime
+            except FileNotFoundError:
+                return False
+            if saved_at > saved_before or self.is_referenced(name):
+                return False
+            for derived_name in self._derived_names(name):
+                super().delete(derived_name)
+            super().delete(name)
+        return True
+
+    def delete(self, name: str) -> None:
+        """Delete the file unless it is still used.
+
+        Files saved within `BLOB_GRACE_PERIOD` are left to
+        `collect_orphaned_blobs` command. Derived files are deleted only
+        together with their blob.
+        """
+        if self._is_blob_path(name) and self._is_derived(name):
+            return
+        self.collect(name, time.time() - BLOB_GRACE_PERIOD)
+
+
+blob_storage = ContentAddressedStorage()
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class CappedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploaded files to disk, dropping bytes past the size cap.
+
+    The returned file keeps the full received size, so image fields
+    reject it with a proper message instead of a missing file, while
+    neither memory nor disk are spent on oversized uploads.
+    """
+
+    def new_file(self, *args, **kwargs) -> None:
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        self.received += len(raw_data)
+        if self.received <= settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.file.write(raw_data)
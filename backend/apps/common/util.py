@@ -2,6 +2,9 @@ import random
 from collections import Counter
 from typing import Any, Callable, Iterable
 
+from django.db import IntegrityError, transaction
+from django.db.models import Model, QuerySet
+
 from .const import TOKEN_SYMBOLS
 
 
@@ -34,3 +37,60 @@ def contains_duplicates(
     _collection = map(key, collection)
     counter = Counter(_collection)
     return counter.most_common(1)[0][1] > 1
+
+
+def find_missing_ids(model: type[Model], ids: Iterable[int]) -> list[int]:
+    """Find ids which do not belong to any object of model.
+
+    Checks all ids with a single query.
+
+    Args:
+        model [type[Model]]: Model to look objects up in.
+        ids [Iterable[int]]: Object ids.
+
+    Returns:
+        list[int]: Missing ids in order of appearance.
+    """
+    ids = list(ids)
+    existing_ids = set(
+        model.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    return [id for id in ids if id not in existing_ids]
+
+
+def insert_if_absent(model: type[Model], **fields) -> bool:
+    """Insert a row unless it violates a unique constraint.
+
+    Runs a single INSERT in a savepoint, so concurrent requests can not
+    create duplicates and outer transaction survives the conflict.
+
+    Args:
+        model [type[Model]]: Model with unique constraint over fields.
+        **fields: Field values of the row.
+
+    Returns:
+        bool: True if the row was inserted, False if it already existed.
+    """
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def delete_if_present(queryset: QuerySet) -> bool:
+    """Delete rows without checking for them first.
+
+    The delete itself tells whether the rows existed, so of concurrent
+    requests only one succeeds. Rows of models with delete signals are
+    still loaded before the DELETE to send the signals.
+
+    Args:
+        queryset [QuerySet]: Rows to delete.
+
+    Returns:
+        bool: True if anything was deleted.
+    """
+    deleted, _ = queryset.delete()
+    return bool(deleted)
@@ -0,0 +1,294 @@
+"""Responsive variants of uploaded images.
+
+After an image is saved, variants of `IMAGE_VARIANT_WIDTHS` are rendered
+in WebP and in the original format, without EXIF metadata, and listed in
+`<field>_variants` JSON column of the row:
+
+    {'source': <image name>, 'formats': {<format>: [[<width>, <name>]]}}
+
+Variants of another image than the current one (e.g. while new variants
+are being rendered) are ignored, so clients get the original meanwhile.
+
+Decoding and resizing large images takes a lot of memory, so by default
+web processes render nothing and rows with outdated variants are picked
+up by a separate `generate_image_variants --watch` process. With
+`IMAGE_VARIANTS_RENDERING` setting variants are rendered by a thread pool
+of web processes (`thread`) or right after the transaction is committed
+(`inline`) instead.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db import connection, transaction
+from django.db.models import F, Model, Q, QuerySet
+from django.db.models.fields.files import FieldFile
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.signals import post_save
+from PIL import features, Image, ImageOps
+
+from .const import (
+    IMAGE_VARIANT_QUALITY,
+    IMAGE_VARIANT_WIDTHS,
+    IMAGE_VARIANT_WORKERS,
+    VARIANTS_RENDERING_INLINE,
+    VARIANTS_RENDERING_THREAD,
+)
+
+logger = logging.getLogger(__name__)
+
+WEBP = 'WEBP'
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    WEBP: '.webp',
+}
+
+
+class VariantField(NamedTuple):
+    model: type[Model]
+    field: str
+    # Called with primary key of the row once its variants are stored
+    on_ready: Optional[Callable[[int], None]]
+
+    @property
+    def variants_field(self) -> str:
+        return f'{self.field}_variants'
+
+    def __str__(self) -> str:
+        return f'{self.model._meta.label}.{self.field}'
+
+
+# Filled by the apps which own image fields
+VARIANT_FIELDS: list[VariantField] = []
+
+_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_VARIANT_WORKERS,
+    thread_name_prefix='image-variants',
+)
+
+
+def image_format(name: str) -> Optional[str]:
+    """Get Pillow format of image by its file name, e.g. `JPEG`."""
+    extension = os.path.splitext(name)[1].lower()
+    return Image.registered_extensions().get(extension)
+
+
+def variants_outdated(name: Optional[str], variants: dict) -> bool:
+    """Check if stored variants were not rendered from the image."""
+    return variants.get('source') != (name or None)
+
+
+def outdated_rows(variant_field: VariantField) -> QuerySet:
+    """Find rows whose variants were not rendered from the current image.
+
+    The same check as `variants_outdated`, made by the database.
+    """
+    model, field, _ = variant_field
+    no_image = Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+    return model.objects.alias(
+        variants_source=KeyTextTransform(
+            'source', variant_field.variants_field
+        )
+    ).filter(
+        ~no_image
+        & (Q(variants_source__isnull=True) | ~Q(variants_source=F(field)))
+        | no_image & Q(variants_source__isnull=False)
+    )
+
+
+def current_variants(image: FieldFile, variants: dict) -> dict:
+    """Get variants of the current image by format.
+
+    Returns:
+        dict: Lists of (width, name) by lowercase format, empty if variants
+            are not rendered yet.
+    """
+    if not image or variants_outdated(image.name, variants):
+        return {}
+    return variants['formats']
+
+
+def _variant_name(name: str, width: int, format: str) -> str:
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/variants/{stem}-{width}w{FORMAT_EXTENSIONS[format]}'
+
+
+def variant_formats(source_format: str) -> list[str]:
+    """Get formats variants of image are rendered in.
+
+    WebP is skipped if Pillow is built without it.
+    """
+    formats = [WEBP] if features.check(WEBP.lower()) else []
+    if source_format not in formats and source_format in FORMAT_EXTENSIONS:
+        formats.append(source_format)
+    return formats
+
+
+def convert_for_format(image: Image.Image, format: str) -> Image.Image:
+    """Convert image to a mode the format can be saved in."""
+    if format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    if format == WEBP and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA')
+    return image
+
+
+def render_variants(file, name: str, storage: Storage) -> dict:
+    """Render and store variants of an image.
+
+    Args:
+        file: Image file opened for reading.
+        name (str): Storage name of the image.
+        storage (Storage): Storage to save variants to.
+
+    Returns:
+        dict: Lists of (width, name) by lowercase format.
+    """
+    max_width = max(IMAGE_VARIANT_WIDTHS)
+    with Image.open(file) as image:
+        formats = variant_formats(image.format)
+        # JPEG is decoded at a reduced scale if it is much larger
+        image.draft(image.mode, (max_width, max_width))
+        # Pixels are rotated by EXIF orientation, metadata is not saved
+        source = ImageOps.exif_transpose(image)
+        # Original width is kept only if it is not larger than the widths
+        widths = sorted(
+            {width for width in IMAGE_VARIANT_WIDTHS if width < source.width}
+            | ({source.width} if source.width <= max_width else set())
+        )
+        variants = {format.lower(): [] for format in formats}
+        for width in widths:
+            height = max(1, round(source.height * width / source.width))
+            resized = source.resize((width, height), Image.LANCZOS)
+            for format in formats:
+                content = BytesIO()
+                convert_for_format(resized, format).save(
+                    content, format, quality=IMAGE_VARIANT_QUALITY
+                )
+                variants[format.lower()].append(
+                    [
+                        width,
+                        storage.save(
+                            _variant_name(name, width, format),
+                            ContentFile(content.getvalue()),
+                        ),
+                    ]
+                )
+    return variants
+
+
+def _delete_files(storage: Storage, variants: dict) -> None:
+    for sizes in variants.get('formats', {}).values():
+        for _, name in sizes:
+            storage.delete(name)
+
+
+def generate_variants(variant_field: VariantField, pk: int) -> bool:
+    """Render variants of the current image of a row and store them.
+
+    Variants of the previous image are deleted.
+
+    Returns:
+        bool: Whether the variants were stored, False if the image was
+            changed meanwhile.
+    """
+    model, field, on_ready = variant_field
+    variants_field = variant_field.variants_field
+    row = model.objects.filter(pk=pk).only(field, variants_field).first()
+    if row is None:
+        return False
+    image = getattr(row, field)
+    old_variants = getattr(row, variants_field)
+    storage = model._meta.get_field(field).storage
+
+    variants = {}
+    if image:
+        with image.open('rb'):
+            variants = {
+                'source': image.name,
+                'formats': render_variants(image, image.name, storage),
+            }
+    stored = model.objects.filter(pk=pk, **{field: image.name}).update(
+        **{variants_field: variants}
+    )
+    if not stored:
+        _delete_files(storage, variants)
+        return False
+    _delete_files(storage, old_variants)
+    if on_ready is not None:
+        on_ready(pk)
+    return True
+
+
+def _generate_in_background(variant_field: VariantField, pk: int) -> None:
+    try:
+        generate_variants(variant_field, pk)
+    except Exception:
+        logger.exception(
+            'Failed to render variants of %s %s', variant_field, pk
+        )
+    finally:
+        # Connections of pool threads are not closed by request handling
+        connection.close()
+
+
+def schedule_variants(variant_field: VariantField, pk: int) -> None:
+    """Render variants once the current transaction is committed.
+
+    Does nothing unless variants are rendered by web processes, see
+    `IMAGE_VARIANTS_RENDERING` setting.
+    """
+    rendering = settings.IMAGE_VARIANTS_RENDERING
+    if rendering == VARIANTS_RENDERING_THREAD:
+        transaction.on_commit(
+            lambda: _executor.submit(
+                _generate_in_background, variant_field, pk
+            )
+        )
+    elif rendering == VARIANTS_RENDERING_INLINE:
+        transaction.on_commit(lambda: generate_variants(variant_field, pk))
+
+
+def register_variants(
+    model: type[Model],
+    field: str,
+    on_ready: Optional[Callable[[int], None]] = None,
+) -> VariantField:
+    """Keep variants of image field up to date.
+
+    Args:
+        model (type[Model]): Model with the image field and JSON column
+            `<field>_variants`.
+        field (str): Name of the image field.
+        on_ready (Optional[Callable[[int], None]]): Called with primary key
+            of the row once its variants are stored, e.g. to drop caches.
+
+    Returns:
+        VariantField: Registered field.
+    """
+    variant_field = VariantField(model, field, on_ready)
+    VARIANT_FIELDS.append(variant_field)
+
+    def image_saved(sender, instance: Model, **kwargs):
+        if variants_outdated(
+            getattr(instance, field).name,
+            getattr(instance, variant_field.variants_field),
+        ):
+            schedule_variants(variant_field, instance.pk)
+
+    post_save.connect(
+        image_saved,
+        sender=model,
+        weak=False,
+        dispatch_uid=f'image-variants:{variant_field}',
+    )
+    return variant_field
@@ -0,0 +1,174 @@
+import hashlib
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http.response import HttpResponseBase
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .cache import get_viewer_state_changed
+
+# Values which fully determine resource representation and its last
+# modification time. Either of them may be None if it is not known.
+ResourceState = tuple[Optional[tuple], Optional[datetime]]
+
+
+def make_etag(*parts) -> str:
+    """Build quoted strong ETag from parts of resource state.
+
+    Args:
+        *parts: Values which fully determine resource representation.
+
+    Returns:
+        str: Quoted ETag.
+    """
+    digest = hashlib.md5(
+        '|'.join(map(str, parts)).encode(),
+        usedforsecurity=False,
+    )
+    return quote_etag(digest.hexdigest())
+
+
+class PrerenderedResponse(Response):
+    """Response with JSON content rendered beforehand.
+
+    Content is used as is when the client accepts plain JSON, other
+    renderers (e.g. browsable API) render `data` as usual.
+
+    Args:
+        data: Response data.
+        content (bytes): `data` rendered by JSONRenderer.
+    """
+
+    def __init__(self, data, content: bytes, **kwargs) -> None:
+        super().__init__(data, **kwargs)
+        self.prerendered_content = content
+
+    @property
+    def rendered_content(self) -> bytes:
+        if (
+            type(self.accepted_renderer) is not JSONRenderer
+            or self.accepted_media_type != JSONRenderer.media_type
+        ):
+            return super().rendered_content
+        self['Content-Type'] = self.content_type or JSONRenderer.media_type
+        return self.prerendered_content
+
+
+class ConditionalGetMixin:
+    """Answer conditional GET requests with 304 before serializing.
+
+    Views define `get_list_state` and `get_detail_state` which compute
+    resource state with cheap queries. List state is computed from the
+    filtered `get_state_queryset`, so it can skip annotations and related
+    rows only needed for serialization. ETag and Last-Modified headers are
+    built from it and checked against request preconditions.
+
+    Representation of viewer dependent views also depends on the time of
+    the viewer's last change to favorites, cart or follows, which is kept
+    in cache. So for signed in users they are conditional only if the
+    cache is shared by every process, see `SHARED_CACHE` setting.
+    """
+
+    # Whether representation depends on requesting user
+    viewer_dependent = False
+    # Seconds shared caches may reuse response for, not cacheable if None
+    cache_max_age = None
+
+    def get_state_queryset(self) -> QuerySet:
+        return self.get_queryset()
+
+    def get_list_state(self, queryset: QuerySet) -> ResourceState:
+        return None, None
+
+    def get_detail_state(self) -> ResourceState:
+        return None, None
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        parts, last_modified = self.get_list_state(
+            self.filter_queryset(self.get_state_queryset())
+        )
+        if parts is not None:
+            parts = (request.get_full_path(), *parts)
+        return self._respond_conditionally(
+            parts,
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        parts, last_modified = self.get_detail_state()
+        return self._respond_conditionally(
+            parts,
+            last_modified,
+            lambda: super(ConditionalGetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+    def _add_viewer_state(
+        self,
+        parts: Optional[tuple],
+        last_modified: Optional[datetime],
+    ) -> ResourceState:
+        user = self.request.user
+        if not self.viewer_dependent or user.is_anonymous:
+            return parts, last_modified
+        if not settings.SHARED_CACHE:
+            # Viewer state changed through another process would not be
+            # seen, so nothing is considered unchanged
+            return None, None
+        viewer_state = get_viewer_state_changed(user)
+        if parts is not None:
+            parts = (*parts, user.id, viewer_state.isoformat())
+        if last_modified is not None:
+            last_modified = max(last_modified, viewer_state)
+        return parts, last_modified
+
+    def _respond_conditionally(
+        self,
+        parts: Optional[tuple],
+        last_modified: Optional[datetime],
+        respond: Callable[[], Response],
+    ) -> HttpResponseBase:
+        parts, last_modified = self._add_viewer_state(parts, last_modified)
+        etag = make_etag(*parts) if parts is not None else None
+        timestamp = (
+            int(last_modified.timestamp())
+            if last_modified is not None
+            else None
+        )
+
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=timestamp,
+        )
+        if response is None:
+            response = respond()
+        if not 200 <= response.status_code < 400:
+            return response
+        if etag is not None:
+            response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        if self.viewer_dependent:
+            patch_vary_headers(response, ['Authorization'])
+        if self.cache_max_age is not None:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=self.cache_max_age,
+            )
+        return response
@@ -3,23 +3,26 @@ from django.contrib import admin
 from recipes.admin import RecipeAdmin
 from users.admin import UserAdmin
 
-from .models import UserFavorites
+from .models import FavoriteRecipe
 
 
-class UserFavoritesInline(admin.StackedInline):
-    model = UserFavorites
-    filter_horizontal = ['recipes']
+class FavoriteRecipeInline(admin.TabularInline):
+    model = FavoriteRecipe
+    fk_name = 'user'
+    raw_id_fields = ['recipe']
+    readonly_fields = ['created_at']
+    extra = 0
 
 
-@admin.register(UserFavorites)
-class UserFavoritesAdmin(admin.ModelAdmin):
-    list_display = ['user']
-    list_display_links = ['user']
-    filter_horizontal = ['recipes']
+@admin.register(FavoriteRecipe)
+class FavoriteRecipeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'recipe', 'created_at']
+    list_display_links = ['user', 'recipe']
+    list_select_related = ['user', 'recipe']
+    raw_id_fields = ['user', 'recipe']
+    search_fields = ['user__username', 'recipe__name']
 
 
-RecipeAdmin.favorited_count = lambda self, obj: obj.favorites_lists.count()
-RecipeAdmin.favorited_count.__name__ = 'Раз добавлен в избранное'
 RecipeAdmin.list_display += ['favorited_count']
 
-UserAdmin.inlines += [UserFavoritesInline]
+UserAdmin.inlines += [FavoriteRecipeInline]
@@ -3,6 +3,7 @@ from django_filters import TypedChoiceFilter
 
 from common.const import BOOLEAN_NUMBER_CHOICES
 from recipes.filters import RecipeFilter
+from recipes.models import RecipeQuerySet
 
 
 def favorited_by_current_user(
@@ -14,10 +15,12 @@ def favorited_by_current_user(
     if self.request.user.is_anonymous:
         return queryset.none()
 
-    lookup_params = {'favorites_lists__user__in': [self.request.user]}
+    is_favorited = RecipeQuerySet.viewer_annotations['is_favorited'](
+        self.request.user
+    )
     if not value:
-        return queryset.exclude(**lookup_params)
-    return queryset.filter(**lookup_params)
+        return queryset.filter(~is_favorited)
+    return queryset.filter(is_favorited)
 
 
 RecipeFilter.base_filters['is_favorited'] = TypedChoiceFilter(
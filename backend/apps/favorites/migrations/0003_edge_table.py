@@ -0,0 +1,88 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def copy_favorites(apps, schema_editor):
+    UserFavorites = apps.get_model('favorites', 'UserFavorites')
+    FavoriteRecipe = apps.get_model('favorites', 'FavoriteRecipe')
+    rows = (
+        UserFavorites.recipes.through.objects.values_list(
+            'userfavorites__user_id', 'recipe_id'
+        )
+        .order_by('id')
+    )
+    FavoriteRecipe.objects.bulk_create(
+        (
+            FavoriteRecipe(user_id=user_id, recipe_id=target_id)
+            for user_id, target_id in rows
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def copy_favorites_back(apps, schema_editor):
+    UserFavorites = apps.get_model('favorites', 'UserFavorites')
+    FavoriteRecipe = apps.get_model('favorites', 'FavoriteRecipe')
+    Through = UserFavorites.recipes.through
+    UserFavorites.objects.bulk_create(
+        UserFavorites(user_id=user_id)
+        for user_id in FavoriteRecipe.objects.values_list(
+            'user_id', flat=True
+        ).distinct()
+    )
+    list_ids = dict(UserFavorites.objects.values_list('user_id', 'id'))
+    Through.objects.bulk_create(
+        (
+            Through(
+                userfavorites_id=list_ids[user_id],
+                recipe_id=target_id,
+            )
+            for user_id, target_id in FavoriteRecipe.objects.values_list(
+                'user_id', 'recipe_id'
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0023_recipe_search_index'),
+        ('favorites', '0002_alter_userfavorites_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FavoriteRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorited_by', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorite_recipes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Избранный рецепт',
+                'verbose_name_plural': 'Избранные рецепты',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='favoriterecipe',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_recipe'),
+        ),
+        migrations.RunPython(copy_favorites, copy_favorites_back),
+        migrations.DeleteModel(
+            name='UserFavorites',
+        ),
+    ]
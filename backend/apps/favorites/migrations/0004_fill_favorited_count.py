@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_favorited_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('favorites', 'FavoriteRecipe')
+    Recipe.objects.update(
+        favorited_count=Coalesce(
+            Subquery(
+                FavoriteRecipe.objects.filter(recipe=OuterRef('pk'))
+                .order_by()
+                .values('recipe')
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('favorites', '0003_edge_table'),
+        ('recipes', '0024_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_favorited_count, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,3 @@
-from annoying.fields import AutoOneToOneField
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -7,24 +6,49 @@ from recipes.models import Recipe
 User = get_user_model()
 
 
-class UserFavorites(models.Model):
-    user = AutoOneToOneField(
+class FavoriteRecipe(models.Model):
+    """Recipe added to favorites by user.
+
+    Unique constraint on (user, recipe) serves lookups by user, index on
+    (recipe, user) serves lookups by recipe, so neither foreign key needs
+    its own index.
+    """
+
+    user = models.ForeignKey(
         User,
-        related_name='favorites_list',
+        related_name='favorite_recipes',
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь',
     )
-    recipes = models.ManyToManyField(
+    recipe = models.ForeignKey(
         Recipe,
-        related_name='favorites_lists',
-        verbose_name='Рецепты',
-        blank=True,
+        related_name='favorited_by',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Рецепт',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления',
     )
 
     class Meta:
-        verbose_name = 'Список избранного'
-        verbose_name_plural = 'Списки избранного'
-        ordering = ['user__username']
+        verbose_name = 'Избранный рецепт'
+        verbose_name_plural = 'Избранные рецепты'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_favorite_recipe',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
-        return f'Избранное {self.user.username}'
+        return f'{self.user} - {self.recipe}'
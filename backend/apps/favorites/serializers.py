@@ -1,18 +1,29 @@
+from django.db.models import Exists, OuterRef
 from rest_framework.serializers import SerializerMethodField
 
-from recipes.models import Recipe
+from recipes.models import Recipe, RecipeQuerySet
 from recipes.serializers import RecipeSerializer
 
+from .models import FavoriteRecipe
+
 
 def get_is_favorited(self, recipe: Recipe) -> bool:
+    if (is_favorited := getattr(recipe, 'is_favorited', None)) is not None:
+        return is_favorited
     if not (request := self.context.get('request')):
         return False
     current_user = request.user
     if current_user.is_anonymous:
         return False
-    return recipe in current_user.favorites_list.recipes.all()
+    return FavoriteRecipe.objects.filter(
+        user=current_user, recipe=recipe
+    ).exists()
 
 
 RecipeSerializer._declared_fields['is_favorited'] = SerializerMethodField()
 RecipeSerializer.Meta.fields += ['is_favorited']
+RecipeSerializer.viewer_fields += ['is_favorited']
 RecipeSerializer.get_is_favorited = get_is_favorited
+RecipeQuerySet.viewer_annotations['is_favorited'] = lambda user: Exists(
+    FavoriteRecipe.objects.filter(user=user, recipe=OuterRef('pk'))
+)
@@ -0,0 +1,6 @@
+from common.counters import register_counter
+from recipes.models import Recipe
+
+from .models import FavoriteRecipe
+
+register_counter(Recipe, 'favorited_count', FavoriteRecipe, 'recipe')
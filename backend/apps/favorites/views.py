@@ -8,22 +8,33 @@ from rest_framework.status import (
 )
 from rest_framework.viewsets import GenericViewSet
 
+from common.cache import touch_viewer_state
+from common.util import delete_if_present, insert_if_absent
 from recipes.models import Recipe
 from recipes.serializers import ShortRecipeSerializer
 
+from .models import FavoriteRecipe
+
 
 class FavoriteRecipesView(GenericViewSet):
-    queryset = Recipe.objects.all()
+    # Only columns needed for the short recipe representation
+    queryset = Recipe.objects.only(
+        'id', 'name', 'image', 'image_variants', 'cooking_time'
+    )
+    lookup_value_regex = r'\d+'
 
     @action(detail=True, methods=['post'])
     def favorite(self, request: Request, pk: int) -> Response:
         recipe = self.get_object()
         current_user = request.user
 
-        if recipe in current_user.favorites_list.recipes.all():
+        if not insert_if_absent(
+            FavoriteRecipe,
+            user=current_user,
+            recipe=recipe,
+        ):
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        current_user.favorites_list.recipes.add(recipe)
+        touch_viewer_state(current_user)
 
         return Response(
             ShortRecipeSerializer(
@@ -35,11 +46,15 @@ class FavoriteRecipesView(GenericViewSet):
 
     @favorite.mapping.delete
     def unfavorite(self, request: Request, pk: int) -> Response:
-        recipe = self.get_object()
         current_user = request.user
 
-        if recipe not in current_user.favorites_list.recipes.all():
+        if not delete_if_present(
+            FavoriteRecipe.objects.filter(
+                user=current_user,
+                recipe_id=pk,
+            )
+        ):
+            self.get_object()
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        current_user.favorites_list.recipes.remove(recipe)
+        touch_viewer_state(current_user)
         return Response(status=HTTP_204_NO_CONTENT)
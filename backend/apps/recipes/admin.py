@@ -1,11 +1,66 @@
 from django.contrib import admin
+from django.db.models import QuerySet, Sum
+from django.forms import ModelForm
+from django.http import HttpRequest
 
+from .cache import invalidate_recipes
 from .models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
     Tag,
 )
+from .signals import recipe_ingredients_changed
+
+
+def recipes_changed(recipes: QuerySet) -> None:
+    """Mark recipes as modified and drop their cached representations."""
+    invalidate_recipes(list(recipes.values_list('id', flat=True)))
+    recipes.touch()
+
+
+def _ingredient_amounts(recipe: Recipe) -> dict[int, int]:
+    return dict(
+        recipe.recipe_to_ingredient.values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+        .order_by()
+    )
+
+
+class CatalogAdmin(admin.ModelAdmin):
+    """Admin for tables which are shown inside recipes."""
+
+    # Name of Recipe field pointing to the model
+    recipe_field = None
+
+    def _related_recipes(self, obj) -> QuerySet:
+        return Recipe.objects.filter(**{self.recipe_field: obj})
+
+    def save_model(
+        self,
+        request: HttpRequest,
+        obj,
+        form: ModelForm,
+        change: bool,
+    ) -> None:
+        super().save_model(request, obj, form, change)
+        if change:
+            recipes_changed(self._related_recipes(obj))
+
+    def delete_model(self, request: HttpRequest, obj) -> None:
+        recipes_changed(self._related_recipes(obj))
+        super().delete_model(request, obj)
+
+    def delete_queryset(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet,
+    ) -> None:
+        recipes_changed(
+            Recipe.objects.filter(**{f'{self.recipe_field}__in': queryset})
+        )
+        super().delete_queryset(request, queryset)
 
 
 class RecipeIngredientInline(admin.StackedInline):
@@ -14,7 +69,8 @@ class RecipeIngredientInline(admin.StackedInline):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(CatalogAdmin):
+    recipe_field = 'ingredients'
     list_display = [
         'name',
         'measurement_unit',
@@ -24,7 +80,8 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(CatalogAdmin):
+    recipe_field = 'tags'
     list_display = [
         'slug',
         'name',
@@ -44,3 +101,46 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ['tags']
     filter_horizontal = ['tags']
     inlines = [RecipeIngredientInline]
+
+    def save_related(
+        self,
+        request: HttpRequest,
+        form: ModelForm,
+        formsets: list,
+        change: bool,
+    ) -> None:
+        recipe = form.instance
+        old_amounts = _ingredient_amounts(recipe) if change else {}
+        super().save_related(request, form, formsets, change)
+        invalidate_recipes([recipe.id])
+        if not change:
+            return
+        new_amounts = _ingredient_amounts(recipe)
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+            if (
+                delta := new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+        }
+        if deltas:
+            recipe_ingredients_changed.send(
+                sender=Recipe,
+                instance=recipe,
+                deltas=deltas,
+            )
+
+    def delete_model(self, request: HttpRequest, recipe: Recipe) -> None:
+        recipe_id = recipe.id
+        super().delete_model(request, recipe)
+        invalidate_recipes([recipe_id])
+
+    def delete_queryset(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet,
+    ) -> None:
+        recipe_ids = list(queryset.values_list('id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_recipes(recipe_ids)
@@ -0,0 +1,156 @@
+"""In-memory index for ingredient name autocomplete.
+
+Ingredient catalog is small (a few thousand rows) and rarely changed, so
+every process keeps it in memory and answers lookups without touching the
+database. Index is built on first lookup and rebuilt when ingredient
+catalog version in cache changes or when it gets older than
+`AUTOCOMPLETE_INDEX_TTL`, so usage weights do not drift too far from the
+actual recipes. Without a shared cache the version expires after
+`LOCAL_CATALOG_VERSION_TIMEOUT`, so changes made through other processes
+show up within it, see `recipes.cache.get_catalog_version`.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from itertools import chain
+from typing import Iterable, NamedTuple, Optional
+
+from django.db.models import Count
+
+from .cache import get_catalog_version
+from .const import AUTOCOMPLETE_INDEX_TTL
+from .models import Ingredient
+
+
+class IndexEntry(NamedTuple):
+    key: str
+    usage: int
+    data: dict
+
+
+class IngredientIndex:
+    """Sorted array of ingredient names.
+
+    Prefix matches are found with binary search, substring matches with a
+    linear scan which is only done if there are not enough prefix matches.
+    Within each group more used ingredients go first.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[IndexEntry],
+        catalog_version: str,
+    ) -> None:
+        self.entries = sorted(entries, key=lambda entry: entry.key)
+        self.keys = [entry.key for entry in self.entries]
+        self.catalog_version = catalog_version
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, catalog_version: str) -> 'IngredientIndex':
+        """Load ingredients with their usage counts from database.
+
+        Args:
+            catalog_version (str): Catalog version index is built for.
+
+        Returns:
+            IngredientIndex: New index.
+        """
+        ingredients = Ingredient.objects.annotate(
+            usage=Count('ingredient_to_recipe')
+        ).values_list('id', 'name', 'measurement_unit', 'usage')
+        return cls(
+            (
+                IndexEntry(
+                    name.casefold(),
+                    usage,
+                    {
+                        'id': id,
+                        'name': name,
+                        'measurement_unit': measurement_unit,
+                    },
+                )
+                for id, name, measurement_unit, usage in ingredients
+            ),
+            catalog_version,
+        )
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.built_at > AUTOCOMPLETE_INDEX_TTL
+
+    def search(self, query: str, limit: Optional[int] = None) -> list[dict]:
+        """Find ingredients whose name contains the query.
+
+        Args:
+            query (str): Part of ingredient name, case insensitive.
+            limit (Optional[int]): Max number of results, all matches if
+                None.
+
+        Returns:
+            list[dict]: Ingredients with id, name and measurement_unit.
+                Names starting with the query go first.
+        """
+        query = query.strip().casefold()
+        if not query or (limit is not None and limit <= 0):
+            return []
+
+        start = end = bisect_left(self.keys, query)
+        while end < len(self.keys) and self.keys[end].startswith(query):
+            end += 1
+        ranked = self._best(self.entries[start:end], limit)
+
+        if limit is None or len(ranked) < limit:
+            substring_matches = (
+                entry
+                for entry in chain(self.entries[:start], self.entries[end:])
+                if query in entry.key
+            )
+            ranked += self._best(
+                substring_matches,
+                None if limit is None else limit - len(ranked),
+            )
+        return [entry.data for entry in ranked]
+
+    @classmethod
+    def _best(
+        cls, entries: Iterable[IndexEntry], limit: Optional[int]
+    ) -> list[IndexEntry]:
+        if limit is None:
+            return sorted(entries, key=cls._rank)
+        return heapq.nsmallest(limit, entries, key=cls._rank)
+
+    @staticmethod
+    def _rank(entry: IndexEntry) -> tuple[int, str]:
+        return -entry.usage, entry.key
+
+
+_index: Optional[IngredientIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """Get up to date ingredient index of this process.
+
+    Returns:
+        IngredientIndex: Index for current catalog version.
+    """
+    global _index
+    catalog_version = get_catalog_version('ingredients')
+    index = _index
+    if (
+        index is not None
+        and index.catalog_version == catalog_version
+        and not index.expired
+    ):
+        return index
+    with _index_lock:
+        if (
+            _index is None
+            or _index.catalog_version != catalog_version
+            or _index.expired
+        ):
+            _index = IngredientIndex.build(catalog_version)
+        return _index
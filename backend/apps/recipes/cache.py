@@ -0,0 +1,143 @@
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
+
+from .const import (
+    LOCAL_CATALOG_VERSION_TIMEOUT,
+    RECIPE_CACHE_TIMEOUT,
+    RECIPE_CACHE_VERSION,
+    TAG_MAP_TIMEOUT,
+)
+from .models import Tag
+
+TAG_MAP_KEY = 'tag-ids-by-slug'
+
+
+def _recipe_key(recipe_id: int) -> str:
+    return f'recipe:{recipe_id}'
+
+
+def get_cached_recipe(recipe_id: int) -> Optional[dict]:
+    """Get viewer independent representation of recipe from cache.
+
+    Args:
+        recipe_id (int): Recipe id.
+
+    Returns:
+        dict | None: Cached representation or None if it is not cached.
+    """
+    if not settings.SHARED_CACHE:
+        return None
+    return cache.get(_recipe_key(recipe_id), version=RECIPE_CACHE_VERSION)
+
+
+def cache_recipe(recipe_id: int, data: dict) -> None:
+    """Store viewer independent representation of recipe in cache.
+
+    Not cached unless the cache is shared by every process, see
+    `SHARED_CACHE` setting.
+
+    Args:
+        recipe_id (int): Recipe id.
+        data (dict): Recipe representation without per-viewer fields.
+    """
+    if not settings.SHARED_CACHE:
+        return
+    cache.set(
+        _recipe_key(recipe_id),
+        data,
+        timeout=RECIPE_CACHE_TIMEOUT,
+        version=RECIPE_CACHE_VERSION,
+    )
+
+
+def invalidate_recipes(recipe_ids: Iterable[int]) -> None:
+    """Drop cached representations of recipes.
+
+    Args:
+        recipe_ids (Iterable[int]): Ids of recipes to drop.
+    """
+    cache.delete_many(
+        [_recipe_key(recipe_id) for recipe_id in recipe_ids],
+        version=RECIPE_CACHE_VERSION,
+    )
+
+
+def invalidate_author_recipes(author: AbstractUser) -> None:
+    """Drop cached representations of every recipe by author.
+
+    Args:
+        author (AbstractUser): Recipe author whose profile was changed.
+    """
+    invalidate_recipes(author.recipes.values_list('id', flat=True))
+
+
+def get_tag_ids_by_slug() -> dict[str, int]:
+    """Get mapping of tag slugs to tag ids.
+
+    Tags table is tiny and rarely changed, so mapping is cached. It is
+    dropped when tags are changed in the admin and expires after a while
+    in case tags were changed some other way.
+
+    Returns:
+        dict[str, int]: Tag ids by slug.
+    """
+    return cache.get_or_set(
+        TAG_MAP_KEY,
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+        timeout=TAG_MAP_TIMEOUT,
+    )
+
+
+def invalidate_tag_map() -> None:
+    """Drop cached mapping of tag slugs to tag ids."""
+    cache.delete(TAG_MAP_KEY)
+
+
+def _catalog_version_key(catalog: str) -> str:
+    return f'catalog-version:{catalog}'
+
+
+def _catalog_version_timeout() -> Optional[int]:
+    # A bump reaches other processes only through a shared cache
+    if settings.SHARED_CACHE:
+        return None
+    return LOCAL_CATALOG_VERSION_TIMEOUT
+
+
+def get_catalog_version(catalog: str) -> str:
+    """Get current version of catalog table.
+
+    Processes compare it with version of their in-memory catalog data
+    (snapshots, autocomplete index) to find out that the data is stale.
+    Unless the cache is shared by every process, the version expires
+    after `LOCAL_CATALOG_VERSION_TIMEOUT`, so changes made by other
+    processes are noticed with this delay.
+
+    Args:
+        catalog (str): Catalog name, e.g. `tags` or `ingredients`.
+
+    Returns:
+        str: Opaque version string.
+    """
+    return cache.get_or_set(
+        _catalog_version_key(catalog),
+        lambda: uuid4().hex,
+        timeout=_catalog_version_timeout(),
+    )
+
+
+def bump_catalog_version(catalog: str) -> None:
+    """Mark every in-memory copy of catalog data as stale.
+
+    Args:
+        catalog (str): Catalog name, e.g. `tags` or `ingredients`.
+    """
+    cache.set(
+        _catalog_version_key(catalog),
+        uuid4().hex,
+        timeout=_catalog_version_timeout(),
+    )
@@ -0,0 +1,64 @@
+"""Pre-rendered snapshots of near-static catalog tables.
+
+Tag and ingredient lists are requested on every page load but change only
+through the admin or data imports. Each process keeps their rendered JSON
+in memory and rebuilds it when catalog version in cache is bumped by
+model signals or, without a shared cache, expires.
+"""
+
+import threading
+from typing import Callable
+
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_catalog_version
+
+
+class CatalogSnapshot:
+    """Serialized catalog table with its JSON already rendered.
+
+    Args:
+        items (list[dict]): Serialized objects in list order.
+        version (str): Catalog version snapshot was built for.
+    """
+
+    def __init__(self, items: list[dict], version: str) -> None:
+        renderer = JSONRenderer()
+        self.version = version
+        self.items = items
+        self.items_by_id = {item['id']: item for item in items}
+        self.content_by_id = {
+            item['id']: renderer.render(item) for item in items
+        }
+        self.list_content = b'[%s]' % b','.join(self.content_by_id.values())
+
+
+_snapshots: dict[str, CatalogSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_catalog_snapshot(
+    catalog: str,
+    serialize: Callable[[], list[dict]],
+) -> CatalogSnapshot:
+    """Get up to date snapshot of catalog for this process.
+
+    Args:
+        catalog (str): Catalog name, e.g. `tags` or `ingredients`.
+        serialize (Callable[[], list[dict]]): Function which serializes
+            the whole table if snapshot has to be rebuilt.
+
+    Returns:
+        CatalogSnapshot: Snapshot for current catalog version.
+    """
+    version = get_catalog_version(catalog)
+    snapshot = _snapshots.get(catalog)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshots_lock:
+        snapshot = _snapshots.get(catalog)
+        if snapshot is None or snapshot.version != version:
+            snapshot = _snapshots[catalog] = CatalogSnapshot(
+                serialize(), version
+            )
+        return snapshot
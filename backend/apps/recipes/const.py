@@ -1 +1,17 @@
 MAX_UNIT_LENGTH = 16
+
+# Bump when RecipeSerializer output changes to drop stale cached recipes
+RECIPE_CACHE_VERSION = 1
+RECIPE_CACHE_TIMEOUT = 60 * 60
+TAG_MAP_TIMEOUT = 5 * 60
+
+# Autocomplete `limit` parameter is capped at this
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Rebuild index this often to keep ingredient usage weights fresh
+AUTOCOMPLETE_INDEX_TTL = 10 * 60
+
+# Browsers and proxies may reuse tag and ingredient lists this long
+CATALOG_MAX_AGE = 60 * 60
+# Without a shared cache catalog version is local to each process, so it
+# expires this often for changes made by other processes to be noticed
+LOCAL_CATALOG_VERSION_TIMEOUT = 30
@@ -1,26 +1,62 @@
 import django_filters
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils.functional import cached_property
 
-from .models import Ingredient, Recipe, Tag
+from .cache import get_tag_ids_by_slug
+from .models import Recipe
+from .search import search_recipes
 
 
-class IngredientFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains')
+class RecipeFilter(django_filters.FilterSet):
+    """Recipe filters.
 
-    class Meta:
-        model = Ingredient
-        fields = ['name']
+    Every filter on related rows is a semi-join (EXISTS), so combining
+    them never multiplies joins or duplicates recipes. The cached tag map
+    is read once per filter set, so slugs are validated and looked up in
+    the same map even if it is refreshed in between.
+    """
 
-
-class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = django_filters.MultipleChoiceFilter(method='filter_tags')
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = [
             'author',
             'tags',
+            'search',
         ]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.filters['tags'].extra['choices'] = self.tag_choices
+
+    @cached_property
+    def tag_ids_by_slug(self) -> dict[str, int]:
+        return get_tag_ids_by_slug()
+
+    def tag_choices(self) -> list[tuple[str, str]]:
+        return [(slug, slug) for slug in self.tag_ids_by_slug]
+
+    def filter_tags(
+        self,
+        queryset: QuerySet,
+        name: str,
+        value: list[str],
+    ) -> QuerySet:
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__in=[self.tag_ids_by_slug[slug] for slug in value],
+                )
+            )
+        )
+
+    def filter_search(
+        self,
+        queryset: QuerySet,
+        name: str,
+        value: str,
+    ) -> QuerySet:
+        return search_recipes(queryset, value)
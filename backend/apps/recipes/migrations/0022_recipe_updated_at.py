@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_updated_at_to_pub_date(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_delete_shoppingcart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(
+            set_updated_at_to_pub_date,
+            migrations.RunPython.noop,
+        ),
+    ]
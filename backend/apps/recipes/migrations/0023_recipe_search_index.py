@@ -0,0 +1,75 @@
+# Full-text search index over recipe name and description.
+#
+# PostgreSQL: tsvector column kept up to date by a trigger and GIN index.
+# SQLite: FTS5 table which is kept up to date by recipes.search.
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    """
+CREATE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.text, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()
+""",
+    'UPDATE recipes_recipe SET name = name',
+    """
+CREATE INDEX recipes_recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector)
+""",
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX recipes_recipe_search_vector_idx',
+    'DROP TRIGGER recipes_recipe_search_vector_trigger ON recipes_recipe',
+    'DROP FUNCTION recipes_recipe_search_vector_update()',
+    'ALTER TABLE recipes_recipe DROP COLUMN search_vector',
+]
+
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(name, text)',
+    """
+INSERT INTO recipes_recipe_fts(rowid, name, text)
+    SELECT id, name, text FROM recipes_recipe
+""",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TABLE recipes_recipe_fts',
+]
+
+
+def run_vendor_sql(forward: bool):
+    def run(apps, schema_editor):
+        vendor_sql = {
+            'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+            'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+        }
+        if schema_editor.connection.vendor not in vendor_sql:
+            return
+        forward_sql, backward_sql = vendor_sql[schema_editor.connection.vendor]
+        for statement in forward_sql if forward else backward_sql:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0022_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_vendor_sql(True), run_vendor_sql(False)),
+    ]
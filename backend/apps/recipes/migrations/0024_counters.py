@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorited_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Раз добавлен в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Раз добавлен в корзину'),
+        ),
+    ]
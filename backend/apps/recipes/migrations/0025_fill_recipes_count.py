@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    FoodgramUser = apps.get_model('users', 'FoodgramUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FoodgramUser.objects.update(
+        recipes_count=Coalesce(
+            Subquery(
+                Recipe.objects.filter(author=OuterRef('pk'))
+                .order_by()
+                .values('author')
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_counters'),
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
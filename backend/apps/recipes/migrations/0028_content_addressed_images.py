@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:13
+
+import common.fields
+import common.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0027_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=common.fields.ContentAddressedImageField(db_index=True, storage=common.storage.ContentAddressedStorage(), upload_to='recipes/images/', verbose_name='Картинка'),
+        ),
+    ]
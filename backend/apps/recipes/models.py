@@ -1,11 +1,18 @@
+from typing import Callable
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Expression, Prefetch
+from django.utils import timezone
 
 from common.const import (
     MAX_NAME_LENGTH,
     MAX_SLUG_LENGTH,
 )
+from common.counters import CounterModelMixin
+from common.fields import ContentAddressedImageField
 
 from .const import (
     MAX_UNIT_LENGTH,
@@ -55,11 +62,48 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    # Filled by the apps which add per-viewer flags to recipe output.
+    # Maps annotation name to a factory building its expression for a user.
+    viewer_annotations: dict[str, Callable[[AbstractUser], Expression]] = {}
+
+    def with_related(self) -> 'RecipeQuerySet':
+        """Load author, tags and ingredients along with recipes."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_to_ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('id'),
+            ),
+        )
+
+    def touch(self) -> int:
+        """Mark recipes as modified now."""
+        return self.update(updated_at=timezone.now())
+
+    def with_viewer_flags(self, user: AbstractUser) -> 'RecipeQuerySet':
+        """Annotate recipes with flags specific to the viewing user."""
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            **{
+                name: factory(user)
+                for name, factory in self.viewer_annotations.items()
+            }
+        )
+
+
+class Recipe(CounterModelMixin, models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
     name = models.CharField(
         max_length=MAX_NAME_LENGTH,
         verbose_name='Название',
@@ -79,10 +123,17 @@ class Recipe(models.Model):
     text = models.TextField(
         verbose_name='Описание',
     )
-    image = models.ImageField(
+    image = ContentAddressedImageField(
         upload_to='recipes/images/',
         verbose_name='Картинка',
     )
+    # Responsive variants of the image, see common.variants
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты картинки',
+    )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Теги',
@@ -92,11 +143,31 @@ class Recipe(models.Model):
         through='RecipeIngredient',
         verbose_name='Ингредиенты',
     )
+    # Denormalized counters, see common.counters
+    favorited_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Раз добавлен в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Раз добавлен в корзину',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            # Newest recipes of given authors, e.g. for subscription feed
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.name} - {self.author}'
@@ -0,0 +1,143 @@
+"""Full-text search over recipe name and description.
+
+Index is created by migration 0023_recipe_search_index:
+- PostgreSQL: `search_vector` tsvector column which is filled by trigger
+  with russian text configuration and covered by GIN index.
+- SQLite: `recipes_recipe_fts` FTS5 table which is filled here on recipe
+  save and delete.
+
+Other databases fall back to substring search without an index.
+"""
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import connection
+from django.db.models import (
+    F,
+    FloatField,
+    Q,
+    QuerySet,
+    Value,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Recipe
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+# Relative weights of name and description in SQLite ranking
+FTS_WEIGHTS = (10.0, 1.0)
+
+
+def _fts_query(query: str) -> str:
+    """Build FTS5 query matching every word of user query as a prefix."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def _search_postgresql(queryset: QuerySet, query: str) -> QuerySet:
+    search_query = SearchQuery(
+        query, config='russian', search_type='websearch'
+    )
+    return (
+        queryset.alias(
+            search_vector=RawSQL(
+                f'{Recipe._meta.db_table}.search_vector',
+                [],
+                output_field=SearchVectorField(),
+            )
+        )
+        .filter(search_vector=search_query)
+        .annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), search_query),
+                FloatField(),
+            )
+        )
+    )
+
+
+def _search_sqlite(queryset: QuerySet, query: str) -> QuerySet:
+    if not (fts_query := _fts_query(query)):
+        return queryset.none()
+    # Joined once, so the index is matched once per query and bm25() is
+    # computed from the joined row
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = {Recipe._meta.db_table}.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[fts_query],
+    ).annotate(
+        search_rank=RawSQL(
+            f'-bm25({FTS_TABLE}, %s, %s)',
+            FTS_WEIGHTS,
+            output_field=FloatField(),
+        )
+    )
+
+
+def _search_fallback(queryset: QuerySet, query: str) -> QuerySet:
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def search_recipes(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter recipes by text query and order them by relevance.
+
+    Args:
+        queryset (QuerySet): Recipes to search in.
+        query (str): Text query.
+
+    Returns:
+        QuerySet: Matching recipes annotated with `search_rank` and ordered
+            by it (most relevant first).
+    """
+    search = {
+        'postgresql': _search_postgresql,
+        'sqlite': _search_sqlite,
+    }.get(connection.vendor, _search_fallback)
+    return search(queryset, query).order_by('-search_rank', '-pub_date', '-id')
+
+
+def index_recipe(recipe: Recipe) -> None:
+    """Update search index entry of recipe.
+
+    Only needed for SQLite, PostgreSQL index is updated by trigger.
+
+    Args:
+        recipe (Recipe): Saved recipe.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.id]
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, text) VALUES (%s, %s, %s)',
+            [recipe.id, recipe.name, recipe.text],
+        )
+
+
+def unindex_recipe(recipe_id: int) -> None:
+    """Remove recipe from search index.
+
+    Only needed for SQLite, PostgreSQL index is a column of recipe row.
+
+    Args:
+        recipe_id (int): Deleted recipe id.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+        )
@@ -1,10 +1,39 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from common.serializers import Base64ImageField
-from common.util import contains_duplicates
+from common.serializers import (
+    Base64ImageField,
+    ImageSrcsetField,
+    MultiPartJSONMixin,
+)
+from common.util import contains_duplicates, find_missing_ids
 from users.serializers import UserSerializer
 
+from .cache import cache_recipe, get_cached_recipe, invalidate_recipes
 from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .signals import recipe_ingredients_changed
+
+
+def _uncached_fields(serializer: serializers.Serializer) -> list[str]:
+    return serializer.viewer_fields + serializer.url_fields
+
+
+def _merge_fields(
+    serializer: serializers.Serializer, data: dict, instance
+) -> dict:
+    """Render uncached fields of instance into cached data in field order."""
+    uncached_fields = _uncached_fields(serializer)
+    merged = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name not in uncached_fields:
+            merged[name] = data[name]
+        elif (attribute := field.get_attribute(instance)) is None:
+            merged[name] = None
+        else:
+            merged[name] = field.to_representation(attribute)
+    return merged
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -20,10 +49,6 @@ class TagSerializer(serializers.ModelSerializer):
         tag_id = attrs['id']
         if not isinstance(tag_id, int):
             raise serializers.ValidationError(f'{tag_id} is not an integer!')
-        if not Tag.objects.filter(id=tag_id).exists():
-            raise serializers.ValidationError(
-                f'Тег с id {tag_id} не существует!'
-            )
         return attrs
 
 
@@ -48,21 +73,16 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ['id', 'amount', 'name', 'measurement_unit']
 
-    def validate_id(self, value: int) -> int:
-        if not Ingredient.objects.filter(id=value).exists():
-            raise serializers.ValidationError(
-                f'Ингредиент с id {value} не существует!'
-            )
-        return value
-
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField('image')
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_srcset', 'cooking_time']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(MultiPartJSONMixin, serializers.ModelSerializer):
     tags = TagSerializer(
         many=True,
         allow_empty=False,
@@ -73,6 +93,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         source='recipe_to_ingredient',
     )
     image = Base64ImageField(required=False)
+    image_srcset = ImageSrcsetField('image')
     author = UserSerializer(read_only=True)
 
     class Meta:
@@ -84,15 +105,64 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name',
             'author',
             'image',
+            'image_srcset',
             'cooking_time',
             'text',
         ]
 
+    # Fields which depend on requesting user and are never cached.
+    # Filled by the apps which add those fields.
+    viewer_fields = []
+    # Absolute URLs are built from the host of the request, so they are
+    # rendered from the stored file names every time instead of cached
+    url_fields = ['image', 'image_srcset']
+
+    def to_representation(self, recipe: Recipe) -> dict:
+        # Author is joined to the recipe row, so viewer flags about the
+        # author are annotated on the recipe and passed down to it here.
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+
+        if (data := get_cached_recipe(recipe.id)) is None:
+            data = super().to_representation(recipe)
+            cache_recipe(recipe.id, self._strip_uncached_fields(data))
+            return data
+
+        return self._merge_uncached_fields(data, recipe)
+
+    def _strip_uncached_fields(self, data: dict) -> dict:
+        uncached_fields = _uncached_fields(self)
+        author_uncached_fields = _uncached_fields(self.fields['author'])
+        public_data = {
+            key: value
+            for key, value in data.items()
+            if key not in uncached_fields
+        }
+        public_data['author'] = {
+            key: value
+            for key, value in data['author'].items()
+            if key not in author_uncached_fields
+        }
+        return public_data
+
+    def _merge_uncached_fields(self, data: dict, recipe: Recipe) -> dict:
+        data = _merge_fields(self, data, recipe)
+        data['author'] = _merge_fields(
+            self.fields['author'], data['author'], recipe.author
+        )
+        return data
+
     def validate_ingredients(self, value: list[dict]) -> list[dict]:
         if contains_duplicates(value, lambda x: x['ingredient']['id']):
             raise serializers.ValidationError(
                 'Нельзя добавить 2 одинаковых ингредиента!'
             )
+        if missing_ids := find_missing_ids(
+            Ingredient, [item['ingredient']['id'] for item in value]
+        ):
+            raise serializers.ValidationError(
+                f'Ингредиенты с id {missing_ids} не существуют!'
+            )
         return value
 
     def validate_tags(self, value: list[dict]) -> list[dict]:
@@ -100,6 +170,10 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Нельзя присвоить 2 одинаковых тега!'
             )
+        if missing_ids := find_missing_ids(Tag, [tag['id'] for tag in value]):
+            raise serializers.ValidationError(
+                f'Теги с id {missing_ids} не существуют!'
+            )
         return value
 
     def validate(self, attrs: dict) -> dict:
@@ -115,32 +189,117 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', [])
         image = validated_data.pop('image', None)
 
-        if recipe is None:
-            recipe = Recipe.objects.create(**validated_data)
+        is_new = recipe is None
+        if is_new:
+            recipe = Recipe(**validated_data)
         else:
             for key, value in validated_data.items():
                 setattr(recipe, key, value)
 
-        recipe.ingredients.clear()
+        old_image = recipe.image.name if image else None
+        try:
+            with transaction.atomic():
+                if image:
+                    # The file is written by save()
+                    recipe.image = image
+                recipe.save()
+                self._write_ingredients(
+                    recipe,
+                    {
+                        item['ingredient']['id']: item['amount']
+                        for item in recipe_ingredients
+                    },
+                    is_new,
+                )
+                # set() itself only adds and removes the changed tags
+                recipe.tags.set([tag['id'] for tag in tags])
+        except Exception:
+            # No committed row references the new file, unless it is
+            # shared with other recipes
+            if image and recipe.image._committed:
+                recipe.image.storage.delete(recipe.image.name)
+            raise
 
-        for recipe_ingredient in recipe_ingredients:
-            ingredient = Ingredient.objects.get(
-                id=recipe_ingredient['ingredient']['id']
-            )
-            recipe.ingredients.add(
-                ingredient,
-                through_defaults={'amount': recipe_ingredient['amount']},
-            )
+        # Old image is only removed once the new one is committed
+        if old_image:
+            storage = recipe.image.storage
+            transaction.on_commit(lambda: storage.delete(old_image))
+        invalidate_recipes([recipe.id])
+        # Response needs related rows, load them in a constant number of
+        # queries instead of one per ingredient.
+        recipes = Recipe.objects.with_related()
+        if request := self.context.get('request'):
+            recipes = recipes.with_viewer_flags(request.user)
+        return recipes.get(pk=recipe.pk)
 
-        recipe.tags.set(Tag.objects.get(id=tag['id']) for tag in tags)
+    @staticmethod
+    def _write_ingredients(
+        recipe: Recipe,
+        amounts: dict[int, int],
+        is_new: bool,
+    ) -> None:
+        """Bring recipe ingredient rows in line with submitted amounts.
 
-        if image:
-            if recipe.image:
-                recipe.image.delete()
-            recipe.image = image
+        Only rows which are actually added, removed or have their amount
+        changed are written.
+
+        Args:
+            recipe (Recipe): Saved recipe.
+            amounts (dict[int, int]): Submitted amounts by ingredient id.
+            is_new (bool): Whether recipe was just created and has no rows.
+        """
+        stored = (
+            {}
+            if is_new
+            else {
+                row.ingredient_id: row
+                for row in RecipeIngredient.objects.filter(recipe=recipe).only(
+                    'id', 'ingredient_id', 'amount'
+                )
+            }
+        )
 
-        recipe.save()
-        return recipe
+        deltas = {}
+
+        removed_ids = []
+        for ingredient_id, row in stored.items():
+            if ingredient_id not in amounts:
+                removed_ids.append(row.id)
+                deltas[ingredient_id] = -row.amount
+        if removed_ids:
+            RecipeIngredient.objects.filter(id__in=removed_ids).delete()
+
+        changed_rows = []
+        for ingredient_id, row in stored.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed_rows.append(row)
+        if changed_rows:
+            RecipeIngredient.objects.bulk_update(changed_rows, ['amount'])
+
+        added_rows = [
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in stored
+        ]
+        if added_rows:
+            RecipeIngredient.objects.bulk_create(added_rows)
+            deltas.update(
+                (row.ingredient_id, row.amount) for row in added_rows
+            )
+
+        if deltas and not is_new:
+            recipe_ingredients_changed.send(
+                sender=Recipe,
+                instance=recipe,
+                deltas=deltas,
+            )
 
     def create(self, validated_data):
         return self._write(validated_data)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver, Signal
+
+from common.counters import register_counter
+from common.variants import register_variants
+
+from .cache import (
+    bump_catalog_version,
+    invalidate_recipes,
+    invalidate_tag_map,
+)
+from .models import Ingredient, Recipe, Tag
+from .search import index_recipe, unindex_recipe
+
+# Sent by recipe writers after ingredients of an existing recipe change.
+# Arguments: `instance` - the recipe, `deltas` - amount changes by
+# ingredient id.
+recipe_ingredients_changed = Signal()
+
+register_counter(get_user_model(), 'recipes_count', Recipe, 'author')
+
+
+def image_variants_ready(recipe_id: int) -> None:
+    invalidate_recipes([recipe_id])
+    Recipe.objects.filter(id=recipe_id).touch()
+
+
+register_variants(Recipe, 'image', on_ready=image_variants_ready)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance: Recipe, **kwargs) -> None:
+    index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance: Recipe, **kwargs) -> None:
+    unindex_recipe(instance.id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_catalog_changed(sender, **kwargs) -> None:
+    bump_catalog_version('ingredients')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_catalog_changed(sender, **kwargs) -> None:
+    bump_catalog_version('tags')
+    invalidate_tag_map()
@@ -1,12 +1,33 @@
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Count, Max, QuerySet
+from django.http.response import HttpResponseBase
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from short_link.serializers import ShortLinkSerializer
 
-from .filters import IngredientFilter, RecipeFilter
+from common.views import (
+    ConditionalGetMixin,
+    PrerenderedResponse,
+    ResourceState,
+)
+
+from .autocomplete import get_ingredient_index
+from .cache import invalidate_recipes
+from .catalog import CatalogSnapshot, get_catalog_snapshot
+from .const import (
+    AUTOCOMPLETE_MAX_LIMIT,
+    CATALOG_MAX_AGE,
+    LOCAL_CATALOG_VERSION_TIMEOUT,
+)
+from .filters import RecipeFilter
 from .models import Ingredient, Recipe, Tag
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
@@ -16,33 +37,159 @@ from .serializers import (
 )
 
 
-class IngredientsView(ReadOnlyModelViewSet):
+class CatalogSnapshotMixin(ConditionalGetMixin):
+    """Serve near-static table from pre-rendered in-memory snapshot.
+
+    Neither list nor detail requests touch the database unless the table
+    was changed since the snapshot was built.
+    """
+
+    # Name of catalog whose version is bumped when the table changes
+    catalog = None
+
+    @property
+    def cache_max_age(self) -> int:
+        # Not reused longer than other processes may serve stale data
+        if settings.SHARED_CACHE:
+            return CATALOG_MAX_AGE
+        return LOCAL_CATALOG_VERSION_TIMEOUT
+
+    def get_snapshot(self) -> CatalogSnapshot:
+        return get_catalog_snapshot(
+            self.catalog,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        snapshot = self.get_snapshot()
+        return self._respond_conditionally(
+            (snapshot.version,),
+            None,
+            lambda: PrerenderedResponse(snapshot.items, snapshot.list_content),
+        )
+
+    def retrieve(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        snapshot = self.get_snapshot()
+        try:
+            item_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise NotFound
+        if item_id not in snapshot.items_by_id:
+            raise NotFound
+        return self._respond_conditionally(
+            (snapshot.version,),
+            None,
+            lambda: PrerenderedResponse(
+                snapshot.items_by_id[item_id],
+                snapshot.content_by_id[item_id],
+            ),
+        )
+
+
+class IngredientsView(CatalogSnapshotMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    catalog = 'ingredients'
     permission_classes = [AllowAny]
     pagination_class = None
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = IngredientFilter
 
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        """List ingredients or autocomplete them by `name` if it is given.
+
+        Autocomplete is answered from in-memory index without database
+        queries. Only `limit` best matches are returned if it is given.
+        """
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        index = get_ingredient_index()
+        return self._respond_conditionally(
+            (request.get_full_path(), index.catalog_version, index.built_at),
+            None,
+            lambda: Response(
+                index.search(
+                    request.query_params['name'],
+                    self._get_autocomplete_limit(),
+                )
+            ),
+        )
+
+    def _get_autocomplete_limit(self) -> Optional[int]:
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return None
+        if limit <= 0:
+            return None
+        return min(limit, AUTOCOMPLETE_MAX_LIMIT)
 
-class TagsView(ReadOnlyModelViewSet):
+
+class TagsView(CatalogSnapshotMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    catalog = 'tags'
     permission_classes = [AllowAny]
     pagination_class = None
 
 
-class RecipesView(ModelViewSet):
+class RecipesView(ConditionalGetMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    # Image is sent either as Base64 in JSON or as a binary multipart part
+    parser_classes = [JSONParser, MultiPartParser]
     permission_classes = [IsAuthorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    viewer_dependent = True
+    lookup_value_regex = r'\d+'
+
+    @property
+    def cursor_ordering(self) -> tuple[str, ...]:
+        if self.request.query_params.get('search'):
+            # Most relevant first, as ordered by search
+            return ('-search_rank', '-pub_date', '-id')
+        return ('-pub_date', '-id')
+
+    def get_queryset(self) -> QuerySet:
+        if self.action not in ('list', 'retrieve'):
+            return super().get_queryset()
+        return (
+            super()
+            .get_queryset()
+            .with_related()
+            .with_viewer_flags(self.request.user)
+        )
+
+    def get_state_queryset(self) -> QuerySet:
+        # Without viewer flags and related rows, filters only
+        return super().get_queryset()
+
+    def get_list_state(self, queryset: QuerySet) -> ResourceState:
+        state = queryset.order_by().aggregate(
+            count=Count('id'),
+            last_modified=Max('updated_at'),
+        )
+        last_modified = state['last_modified']
+        return (state['count'], last_modified), last_modified
+
+    def get_detail_state(self) -> ResourceState:
+        updated_at = (
+            Recipe.objects.filter(pk=self.kwargs['pk'])
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None, None
+        return (self.kwargs['pk'], updated_at), updated_at
 
     def perform_create(self, serializer: RecipeSerializer) -> None:
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, recipe: Recipe) -> None:
+        recipe_id = recipe.id
+        super().perform_destroy(recipe)
+        invalidate_recipes([recipe_id])
+
     def partial_update(self, request: Request, *args, **kwargs) -> Response:
         return super().update(request, *args, **kwargs)
 
@@ -1,20 +1,28 @@
 from django.contrib import admin
 
+from recipes.admin import RecipeAdmin
 from users.admin import UserAdmin
 
-from .models import ShoppingCart
+from .models import ShoppingCartRecipe
 
 
-class ShoppingCartInline(admin.StackedInline):
-    model = ShoppingCart
-    filter_horizontal = ['recipes']
+class ShoppingCartRecipeInline(admin.TabularInline):
+    model = ShoppingCartRecipe
+    fk_name = 'user'
+    raw_id_fields = ['recipe']
+    readonly_fields = ['created_at']
+    extra = 0
 
 
-@admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ['user']
-    list_display_links = ['user']
-    filter_horizontal = ['recipes']
+@admin.register(ShoppingCartRecipe)
+class ShoppingCartRecipeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'recipe', 'created_at']
+    list_display_links = ['user', 'recipe']
+    list_select_related = ['user', 'recipe']
+    raw_id_fields = ['user', 'recipe']
+    search_fields = ['user__username', 'recipe__name']
 
 
-UserAdmin.inlines += [ShoppingCartInline]
+RecipeAdmin.list_display += ['in_carts_count']
+
+UserAdmin.inlines += [ShoppingCartRecipeInline]
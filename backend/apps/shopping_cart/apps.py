@@ -8,4 +8,4 @@ class ShoppingCartConfig(AppConfig):
 
     def ready(self) -> None:
         # Need these imports to execute code inside modules
-        from . import filters, serializers  # noqa: F401
+        from . import filters, serializers, signals  # noqa: F401
@@ -0,0 +1,77 @@
+"""Shopping list export formats.
+
+Every format is a generator over aggregated ingredient rows, so the list
+is sent to the client while rows are still being read from the database.
+"""
+
+import csv
+import json
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+# Rows as returned by totals.get_shopping_list
+IngredientRows = Iterable[dict]
+
+ROW_FIELDS = ('name', 'measurement_unit', 'amount')
+
+
+class ShoppingListFormat(NamedTuple):
+    content_type: str
+    extension: str
+    render: Callable[[IngredientRows], Iterator[str]]
+
+
+class _Echo:
+    """File-like object which returns written value instead of storing."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_txt(rows: IngredientRows) -> Iterator[str]:
+    # Lines are separated, not terminated, like the original export
+    separator = ''
+    for row in rows:
+        yield (
+            f'{separator}{row["name"]} ({row["amount"]}) - '
+            f'{row["measurement_unit"]}'
+        )
+        separator = '\n'
+
+
+def render_csv(rows: IngredientRows) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ROW_FIELDS)
+    for row in rows:
+        yield writer.writerow([row[field] for field in ROW_FIELDS])
+
+
+def _markdown_cell(value) -> str:
+    return str(value).replace('|', r'\|')
+
+
+def render_markdown(rows: IngredientRows) -> Iterator[str]:
+    yield '| Ингредиент | Количество | Единица измерения |\n'
+    yield '| --- | ---: | --- |\n'
+    for row in rows:
+        cells = (row['name'], row['amount'], row['measurement_unit'])
+        yield '| {} |\n'.format(' | '.join(map(_markdown_cell, cells)))
+
+
+def render_jsonl(rows: IngredientRows) -> Iterator[str]:
+    for row in rows:
+        yield (
+            json.dumps(
+                {field: row[field] for field in ROW_FIELDS},
+                ensure_ascii=False,
+            )
+            + '\n'
+        )
+
+
+FORMATS = {
+    'txt': ShoppingListFormat('text/plain', 'txt', render_txt),
+    'csv': ShoppingListFormat('text/csv', 'csv', render_csv),
+    'markdown': ShoppingListFormat('text/markdown', 'md', render_markdown),
+    'jsonl': ShoppingListFormat('application/x-ndjson', 'jsonl', render_jsonl),
+}
+DEFAULT_FORMAT = 'txt'
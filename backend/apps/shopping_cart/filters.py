@@ -3,6 +3,7 @@ from django_filters import TypedChoiceFilter
 
 from common.const import BOOLEAN_NUMBER_CHOICES
 from recipes.filters import RecipeFilter
+from recipes.models import RecipeQuerySet
 
 
 def is_in_current_user_shopping_cart(
@@ -11,10 +12,12 @@ def is_in_current_user_shopping_cart(
     if self.request.user.is_anonymous:
         return queryset.none()
 
-    lookup_params = {'shopping_carts__user__in': [self.request.user]}
+    is_in_shopping_cart = RecipeQuerySet.viewer_annotations[
+        'is_in_shopping_cart'
+    ](self.request.user)
     if not value:
-        return queryset.exclude(**lookup_params)
-    return queryset.filter(**lookup_params)
+        return queryset.filter(~is_in_shopping_cart)
+    return queryset.filter(is_in_shopping_cart)
 
 
 RecipeFilter.base_filters['is_in_shopping_cart'] = TypedChoiceFilter(
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shopping_cart.totals import (
+    compute_totals,
+    find_mismatches,
+    get_stored_totals,
+    rebuild_totals,
+)
+
+# Max number of mismatching items printed
+MAX_REPORTED_MISMATCHES = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитать суммарные количества ингредиентов в корзинах '
+        'и проверить их согласованность.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить таблицу, ничего не изменяя.',
+        )
+
+    def handle(self, *args, check: bool, **options) -> None:
+        if not check:
+            count = rebuild_totals()
+            self.stdout.write(f'Пересчитано позиций: {count}')
+
+        mismatches = find_mismatches(compute_totals(), get_stored_totals())
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        for (user_id, ingredient_id), (expected, stored) in sorted(
+            mismatches.items()
+        )[:MAX_REPORTED_MISMATCHES]:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидалось {expected}, сохранено {stored}'
+            )
+        raise CommandError(f'Найдено расхождений: {len(mismatches)}')
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import F, Sum
+
+
+def fill_shopping_list_items(apps, schema_editor):
+    ShoppingCart = apps.get_model('shopping_cart', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('shopping_cart', 'ShoppingListItem')
+    rows = (
+        ShoppingCart.recipes.through.objects.values(
+            user_id=F('shoppingcart__user_id'),
+            ingredient_id=F('recipe__recipe_to_ingredient__ingredient_id'),
+        )
+        .filter(ingredient_id__isnull=False)
+        .annotate(total=Sum('recipe__recipe_to_ingredient__amount'))
+        .values_list('user_id', 'ingredient_id', 'total')
+        .order_by()
+    )
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            amount=amount,
+        )
+        for user_id, ingredient_id, amount in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_cart', '0002_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_shopping_list_items,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def copy_shopping_carts(apps, schema_editor):
+    ShoppingCart = apps.get_model('shopping_cart', 'ShoppingCart')
+    ShoppingCartRecipe = apps.get_model('shopping_cart', 'ShoppingCartRecipe')
+    rows = (
+        ShoppingCart.recipes.through.objects.values_list(
+            'shoppingcart__user_id', 'recipe_id'
+        )
+        .order_by('id')
+    )
+    ShoppingCartRecipe.objects.bulk_create(
+        (
+            ShoppingCartRecipe(user_id=user_id, recipe_id=target_id)
+            for user_id, target_id in rows
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def copy_shopping_carts_back(apps, schema_editor):
+    ShoppingCart = apps.get_model('shopping_cart', 'ShoppingCart')
+    ShoppingCartRecipe = apps.get_model('shopping_cart', 'ShoppingCartRecipe')
+    Through = ShoppingCart.recipes.through
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=user_id)
+        for user_id in ShoppingCartRecipe.objects.values_list(
+            'user_id', flat=True
+        ).distinct()
+    )
+    list_ids = dict(ShoppingCart.objects.values_list('user_id', 'id'))
+    Through.objects.bulk_create(
+        (
+            Through(
+                shoppingcart_id=list_ids[user_id],
+                recipe_id=target_id,
+            )
+            for user_id, target_id in ShoppingCartRecipe.objects.values_list(
+                'user_id', 'recipe_id'
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0023_recipe_search_index'),
+        ('shopping_cart', '0003_fill_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='in_shopping_carts', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_recipes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в корзине',
+                'verbose_name_plural': 'Рецепты в корзинах',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcartrecipe',
+            index=models.Index(fields=['recipe', 'user'], name='shopping_cart_recipe_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartrecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart_recipe'),
+        ),
+        migrations.RunPython(copy_shopping_carts, copy_shopping_carts_back),
+        migrations.DeleteModel(
+            name='ShoppingCart',
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_in_carts_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShoppingCartRecipe = apps.get_model('shopping_cart', 'ShoppingCartRecipe')
+    Recipe.objects.update(
+        in_carts_count=Coalesce(
+            Subquery(
+                ShoppingCartRecipe.objects.filter(recipe=OuterRef('pk'))
+                .order_by()
+                .values('recipe')
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping_cart', '0004_edge_table'),
+        ('recipes', '0024_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_in_carts_count, migrations.RunPython.noop),
+    ]
@@ -1,30 +1,119 @@
-from annoying.fields import AutoOneToOneField
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
 
-from recipes.models import Recipe
+from recipes.models import Ingredient, Recipe
 
 User = get_user_model()
 
+# Sent before cart rows are deleted by a queryset or one by one.
+# Arguments: `rows` - (user id, recipe id) of every deleted row.
+cart_recipes_deleting = Signal()
 
-class ShoppingCart(models.Model):
-    user = AutoOneToOneField(
+
+class ShoppingCartRecipeQuerySet(models.QuerySet):
+    def delete(self) -> tuple[int, dict[str, int]]:
+        # Rows are locked, so concurrent deletes of a row report it once
+        with transaction.atomic(using=self.db):
+            cart_recipes_deleting.send(
+                sender=self.model,
+                rows=list(
+                    self.select_for_update().values_list(
+                        'user_id', 'recipe_id'
+                    )
+                ),
+            )
+            return super().delete()
+
+
+class ShoppingCartRecipe(models.Model):
+    """Recipe added to shopping cart by user.
+
+    Unique constraint on (user, recipe) serves lookups by user, index on
+    (recipe, user) serves lookups by recipe.
+    """
+
+    user = models.ForeignKey(
         User,
-        related_name='shopping_cart',
+        related_name='shopping_cart_recipes',
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь',
     )
-    recipes = models.ManyToManyField(
+    recipe = models.ForeignKey(
         Recipe,
-        related_name='shopping_carts',
-        verbose_name='Рецепты',
-        blank=True,
+        related_name='in_shopping_carts',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Рецепт',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата добавления',
+    )
+
+    objects = ShoppingCartRecipeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Рецепт в корзине'
+        verbose_name_plural = 'Рецепты в корзинах'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart_recipe',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shopping_cart_recipe_user_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.recipe}'
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic(using=using):
+            cart_recipes_deleting.send(
+                sender=ShoppingCartRecipe,
+                rows=[(self.user_id, self.recipe_id)],
+            )
+            return super().delete(using, keep_parents)
+
+
+class ShoppingListItem(models.Model):
+    """Total amount of ingredient over all recipes in user's cart.
+
+    Kept up to date incrementally by `shopping_cart.signals`, can be
+    rebuilt with `rebuild_shopping_totals` management command.
+    """
+
+    user = models.ForeignKey(
+        User,
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
     )
+    amount = models.IntegerField(verbose_name='Количество')
 
     class Meta:
-        verbose_name = 'Корзина'
-        verbose_name_plural = 'Корзины'
-        ordering = ['user__username']
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        ordering = ['user__username', 'ingredient__name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            ),
+        ]
 
     def __str__(self) -> str:
-        return f'Список покупок {self.user}'
+        return f'{self.user} - {self.ingredient} ({self.amount})'
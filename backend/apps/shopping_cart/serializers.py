@@ -1,20 +1,33 @@
+from django.db.models import Exists, OuterRef
 from rest_framework.serializers import SerializerMethodField
 
-from recipes.models import Recipe
+from recipes.models import Recipe, RecipeQuerySet
 from recipes.serializers import RecipeSerializer
 
+from .models import ShoppingCartRecipe
+
 
 def get_is_in_shopping_cart(self, recipe: Recipe) -> bool:
+    if (
+        is_in_shopping_cart := getattr(recipe, 'is_in_shopping_cart', None)
+    ) is not None:
+        return is_in_shopping_cart
     if not (request := self.context.get('request')):
         return False
     current_user = request.user
     if current_user.is_anonymous:
         return False
-    return recipe in current_user.shopping_cart.recipes.all()
+    return ShoppingCartRecipe.objects.filter(
+        user=current_user, recipe=recipe
+    ).exists()
 
 
 RecipeSerializer._declared_fields['is_in_shopping_cart'] = (
     SerializerMethodField()
 )
 RecipeSerializer.Meta.fields += ['is_in_shopping_cart']
+RecipeSerializer.viewer_fields += ['is_in_shopping_cart']
 RecipeSerializer.get_is_in_shopping_cart = get_is_in_shopping_cart
+RecipeQuerySet.viewer_annotations['is_in_shopping_cart'] = lambda user: Exists(
+    ShoppingCartRecipe.objects.filter(user=user, recipe=OuterRef('pk'))
+)
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from common.counters import register_counter
+from recipes.models import Recipe
+from recipes.signals import recipe_ingredients_changed
+
+from .models import cart_recipes_deleting, ShoppingCartRecipe
+from .totals import apply_deltas, apply_recipes, remove_cart_recipes
+
+register_counter(Recipe, 'in_carts_count', ShoppingCartRecipe, 'recipe')
+
+
+@receiver(post_save, sender=ShoppingCartRecipe)
+def update_totals_on_cart_add(
+    sender,
+    instance: ShoppingCartRecipe,
+    created: bool,
+    **kwargs,
+) -> None:
+    if created:
+        apply_recipes([instance.user_id], [instance.recipe_id], 1)
+
+
+@receiver(cart_recipes_deleting, sender=ShoppingCartRecipe)
+def update_totals_on_cart_remove(
+    sender,
+    rows: list[tuple[int, int]],
+    **kwargs,
+) -> None:
+    remove_cart_recipes(rows)
+
+
+@receiver(pre_delete, sender=Recipe)
+def update_totals_on_recipe_delete(
+    sender,
+    instance: Recipe,
+    **kwargs,
+) -> None:
+    # Carts are deleted by the cascade, which bypasses the queryset, and
+    # ingredients still exist until every pre_delete is sent. Carts of
+    # deleted users need nothing, their totals are deleted with them.
+    apply_recipes(
+        instance.in_shopping_carts.select_for_update().values_list(
+            'user_id', flat=True
+        ),
+        [instance.pk],
+        -1,
+    )
+
+
+@receiver(recipe_ingredients_changed, sender=Recipe)
+def update_totals_on_ingredients_change(
+    sender,
+    instance: Recipe,
+    deltas: dict[int, int],
+    **kwargs,
+) -> None:
+    apply_deltas(
+        instance.in_shopping_carts.values_list('user_id', flat=True),
+        deltas,
+    )
@@ -0,0 +1,236 @@
+"""Per-user ingredient totals of shopping carts.
+
+Totals are stored in ShoppingListItem and changed by deltas whenever
+recipes are added to or removed from carts or ingredients of a recipe in
+carts change, so the shopping list is read without aggregation.
+"""
+
+from collections import defaultdict
+from typing import Iterable
+
+from django.contrib.auth.models import AbstractUser
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, QuerySet, Sum, Value, When
+
+from recipes.models import RecipeIngredient
+
+from .models import ShoppingCartRecipe, ShoppingListItem
+
+# Amount change by ingredient id
+Deltas = dict[int, int]
+# Amount by (user id, ingredient id)
+Totals = dict[tuple[int, int], int]
+
+
+def get_recipe_amounts(recipe_ids: Iterable[int]) -> Deltas:
+    """Sum ingredient amounts over recipes.
+
+    Args:
+        recipe_ids (Iterable[int]): Recipe ids.
+
+    Returns:
+        Deltas: Summed amounts by ingredient id.
+    """
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id__in=list(recipe_ids))
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+        .order_by()
+    )
+
+
+def apply_deltas(user_ids: Iterable[int], deltas: Deltas) -> None:
+    """Add amount changes to totals of every user.
+
+    Items which drop to zero are deleted.
+
+    Args:
+        user_ids (Iterable[int]): Users whose totals change.
+        deltas (Deltas): Amount changes by ingredient id.
+    """
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items()
+        if delta
+    }
+    if not user_ids or not deltas:
+        return
+
+    with transaction.atomic():
+        # Missing items are inserted empty first and skipped if another
+        # transaction inserts them meanwhile, then every delta is added
+        # by a single update, so concurrent first additions both count
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=0,
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items()
+                if delta > 0
+            ),
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=deltas,
+        )
+        items.update(
+            amount=F('amount')
+            + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ),
+                output_field=IntegerField(),
+            )
+        )
+        items.filter(amount__lte=0).delete()
+
+
+def apply_recipes(
+    user_ids: Iterable[int],
+    recipe_ids: Iterable[int],
+    sign: int,
+) -> None:
+    """Add recipes to or subtract them from totals of every user.
+
+    Args:
+        user_ids (Iterable[int]): Users whose carts changed.
+        recipe_ids (Iterable[int]): Recipes added to or removed from carts.
+        sign (int): 1 if recipes were added, -1 if removed.
+    """
+    user_ids, recipe_ids = list(user_ids), list(recipe_ids)
+    if not user_ids or not recipe_ids:
+        return
+    apply_deltas(
+        user_ids,
+        {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in get_recipe_amounts(recipe_ids).items()
+        },
+    )
+
+
+def remove_cart_recipes(rows: Iterable[tuple[int, int]]) -> None:
+    """Subtract deleted cart rows from totals.
+
+    Users who removed the same recipes are updated together, so a recipe
+    removed from many carts costs a single update.
+
+    Args:
+        rows (Iterable[tuple[int, int]]): (user id, recipe id) of every
+            deleted row.
+    """
+    recipes_by_user = defaultdict(set)
+    for user_id, recipe_id in rows:
+        recipes_by_user[user_id].add(recipe_id)
+    users_by_recipes = defaultdict(list)
+    for user_id, recipe_ids in recipes_by_user.items():
+        users_by_recipes[frozenset(recipe_ids)].append(user_id)
+    for recipe_ids, user_ids in users_by_recipes.items():
+        apply_recipes(user_ids, recipe_ids, -1)
+
+
+def get_shopping_list(user: AbstractUser) -> QuerySet:
+    """Get shopping list rows of user.
+
+    Args:
+        user (AbstractUser): Cart owner.
+
+    Returns:
+        QuerySet: Rows with `name`, `measurement_unit` and `amount` of every
+            ingredient, ordered by name.
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        )
+        .order_by('name', 'measurement_unit')
+    )
+
+
+def compute_totals() -> Totals:
+    """Aggregate totals of every user from carts from scratch.
+
+    Returns:
+        Totals: Expected amounts by user and ingredient.
+    """
+    rows = (
+        ShoppingCartRecipe.objects.values(
+            'user_id',
+            ingredient_id=F('recipe__recipe_to_ingredient__ingredient_id'),
+        )
+        .filter(ingredient_id__isnull=False)
+        .annotate(total=Sum('recipe__recipe_to_ingredient__amount'))
+        .values_list('user_id', 'ingredient_id', 'total')
+        .order_by()
+    )
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in rows
+    }
+
+
+def get_stored_totals() -> Totals:
+    """Read stored totals of every user.
+
+    Returns:
+        Totals: Stored amounts by user and ingredient.
+    """
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in (
+            ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).order_by()
+        )
+    }
+
+
+def find_mismatches(
+    expected: Totals,
+    stored: Totals,
+) -> dict[tuple[int, int], tuple[int, int]]:
+    """Compare stored totals with expected ones.
+
+    Args:
+        expected (Totals): Totals computed from carts.
+        stored (Totals): Totals read from the table.
+
+    Returns:
+        dict: (expected, stored) amounts by user and ingredient for every
+            differing item, missing amounts are 0.
+    """
+    return {
+        key: (expected.get(key, 0), stored.get(key, 0))
+        for key in expected.keys() | stored.keys()
+        if expected.get(key, 0) != stored.get(key, 0)
+    }
+
+
+def rebuild_totals() -> int:
+    """Replace stored totals with ones computed from carts.
+
+    Returns:
+        int: Number of stored items.
+    """
+    with transaction.atomic():
+        totals = compute_totals()
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for (user_id, ingredient_id), amount in totals.items()
+        )
+    return len(totals)
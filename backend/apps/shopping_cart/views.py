@@ -1,5 +1,11 @@
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from rest_framework.decorators import action
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.status import (
@@ -9,25 +15,76 @@ from rest_framework.status import (
 )
 from rest_framework.viewsets import GenericViewSet
 
+from common.cache import touch_viewer_state
+from common.util import delete_if_present, insert_if_absent
 from recipes.models import Recipe
 from recipes.serializers import ShortRecipeSerializer
 
-from .util import generate_shopping_list
+from .export import DEFAULT_FORMAT, FORMATS
+from .models import ShoppingCartRecipe
+from .totals import get_shopping_list
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Content negotiation which leaves `format` query parameter alone.
+
+    Shopping list formats are not renderers, so the parameter must not be
+    used to pick one. Errors are rendered with the first renderer.
+    """
+
+    def select_renderer(
+        self,
+        request: Request,
+        renderers: list[BaseRenderer],
+        format_suffix: str = None,
+    ) -> tuple[BaseRenderer, str]:
+        return renderers[0], renderers[0].media_type
 
 
 class ShoppingCartView(GenericViewSet):
-    queryset = Recipe.objects.all()
+    # Only columns needed for the short recipe representation
+    queryset = Recipe.objects.only(
+        'id', 'name', 'image', 'image_variants', 'cooking_time'
+    )
+    lookup_value_regex = r'\d+'
 
     @action(
         detail=False,
         methods=['get'],
+        content_negotiation_class=ExportContentNegotiation,
     )
-    def download_shopping_cart(self, request: Request) -> HttpResponse:
-        recipes = request.user.shopping_cart.recipes.all()
-        return HttpResponse(
-            generate_shopping_list(recipes),
-            content_type='text/plain; charset=UTF-8',
+    def download_shopping_cart(self, request: Request) -> HttpResponseBase:
+        format_name = request.query_params.get('format', DEFAULT_FORMAT)
+        if (export_format := FORMATS.get(format_name)) is None:
+            return Response(
+                {
+                    'format': [
+                        f'Неизвестный формат {format_name}! '
+                        f'Доступные форматы: {", ".join(FORMATS)}.'
+                    ]
+                },
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        rows = get_shopping_list(request.user).iterator()
+        content = export_format.render(rows)
+        use_gzip = re_accepts_gzip.search(
+            request.headers.get('Accept-Encoding', '')
         )
+        if use_gzip:
+            content = compress_sequence(chunk.encode() for chunk in content)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=f'{export_format.content_type}; charset=UTF-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{export_format.extension}"'
+        )
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
 
     @action(
         detail=True,
@@ -37,10 +94,13 @@ class ShoppingCartView(GenericViewSet):
         recipe = self.get_object()
         current_user = request.user
 
-        if recipe in current_user.shopping_cart.recipes.all():
+        if not insert_if_absent(
+            ShoppingCartRecipe,
+            user=current_user,
+            recipe=recipe,
+        ):
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        current_user.shopping_cart.recipes.add(recipe)
+        touch_viewer_state(current_user)
 
         return Response(
             ShortRecipeSerializer(
@@ -52,11 +112,15 @@ class ShoppingCartView(GenericViewSet):
 
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request: Request, pk: int) -> Response:
-        recipe = self.get_object()
         current_user = request.user
 
-        if recipe not in current_user.shopping_cart.recipes.all():
+        if not delete_if_present(
+            ShoppingCartRecipe.objects.filter(
+                user=current_user,
+                recipe_id=pk,
+            )
+        ):
+            self.get_object()
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        current_user.shopping_cart.recipes.remove(recipe)
+        touch_viewer_state(current_user)
         return Response(status=HTTP_204_NO_CONTENT)
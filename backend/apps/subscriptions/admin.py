@@ -2,19 +2,24 @@ from django.contrib import admin
 
 from users.admin import UserAdmin
 
-from .models import UserSubscriptions
+from .models import Subscription
 
 
-class UserSubscriptionsInline(admin.StackedInline):
-    model = UserSubscriptions
-    filter_horizontal = ['users']
+class SubscriptionInline(admin.TabularInline):
+    model = Subscription
+    fk_name = 'user'
+    raw_id_fields = ['author']
+    readonly_fields = ['created_at']
+    extra = 0
 
 
-@admin.register(UserSubscriptions)
-class UserSubscriptionsAdmin(admin.ModelAdmin):
-    list_display = ['user']
-    list_display_links = ['user']
-    filter_horizontal = ['users']
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'author', 'created_at']
+    list_display_links = ['user', 'author']
+    list_select_related = ['user', 'author']
+    raw_id_fields = ['user', 'author']
+    search_fields = ['user__username', 'author__username']
 
 
-UserAdmin.inlines += [UserSubscriptionsInline]
+UserAdmin.inlines += [SubscriptionInline]
@@ -5,3 +5,7 @@ class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subscriptions'
     verbose_name = 'Подписки'
+
+    def ready(self) -> None:
+        # Need these imports to execute code inside modules
+        from . import serializers, signals  # noqa: F401
@@ -0,0 +1,12 @@
+FEED_STRATEGY_READ = 'read'
+FEED_STRATEGY_WRITE = 'write'
+
+# Max number of entries kept in a follower's feed inbox
+FEED_INBOX_SIZE = 500
+# Inboxes are trimmed only after growing this much over the size, so
+# publishing does not rank every inbox every time
+FEED_INBOX_SLACK = 50
+# Recipes of authors with more followers are not copied into inboxes and
+# are merged into feeds when read instead
+FEED_FANOUT_MAX_FOLLOWERS = 10_000
+FEED_FANOUT_BATCH_SIZE = 1000
@@ -0,0 +1,245 @@
+"""Feed of recipes published by authors the user is subscribed to.
+
+Two strategies are available, chosen by `SUBSCRIPTION_FEED_STRATEGY`
+setting:
+
+- fan-out-on-read: recipes of followed authors are merged when the feed
+  is read, using the (author, pub_date) index of recipes. Publishing is
+  free, reading costs grow with the number of followed authors.
+- fan-out-on-write: a published recipe is copied into `FeedEntry` inbox
+  of every follower, inboxes are capped at `FEED_INBOX_SIZE`. Reading
+  scans a single inbox. Recipes of authors with more than
+  `FEED_FANOUT_MAX_FOLLOWERS` followers are not copied and are merged
+  when read instead, so publishing never writes millions of rows.
+
+Both strategies return recipes annotated with `feed_pub_date` and
+`feed_recipe_id` and ordered by them newest first, so the feed is paged by
+keyset. For an inbox they are the columns of `FeedEntry` itself, so pages
+are read from its (user, pub_date, recipe) index without touching recipes
+which are not on the page.
+"""
+
+from collections import defaultdict
+from heapq import merge
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser
+from django.db import transaction
+from django.db.models import Count, F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe
+
+from .const import (
+    FEED_FANOUT_BATCH_SIZE,
+    FEED_FANOUT_MAX_FOLLOWERS,
+    FEED_INBOX_SIZE,
+    FEED_INBOX_SLACK,
+    FEED_STRATEGY_READ,
+    FEED_STRATEGY_WRITE,
+)
+from .models import FeedEntry, Subscription, User
+from .util import get_recent_recipes
+
+FEED_ORDERING = ('-feed_pub_date', '-feed_recipe_id')
+
+
+def _followed_authors(user: AbstractUser) -> QuerySet:
+    return Subscription.objects.filter(user=user).values('author_id')
+
+
+def _hot_authors() -> QuerySet:
+    return User.objects.filter(followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS)
+
+
+def read_feed(user: AbstractUser) -> QuerySet:
+    """Build feed by merging recipes of followed authors (fan-out-on-read)."""
+    return Recipe.objects.filter(
+        author_id__in=_followed_authors(user)
+    ).annotate(feed_pub_date=F('pub_date'), feed_recipe_id=F('id'))
+
+
+def inbox_feed(user: AbstractUser) -> QuerySet:
+    """Build feed from user's inbox (fan-out-on-write).
+
+    Recipes of followed authors which are too popular to be fanned out
+    are merged in when read.
+    """
+    hot_author_ids = list(
+        _followed_authors(user)
+        .filter(author__in=_hot_authors())
+        .values_list('author_id', flat=True)
+    )
+    if not hot_author_ids:
+        # Inbox only, ordered and sought by columns of its own index
+        return Recipe.objects.filter(feed_entries__user=user).annotate(
+            feed_pub_date=F('feed_entries__pub_date'),
+            feed_recipe_id=F('feed_entries__recipe_id'),
+        )
+    return Recipe.objects.filter(
+        Q(id__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+        | Q(author_id__in=hot_author_ids)
+    ).annotate(feed_pub_date=F('pub_date'), feed_recipe_id=F('id'))
+
+
+FEED_STRATEGIES: dict[str, Callable[[AbstractUser], QuerySet]] = {
+    FEED_STRATEGY_READ: read_feed,
+    FEED_STRATEGY_WRITE: inbox_feed,
+}
+
+
+def get_feed_strategy() -> str:
+    return settings.SUBSCRIPTION_FEED_STRATEGY
+
+
+def get_feed(user: AbstractUser, strategy: Optional[str] = None) -> QuerySet:
+    """Get recipes of authors the user is subscribed to.
+
+    Args:
+        user (AbstractUser): Feed owner.
+        strategy (Optional[str]): Feed strategy, configured one if None.
+
+    Returns:
+        QuerySet: Recipes ordered newest first by `FEED_ORDERING`.
+    """
+    return FEED_STRATEGIES[strategy or get_feed_strategy()](user).order_by(
+        *FEED_ORDERING
+    )
+
+
+def trim_inboxes(user_ids: Iterable[int]) -> int:
+    """Delete the oldest entries of inboxes grown over the size and slack.
+
+    Args:
+        user_ids (Iterable[int]): Owners of possibly overgrown inboxes.
+
+    Returns:
+        int: Number of deleted entries.
+    """
+    overgrown = list(
+        FeedEntry.objects.filter(user_id__in=list(user_ids))
+        .values('user_id')
+        .annotate(size=Count('id'))
+        .filter(size__gt=FEED_INBOX_SIZE + FEED_INBOX_SLACK)
+        .values_list('user_id', flat=True)
+        .order_by()
+    )
+    if not overgrown:
+        return 0
+    ranked = (
+        FeedEntry.objects.filter(user_id__in=overgrown)
+        .annotate(
+            entry_rank=Window(
+                RowNumber(),
+                partition_by=[F('user_id')],
+                order_by=[F('pub_date').desc(), F('recipe_id').desc()],
+            )
+        )
+        .values_list('id', 'entry_rank')
+        .order_by()
+    )
+    # Window functions can not be filtered in the same query
+    stale_ids = [
+        entry_id for entry_id, rank in ranked if rank > FEED_INBOX_SIZE
+    ]
+    deleted, _ = FeedEntry.objects.filter(id__in=stale_ids).delete()
+    return deleted
+
+
+def _create_entries(entries: Iterable[FeedEntry]) -> None:
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_recipe(recipe: Recipe) -> None:
+    """Deliver newly published recipe to inboxes of author's followers."""
+    if _hot_authors().filter(id=recipe.author_id).exists():
+        return
+    follower_ids = list(
+        Subscription.objects.filter(author_id=recipe.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    with transaction.atomic():
+        _create_entries(
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in follower_ids
+        )
+        trim_inboxes(follower_ids)
+
+
+def _backfill_entries(
+    subscriptions: Iterable[tuple[int, int]],
+) -> Iterator[FeedEntry]:
+    """Build inbox entries with the most recent recipes of followed authors.
+
+    Recipes of every author are newest first, so they are merged per user
+    and cut at the inbox size without building oversized inboxes.
+    """
+    authors_by_user = defaultdict(list)
+    for user_id, author_id in subscriptions:
+        authors_by_user[user_id].append(author_id)
+    recipes_by_author = get_recent_recipes(
+        {
+            author_id
+            for author_ids in authors_by_user.values()
+            for author_id in author_ids
+        },
+        FEED_INBOX_SIZE,
+    )
+    for user_id, author_ids in authors_by_user.items():
+        recipes = merge(
+            *(
+                recipes_by_author.get(author_id, [])
+                for author_id in author_ids
+            ),
+            key=lambda recipe: (recipe.pub_date, recipe.id),
+            reverse=True,
+        )
+        for recipe in islice(recipes, FEED_INBOX_SIZE):
+            yield FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.id,
+                pub_date=recipe.pub_date,
+            )
+
+
+def backfill_inbox(user_id: int, author_id: int) -> None:
+    """Deliver recent recipes of newly followed author to user's inbox."""
+    if _hot_authors().filter(id=author_id).exists():
+        return
+    with transaction.atomic():
+        _create_entries(_backfill_entries([(user_id, author_id)]))
+        trim_inboxes([user_id])
+
+
+def remove_from_inbox(user_id: int, author_id: int) -> None:
+    """Remove recipes of unfollowed author from user's inbox."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        recipe__author_id=author_id,
+    ).delete()
+
+
+def rebuild_inboxes() -> int:
+    """Refill every inbox from subscriptions from scratch.
+
+    Returns:
+        int: Number of stored entries.
+    """
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        subscriptions = Subscription.objects.exclude(
+            author__in=_hot_authors()
+        ).values_list('user_id', 'author_id')
+        _create_entries(_backfill_entries(subscriptions))
+        return FeedEntry.objects.count()
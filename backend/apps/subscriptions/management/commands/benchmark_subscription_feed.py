@@ -0,0 +1,200 @@
+from random import Random
+from time import perf_counter
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.test.utils import CaptureQueriesContext
+
+from common.counters import Counter, reconcile_counter
+from recipes.models import Recipe
+from subscriptions.const import FEED_STRATEGY_READ, FEED_STRATEGY_WRITE
+from subscriptions.feed import fan_out_recipe, get_feed, rebuild_inboxes
+from subscriptions.models import Subscription, User
+
+# Number of recipes published to measure fan-out cost
+MAX_PUBLISHED_RECIPES = 10
+
+
+def _read_pages(feed: QuerySet, pages: int, page_size: int) -> int:
+    """Walk feed pages by keyset like the feed endpoint does.
+
+    Returns:
+        int: Number of read pages.
+    """
+    last = None
+    for page_number in range(1, pages + 1):
+        page = feed
+        if last is not None:
+            pub_date, recipe_id = last
+            page = page.filter(
+                Q(feed_pub_date__lt=pub_date)
+                | Q(feed_pub_date=pub_date, feed_recipe_id__lt=recipe_id)
+            )
+        rows = list(
+            page.values_list('feed_pub_date', 'feed_recipe_id')[:page_size]
+        )
+        if len(rows) < page_size:
+            break
+        last = rows[-1]
+    return page_number
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнить стратегии ленты подписок на сгенерированных данных. '
+        'Данные создаются в транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--followers', type=int, default=200)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Количество авторов, на которых подписан каждый читатель.',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=20,
+            help='Количество рецептов каждого автора.',
+        )
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=20,
+            help='Количество читателей, чьи ленты читаются.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        for name in ('authors', 'followers', 'pages', 'page_size', 'readers'):
+            if options[name] < 1:
+                raise CommandError(f'Значение {name} должно быть больше 0')
+        with transaction.atomic():
+            self._run(**options)
+            transaction.set_rollback(True)
+
+    def _create_data(
+        self,
+        authors: int,
+        followers: int,
+        follows: int,
+        recipes: int,
+        random: Random,
+    ) -> tuple[list[int], list[int]]:
+        prefix = f'feed-benchmark-{uuid4().hex[:8]}'
+        User.objects.bulk_create(
+            User(
+                username=f'{prefix}-{i}',
+                email=f'{prefix}-{i}@example.com',
+                first_name='Benchmark',
+                last_name='User',
+            )
+            for i in range(authors + followers)
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=prefix)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        author_ids, follower_ids = user_ids[:authors], user_ids[authors:]
+
+        Subscription.objects.bulk_create(
+            Subscription(user_id=follower_id, author_id=author_id)
+            for follower_id in follower_ids
+            for author_id in random.sample(
+                author_ids, min(follows, len(author_ids))
+            )
+        )
+        reconcile_counter(
+            Counter(User, 'followers_count', Subscription, 'author')
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'{prefix} {i}',
+                text='Benchmark',
+                cooking_time=1,
+                image='recipes/images/benchmark.png',
+                author_id=author_id,
+            )
+            for author_id in author_ids
+            for i in range(recipes)
+        )
+        return author_ids, follower_ids
+
+    def _run(
+        self,
+        authors: int,
+        followers: int,
+        follows: int,
+        recipes: int,
+        pages: int,
+        page_size: int,
+        readers: int,
+        seed: int,
+        **options,
+    ) -> None:
+        random = Random(seed)
+        author_ids, follower_ids = self._create_data(
+            authors, followers, follows, recipes, random
+        )
+        self.stdout.write(
+            f'Авторов: {authors}, читателей: {followers}, подписок на '
+            f'читателя: {follows}, рецептов на автора: {recipes}'
+        )
+
+        started = perf_counter()
+        entries = rebuild_inboxes()
+        self.stdout.write(
+            f'{FEED_STRATEGY_WRITE}: заполнение лент '
+            f'({entries} записей): {perf_counter() - started:.3f} с'
+        )
+
+        published = [
+            Recipe.objects.create(
+                name='Benchmark',
+                text='Benchmark',
+                cooking_time=1,
+                image='recipes/images/benchmark.png',
+                author_id=author_id,
+            )
+            for author_id in author_ids[:MAX_PUBLISHED_RECIPES]
+        ]
+        with CaptureQueriesContext(connection) as context:
+            started = perf_counter()
+            for recipe in published:
+                fan_out_recipe(recipe)
+            elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{FEED_STRATEGY_WRITE}: публикация рецепта: '
+            f'{elapsed / len(published) * 1000:.2f} мс, '
+            f'{len(context) / len(published):.1f} запросов'
+        )
+
+        sample = list(
+            User.objects.filter(
+                id__in=random.sample(
+                    follower_ids, min(readers, len(follower_ids))
+                )
+            )
+        )
+        for strategy in (FEED_STRATEGY_READ, FEED_STRATEGY_WRITE):
+            read_pages = 0
+            with CaptureQueriesContext(connection) as context:
+                started = perf_counter()
+                for user in sample:
+                    read_pages += _read_pages(
+                        get_feed(user, strategy), pages, page_size
+                    )
+                elapsed = perf_counter() - started
+            self.stdout.write(
+                f'{strategy}: чтение ленты: '
+                f'{elapsed / read_pages * 1000:.2f} мс на страницу, '
+                f'{len(context) / read_pages:.1f} запросов на страницу'
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from subscriptions.feed import rebuild_inboxes
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполнить ленты подписок. Нужно после переключения '
+        'на стратегию fan-out-on-write.'
+    )
+
+    def handle(self, *args, **options) -> None:
+        count = rebuild_inboxes()
+        self.stdout.write(f'Записей в лентах: {count}')
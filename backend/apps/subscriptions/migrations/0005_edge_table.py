@@ -0,0 +1,95 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+import django.db.models.expressions
+
+BATCH_SIZE = 1000
+
+
+def copy_subscriptions(apps, schema_editor):
+    UserSubscriptions = apps.get_model('subscriptions', 'UserSubscriptions')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    rows = (
+        UserSubscriptions.users.through.objects.values_list(
+            'usersubscriptions__user_id', 'foodgramuser_id'
+        )
+        # Self-subscriptions violate the new check constraint
+        .exclude(usersubscriptions__user_id=F('foodgramuser_id'))
+        .order_by('id')
+    )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user_id=user_id, author_id=target_id)
+            for user_id, target_id in rows
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def copy_subscriptions_back(apps, schema_editor):
+    UserSubscriptions = apps.get_model('subscriptions', 'UserSubscriptions')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    Through = UserSubscriptions.users.through
+    UserSubscriptions.objects.bulk_create(
+        UserSubscriptions(user_id=user_id)
+        for user_id in Subscription.objects.values_list(
+            'user_id', flat=True
+        ).distinct()
+    )
+    list_ids = dict(UserSubscriptions.objects.values_list('user_id', 'id'))
+    Through.objects.bulk_create(
+        (
+            Through(
+                usersubscriptions_id=list_ids[user_id],
+                foodgramuser_id=target_id,
+            )
+            for user_id, target_id in Subscription.objects.values_list(
+                'user_id', 'author_id'
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('subscriptions', '0004_alter_usersubscriptions_users'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата подписки')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscribers', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Подписка',
+                'verbose_name_plural': 'Подписки',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['author', 'user'], name='subscription_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_subscription'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.CheckConstraint(check=models.Q(('user', django.db.models.expressions.F('author')), _negated=True), name='prevent_self_subscription'),
+        ),
+        migrations.RunPython(copy_subscriptions, copy_subscriptions_back),
+        migrations.DeleteModel(
+            name='UserSubscriptions',
+        ),
+    ]
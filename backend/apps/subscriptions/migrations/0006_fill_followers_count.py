@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    FoodgramUser = apps.get_model('users', 'FoodgramUser')
+    Subscription = apps.get_model('subscriptions', 'Subscription')
+    FoodgramUser.objects.update(
+        followers_count=Coalesce(
+            Subquery(
+                Subscription.objects.filter(author=OuterRef('pk'))
+                .order_by()
+                .values('author')
+                .annotate(count=Count('pk'))
+                .values('count')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0005_edge_table'),
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
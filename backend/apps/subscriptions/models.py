@@ -1,28 +1,100 @@
-from annoying.fields import AutoOneToOneField
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from recipes.models import Recipe
+
 User = get_user_model()
 
 
-class UserSubscriptions(models.Model):
-    user = AutoOneToOneField(
+class Subscription(models.Model):
+    """Subscription of user to recipe author.
+
+    Unique constraint on (user, author) serves lookups by subscriber, index
+    on (author, user) serves lookups by author.
+    """
+
+    user = models.ForeignKey(
         User,
-        related_name='subscription_list',
+        related_name='subscriptions',
         on_delete=models.CASCADE,
-        verbose_name='Пользователь',
+        db_index=False,
+        verbose_name='Подписчик',
     )
-    users = models.ManyToManyField(
+    author = models.ForeignKey(
+        User,
+        related_name='subscribers',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Автор',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата подписки',
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_subscription',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_subscription',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_user_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} -> {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Recipe delivered to follower's feed inbox when it was published.
+
+    Used by fan-out-on-write feed strategy, see `subscriptions.feed`.
+    """
+
+    user = models.ForeignKey(
         User,
-        related_name='subscription_lists',
-        verbose_name='Пользователи',
-        blank=True,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
     )
+    # Copy of recipe publication date, so inbox is ordered by its own index
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
 
     class Meta:
-        verbose_name = 'Список подписок'
-        verbose_name_plural = 'Списки подписок'
-        ordering = ['user__username']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ['-pub_date', '-recipe']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
-        return f'Подписки {self.user.username}'
+        return f'{self.user} <- {self.recipe}'
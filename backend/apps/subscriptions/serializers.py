@@ -1,25 +1,39 @@
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
 
+from recipes.models import RecipeQuerySet
 from recipes.serializers import ShortRecipeSerializer
 from users.models import FoodgramUser
 from users.serializers import UserSerializer
 
+from .models import Subscription
+from .util import get_recent_recipes, get_recipes_limit
+
 
 def get_is_subscribed(self, user: FoodgramUser) -> bool:
+    if (is_subscribed := getattr(user, 'is_subscribed', None)) is not None:
+        return is_subscribed
     if not (request := self.context.get('request')):
         return False
     current_user = request.user
     if current_user.is_anonymous:
         return False
-    return user in current_user.subscription_list.users.all()
+    return Subscription.objects.filter(user=current_user, author=user).exists()
 
 
 UserSerializer._declared_fields['is_subscribed'] = (
     serializers.SerializerMethodField()
 )
 UserSerializer.Meta.fields += ('is_subscribed',)
+UserSerializer.viewer_fields += ['is_subscribed']
 UserSerializer.get_is_subscribed = get_is_subscribed
 
+RecipeQuerySet.viewer_annotations['author_is_subscribed'] = (
+    lambda user: Exists(
+        Subscription.objects.filter(user=user, author=OuterRef('author'))
+    )
+)
+
 
 class SubscriptionUserSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
@@ -30,23 +44,18 @@ class SubscriptionUserSerializer(UserSerializer):
         fields += ('recipes', 'recipes_count')
 
     def get_recipes_count(self, user: FoodgramUser) -> int:
-        return user.recipes.count()
+        return user.recipes_count
 
     def get_recipes(self, user: FoodgramUser) -> list[dict]:
-        request = self.context['request']
-        recipes = user.recipes.all()
-
-        data = ShortRecipeSerializer(
+        # Prefetched for a page of subscriptions by the view
+        if (recipes := getattr(user, 'recent_recipes', None)) is None:
+            recipes = get_recent_recipes(
+                [user.id],
+                get_recipes_limit(self.context['request']),
+            ).get(user.id, [])
+
+        return ShortRecipeSerializer(
             recipes,
             many=True,
             context=self.context,
         ).data
-
-        if (
-            'recipes_limit' in request.query_params
-            and request.query_params['recipes_limit'].isdigit()
-        ):
-            limit = int(request.query_params['recipes_limit'])
-            data = data[:limit]
-
-        return data
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.counters import register_counter
+from recipes.models import Recipe
+
+from .const import FEED_STRATEGY_WRITE
+from .feed import (
+    backfill_inbox,
+    fan_out_recipe,
+    get_feed_strategy,
+    remove_from_inbox,
+)
+from .models import Subscription, User
+
+register_counter(User, 'followers_count', Subscription, 'author')
+
+
+@receiver(post_save, sender=Recipe)
+def deliver_recipe_to_feeds(
+    sender,
+    instance: Recipe,
+    created: bool,
+    **kwargs,
+) -> None:
+    if created and get_feed_strategy() == FEED_STRATEGY_WRITE:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_feed_on_subscribe(
+    sender,
+    instance: Subscription,
+    created: bool,
+    **kwargs,
+) -> None:
+    if created and get_feed_strategy() == FEED_STRATEGY_WRITE:
+        backfill_inbox(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed_on_unsubscribe(
+    sender,
+    instance: Subscription,
+    **kwargs,
+) -> None:
+    if get_feed_strategy() == FEED_STRATEGY_WRITE:
+        remove_from_inbox(instance.user_id, instance.author_id)
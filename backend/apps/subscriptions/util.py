@@ -0,0 +1,98 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.request import Request
+
+from recipes.models import Recipe
+from users.models import FoodgramUser
+
+RECENT_RECIPES_ORDERING = ('-pub_date', '-id')
+
+
+def get_recipes_limit(request: Request) -> Optional[int]:
+    """Get number of recipes shown per author from `recipes_limit` param.
+
+    Returns:
+        Optional[int]: The limit, None if not given or invalid.
+    """
+    value = request.query_params.get('recipes_limit', '')
+    return int(value) if value.isdigit() else None
+
+
+def get_recent_recipes(
+    author_ids: Iterable[int],
+    limit: Optional[int],
+) -> dict[int, list[Recipe]]:
+    """Get the most recent recipes of every author in a single query.
+
+    Recipes are numbered within every author by a ROW_NUMBER() window, so
+    the limit is applied by the database per author instead of loading
+    all recipes.
+
+    Args:
+        author_ids (Iterable[int]): Authors whose recipes are loaded.
+        limit (Optional[int]): Max number of recipes per author, no limit
+            if None.
+
+    Returns:
+        dict[int, list[Recipe]]: Recipes with short representation columns
+            only, newest first, by author id.
+    """
+    author_ids = list(author_ids)
+    if not author_ids or limit == 0:
+        return {}
+
+    recipes = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id',
+        'name',
+        'image',
+        'image_variants',
+        'cooking_time',
+        'author_id',
+        'pub_date',
+    )
+    if limit is None:
+        recipes = recipes.order_by(*RECENT_RECIPES_ORDERING)
+    else:
+        ranked = recipes.annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            )
+        ).order_by()
+        sql, params = ranked.query.sql_with_params()
+        quote = connection.ops.quote_name
+        # Window functions can not be filtered in WHERE of the same query
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) {quote("ranked")} '
+            f'WHERE {quote("recipe_rank")} <= %s '
+            f'ORDER BY {quote("pub_date")} DESC, {quote("id")} DESC',
+            (*params, limit),
+        )
+
+    recipes_by_author = defaultdict(list)
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
+
+
+def prefetch_recent_recipes(
+    authors: list[FoodgramUser],
+    limit: Optional[int],
+) -> None:
+    """Store the most recent recipes in `recent_recipes` of every author.
+
+    Args:
+        authors (list[FoodgramUser]): Authors, e.g. a page of subscriptions.
+        limit (Optional[int]): Max number of recipes per author.
+    """
+    recipes_by_author = get_recent_recipes(
+        (author.id for author in authors),
+        limit,
+    )
+    for author in authors:
+        author.recent_recipes = recipes_by_author.get(author.id, [])
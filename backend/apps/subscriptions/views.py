@@ -1,3 +1,4 @@
+from django.db.models import QuerySet, Value
 from rest_framework.decorators import action
 from rest_framework.request import Request
 from rest_framework.response import Response
@@ -8,23 +9,80 @@ from rest_framework.status import (
 )
 from rest_framework.viewsets import GenericViewSet
 
-from .models import User
+from common.cache import touch_viewer_state
+from common.pagination import CursorPagination
+from common.util import delete_if_present, insert_if_absent
+from recipes.serializers import RecipeSerializer
+
+from .feed import FEED_ORDERING, get_feed
+from .models import Subscription, User
 from .serializers import SubscriptionUserSerializer
+from .util import get_recipes_limit, prefetch_recent_recipes
+
+
+class FeedPagination(CursorPagination):
+    ordering = FEED_ORDERING
 
 
 class SubscriptionsView(GenericViewSet):
     queryset = User.objects.all()
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self) -> QuerySet:
+        if self.action not in ('subscribe', 'subscriptions'):
+            return super().get_queryset()
+        # Only columns needed for the subscription representation
+        return (
+            super()
+            .get_queryset()
+            .only(
+                'id',
+                'email',
+                'username',
+                'first_name',
+                'last_name',
+                'avatar',
+                'avatar_variants',
+                'recipes_count',
+            )
+        )
 
     @action(detail=False, methods=['get'])
     def subscriptions(self, request: Request) -> Response:
-        paginated_data = self.paginate_queryset(
+        authors = self.paginate_queryset(
+            self.get_queryset()
+            .filter(subscribers__user=request.user)
+            .annotate(is_subscribed=Value(True))
+        )
+        prefetch_recent_recipes(authors, get_recipes_limit(request))
+        return self.get_paginated_response(
             SubscriptionUserSerializer(
-                request.user.subscription_list.users.all(),
+                authors,
+                many=True,
+                context=self.get_serializer_context(),
+            ).data
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='subscriptions/feed',
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request: Request) -> Response:
+        """List recipes of followed authors, newest first, by keyset pages."""
+        recipes = self.paginate_queryset(
+            get_feed(request.user)
+            .with_related()
+            .with_viewer_flags(request.user)
+        )
+        return self.get_paginated_response(
+            RecipeSerializer(
+                recipes,
                 many=True,
                 context=self.get_serializer_context(),
             ).data
         )
-        return self.get_paginated_response(paginated_data)
 
     @action(
         detail=True,
@@ -37,11 +95,15 @@ class SubscriptionsView(GenericViewSet):
         if current_user == user_to_subscribe:
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        if user_to_subscribe in current_user.subscription_list.users.all():
+        if not insert_if_absent(
+            Subscription,
+            user=current_user,
+            author=user_to_subscribe,
+        ):
             return Response(status=HTTP_400_BAD_REQUEST)
+        touch_viewer_state(current_user)
 
-        current_user.subscription_list.users.add(user_to_subscribe)
-
+        user_to_subscribe.is_subscribed = True
         return Response(
             SubscriptionUserSerializer(
                 user_to_subscribe,
@@ -53,14 +115,15 @@ class SubscriptionsView(GenericViewSet):
     @subscribe.mapping.delete
     def unsubscribe(self, request: Request, pk: int) -> Response:
         current_user = request.user
-        user_to_unsubscribe = self.get_object()
 
-        if (
-            user_to_unsubscribe
-            not in current_user.subscription_list.users.all()
+        if not delete_if_present(
+            Subscription.objects.filter(
+                user=current_user,
+                author_id=pk,
+            )
         ):
+            self.get_object()
             return Response(status=HTTP_400_BAD_REQUEST)
-
-        current_user.subscription_list.users.remove(user_to_unsubscribe)
+        touch_viewer_state(current_user)
 
         return Response(status=HTTP_204_NO_CONTENT)
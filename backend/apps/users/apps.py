@@ -5,3 +5,10 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self) -> None:
+        # Need these imports to execute code inside modules
+        from . import signals  # noqa: F401
+        from .authentication import check_shared_cache
+
+        check_shared_cache()
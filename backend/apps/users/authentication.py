@@ -0,0 +1,277 @@
+"""Authentication which does not query the database per request.
+
+`TokenAuthentication` of DRF loads the token with its user on every
+request. Here users are kept in a process-local LRU with TTL, by opaque
+token key or, for signed tokens, by user id. If `AUTH_TOKEN_SHARED_CACHE`
+setting is on, users are also stored in the Django cache, so processes
+share them, and every local hit is checked against entry revision in the
+shared cache, so a token revoked by one process is not accepted by
+another. The cache must then be shared by every process, see
+`check_shared_cache`. Otherwise nothing tells a process about revocations
+made by the others, so local entries expire after a few seconds.
+
+Entries are dropped by model signals when the token is deleted (logout,
+deletion of the user) and when the user is saved (password change,
+deactivation, revocation of signed tokens), see `users.signals`.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.authentication import (
+    BaseAuthentication,
+    get_authorization_header,
+    TokenAuthentication,
+)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from .const import (
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_TOKEN_CACHE_TTL,
+    LOCAL_AUTH_TOKEN_CACHE_TTL,
+)
+from .models import FoodgramUser
+from .tokens import (
+    ACCESS_TOKEN,
+    is_revoked,
+    read_token,
+    signed_tokens_enabled,
+)
+
+# Cache backends which keep entries in memory of each process
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+class CachedUser(NamedTuple):
+    user: AbstractUser
+    revision: Optional[str]
+    expires_at: float
+
+
+_users: OrderedDict[str, CachedUser] = OrderedDict()
+_users_lock = threading.Lock()
+
+
+def token_cache_key(key: str) -> str:
+    return f'token:{key}'
+
+
+def user_cache_key(user_id: int) -> str:
+    return f'user:{user_id}'
+
+
+def _revision_key(key: str) -> str:
+    return f'auth-revision:{key}'
+
+
+def _shared_user_key(key: str) -> str:
+    return f'auth-user:{key}'
+
+
+def _shared_cache_enabled() -> bool:
+    return settings.AUTH_TOKEN_SHARED_CACHE
+
+
+def check_shared_cache() -> None:
+    """Refuse to share users through a cache local to each process.
+
+    Otherwise logout, password change and deactivation in one process
+    would go unnoticed by the others until their entries expire.
+
+    Raises:
+        ImproperlyConfigured: If `AUTH_TOKEN_SHARED_CACHE` is on and the
+            default cache is not shared.
+    """
+    if not _shared_cache_enabled():
+        return
+    if (
+        not settings.SHARED_CACHE
+        or settings.CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS
+    ):
+        raise ImproperlyConfigured(
+            'AUTH_TOKEN_SHARED_CACHE требует кэша, общего для всех '
+            'процессов: укажите CACHE_LOCATION.'
+        )
+
+
+def _get_local(key: str) -> Optional[CachedUser]:
+    with _users_lock:
+        entry = _users.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del _users[key]
+            return None
+        _users.move_to_end(key)
+        return entry
+
+
+def _set_local(key: str, user: AbstractUser, revision: Optional[str]):
+    # Entries without revision are not checked against the shared cache
+    ttl = (
+        AUTH_TOKEN_CACHE_TTL
+        if revision is not None
+        else LOCAL_AUTH_TOKEN_CACHE_TTL
+    )
+    with _users_lock:
+        _users[key] = CachedUser(user, revision, time.monotonic() + ttl)
+        _users.move_to_end(key)
+        while len(_users) > AUTH_TOKEN_CACHE_SIZE:
+            _users.popitem(last=False)
+
+
+def get_cached_user(key: str) -> Optional[AbstractUser]:
+    """Get cached user authenticated by credential.
+
+    Args:
+        key (str): Cache key of credential, see `token_cache_key` and
+            `user_cache_key`.
+
+    Returns:
+        Optional[AbstractUser]: Active user, None if it is not cached. The
+            instance is shared, copy it before changing.
+    """
+    entry = _get_local(key)
+    if not _shared_cache_enabled():
+        return entry and entry.user
+    revision = cache.get(_revision_key(key))
+    if revision is None:
+        return None
+    if entry is not None and entry.revision == revision:
+        return entry.user
+    shared = cache.get(_shared_user_key(key))
+    if shared is None or shared[0] != revision:
+        return None
+    _set_local(key, shared[1], revision)
+    return shared[1]
+
+
+def cache_user(key: str, user: AbstractUser) -> None:
+    """Remember user authenticated by credential.
+
+    Args:
+        key (str): Cache key of credential.
+        user (AbstractUser): Active user.
+    """
+    revision = None
+    if _shared_cache_enabled():
+        revision = uuid4().hex
+        cache.set_many(
+            {
+                _shared_user_key(key): (revision, user),
+                _revision_key(key): revision,
+            },
+            timeout=AUTH_TOKEN_CACHE_TTL,
+        )
+    _set_local(key, user, revision)
+
+
+def invalidate_cached_users(keys: list[str]) -> None:
+    """Forget users in this and, if shared, other processes.
+
+    Args:
+        keys (list[str]): Cache keys of credentials.
+    """
+    with _users_lock:
+        for key in keys:
+            _users.pop(key, None)
+    if _shared_cache_enabled():
+        cache.delete_many(
+            [_revision_key(key) for key in keys]
+            + [_shared_user_key(key) for key in keys]
+        )
+
+
+def clear_cached_users() -> None:
+    """Forget every user cached by this process."""
+    with _users_lock:
+        _users.clear()
+
+
+def get_active_user(user_id: int) -> Optional[AbstractUser]:
+    """Get active user by id, from cache if possible.
+
+    Returns:
+        Optional[AbstractUser]: Shared instance, None if the user does not
+            exist or is inactive.
+    """
+    key = user_cache_key(user_id)
+    user = get_cached_user(key)
+    if user is None:
+        user = FoodgramUser.objects.filter(id=user_id, is_active=True).first()
+        if user is not None:
+            cache_user(key, user)
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement of `TokenAuthentication` with cached users."""
+
+    def authenticate_credentials(
+        self, key: str
+    ) -> tuple[AbstractUser, object]:
+        cache_key = token_cache_key(key)
+        user = get_cached_user(cache_key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache_user(cache_key, user)
+        else:
+            token = self.get_model()(key=key, user_id=user.id)
+        # Views may change request.user, cached instance must stay intact
+        user = copy.copy(user)
+        token.user = user
+        return user, token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authentication by signed access token, see `users.tokens`.
+
+    Clients should authenticate by passing the token in the
+    "Authorization" HTTP header, prepended with the string "Bearer ".
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(
+        self, request: Request
+    ) -> Optional[tuple[AbstractUser, str]]:
+        auth = get_authorization_header(request).split()
+        if (
+            not auth
+            or auth[0].lower() != self.keyword.lower().encode()
+            or not signed_tokens_enabled()
+        ):
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Неверный заголовок авторизации.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed('Неверный токен.')
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token: str) -> tuple[AbstractUser, str]:
+        try:
+            user_id, issued_at = read_token(token, ACCESS_TOKEN)
+        except signing.BadSignature:
+            raise AuthenticationFailed('Неверный или просроченный токен.')
+        user = get_active_user(user_id)
+        if user is None or is_revoked(user, issued_at):
+            raise AuthenticationFailed('Неверный или просроченный токен.')
+        return copy.copy(user), token
+
+    def authenticate_header(self, request: Request) -> str:
+        return self.keyword
@@ -1 +1,12 @@
 MAX_NAME_LENGTH = 150
+
+# Users resolved by auth token are kept in memory of every process
+AUTH_TOKEN_CACHE_SIZE = 10_000
+# Bounds staleness of changes made bypassing model signals (e.g. update())
+AUTH_TOKEN_CACHE_TTL = 5 * 60
+# Without a shared cache other processes can not tell this one that a user
+# was logged out or changed, so their entries live only a few seconds
+LOCAL_AUTH_TOKEN_CACHE_TTL = 5
+
+SIGNED_ACCESS_TOKEN_TTL = 15 * 60
+SIGNED_REFRESH_TOKEN_TTL = 30 * 24 * 60 * 60
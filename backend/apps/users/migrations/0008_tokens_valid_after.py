@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='tokens_valid_after',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Токены действительны после'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:13
+
+import common.fields
+import common.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_foodgramuser_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodgramuser',
+            name='avatar',
+            field=common.fields.ContentAddressedImageField(blank=True, db_index=True, null=True, storage=common.storage.ContentAddressedStorage(), upload_to='users/avatars/', verbose_name='Аватар'),
+        ),
+    ]
@@ -1,10 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from common.counters import CounterModelMixin
+from common.fields import ContentAddressedImageField
 
 from .const import MAX_NAME_LENGTH
 
 
-class FoodgramUser(AbstractUser):
+class FoodgramUser(CounterModelMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         verbose_name='Адрес электронной почты',
@@ -17,12 +21,37 @@ class FoodgramUser(AbstractUser):
         max_length=MAX_NAME_LENGTH,
         verbose_name='Фамилия',
     )
-    avatar = models.ImageField(
+    avatar = ContentAddressedImageField(
         upload_to='users/avatars/',
         null=True,
         blank=True,
         verbose_name='Аватар',
     )
+    # Responsive variants of the avatar, see common.variants
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты аватара',
+    )
+    # Denormalized counters, see common.counters
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
+    # Signed tokens issued earlier are revoked, see users.tokens
+    tokens_valid_after = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Токены действительны после',
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
@@ -30,6 +59,11 @@ class FoodgramUser(AbstractUser):
     def __str__(self) -> str:
         return f'{self.username} [{self.email}]'
 
+    def set_password(self, raw_password: str) -> None:
+        super().set_password(raw_password)
+        # Signed tokens issued with the old password are no longer valid
+        self.tokens_valid_after = timezone.now()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
@@ -1,9 +1,12 @@
 from django.contrib.auth.password_validation import validate_password
+from django.core import signing
 from rest_framework import serializers
 
-from common.serializers import Base64ImageField
+from common.serializers import Base64ImageField, ImageSrcsetField
 
+from .authentication import get_active_user
 from .models import FoodgramUser
+from .tokens import is_revoked, read_token, REFRESH_TOKEN
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -32,6 +35,14 @@ class CreateUserSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar_srcset = ImageSrcsetField('avatar')
+
+    # Fields which depend on requesting user and are never cached.
+    # Filled by the apps which add those fields.
+    viewer_fields = []
+    # Built from the host of the request, see RecipeSerializer
+    url_fields = ['avatar', 'avatar_srcset']
+
     class Meta:
         model = FoodgramUser
         fields = (
@@ -41,6 +52,7 @@ class UserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_srcset',
         )
 
 
@@ -91,5 +103,21 @@ class PasswordChangeSerializer(serializers.ModelSerializer):
 
     def update(self, user: FoodgramUser, validated_data: dict) -> FoodgramUser:
         user.set_password(validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password', 'tokens_valid_after'])
         return user
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField()
+
+    def validate_refresh_token(self, token: str) -> str:
+        try:
+            user_id, issued_at = read_token(token, REFRESH_TOKEN)
+        except signing.BadSignature:
+            user_id = issued_at = None
+        user = self.user = user_id and get_active_user(user_id)
+        if user is None or is_revoked(user, issued_at):
+            raise serializers.ValidationError(
+                'Неверный или просроченный токен!'
+            )
+        return token
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from common.variants import register_variants
+from recipes.cache import invalidate_author_recipes
+
+from .authentication import (
+    invalidate_cached_users,
+    token_cache_key,
+    user_cache_key,
+)
+from .models import FoodgramUser
+
+
+def _invalidate_cached_user(user_id: int) -> None:
+    invalidate_cached_users(
+        [
+            token_cache_key(key)
+            for key in Token.objects.filter(user_id=user_id).values_list(
+                'key', flat=True
+            )
+        ]
+        + [user_cache_key(user_id)]
+    )
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance: Token, **kwargs) -> None:
+    # Logout, also cascades of user deletion
+    invalidate_cached_users([token_cache_key(instance.key)])
+
+
+@receiver(post_save, sender=FoodgramUser)
+@receiver(post_delete, sender=FoodgramUser)
+def user_changed(sender, instance: FoodgramUser, **kwargs) -> None:
+    # Password change, deactivation, revocation of signed tokens or
+    # profile edit
+    _invalidate_cached_user(instance.id)
+
+
+def avatar_variants_ready(user_id: int) -> None:
+    _invalidate_cached_user(user_id)
+    # Author data is shown inside every recipe they published
+    author = FoodgramUser(id=user_id)
+    invalidate_author_recipes(author)
+    author.recipes.touch()
+
+
+register_variants(FoodgramUser, 'avatar', on_ready=avatar_variants_ready)
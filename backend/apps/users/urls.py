@@ -1,12 +1,25 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import SimpleRouter
 
-from .views import UsersView
+from .views import (
+    TokenCreateView,
+    TokenDestroyView,
+    TokenRefreshView,
+    UsersView,
+)
 
 router = SimpleRouter()
 router.register('users', UsersView, basename='users')
 
 urlpatterns = [
     path('', include(router.urls)),
-    path('auth/', include('djoser.urls.authtoken')),
+    re_path(r'^auth/token/login/?$', TokenCreateView.as_view(), name='login'),
+    re_path(
+        r'^auth/token/logout/?$', TokenDestroyView.as_view(), name='logout'
+    ),
+    re_path(
+        r'^auth/token/refresh/?$',
+        TokenRefreshView.as_view(),
+        name='token-refresh',
+    ),
 ]
@@ -1,26 +1,65 @@
+from djoser import views as djoser_views
 from djoser.views import UserViewSet
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticated,
+    SAFE_METHODS,
+)
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+
+from recipes.cache import invalidate_author_recipes
 
 from .models import FoodgramUser
-from .serializers import AvatarSerializer
+from .serializers import AvatarSerializer, TokenRefreshSerializer
+from .tokens import (
+    ACCESS_TOKEN,
+    issue_token,
+    issue_tokens,
+    revoke_tokens,
+    signed_tokens_enabled,
+)
 
 
 class UsersView(UserViewSet):
     queryset = FoodgramUser.objects.all()
+    cursor_ordering = ('-username',)
 
     def get_permissions(self):
         if self.action in ('me', 'avatar', 'delete_avatar'):
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def initial(self, request: Request, *args, **kwargs) -> None:
+        super().initial(request, *args, **kwargs)
+        # Authenticated user may come from a cache and be minutes old,
+        # saving it would write stale columns back
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+        ):
+            request.user.refresh_from_db()
+
+    def perform_update(self, serializer: Serializer) -> None:
+        super().perform_update(serializer)
+        self._author_changed(serializer.instance)
+
+    def _author_changed(self, author: FoodgramUser) -> None:
+        # Author data is shown inside every recipe they published
+        invalidate_author_recipes(author)
+        author.recipes.touch()
+
     @action(
         detail=False,
         methods=['put'],
         url_path='me/avatar',
+        # Avatar is sent either as Base64 in JSON or as a binary file
+        parser_classes=[JSONParser, MultiPartParser],
     )
     def avatar(self, request: Request) -> Response:
         serializer = AvatarSerializer(
@@ -30,10 +69,47 @@ class UsersView(UserViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        self._author_changed(request.user)
 
         return Response(serializer.data)
 
     @avatar.mapping.delete
     def delete_avatar(self, request: Request) -> Response:
         request.user.avatar.delete()
+        self._author_changed(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenCreateView(djoser_views.TokenCreateView):
+    """Issue opaque token and, if enabled, signed tokens."""
+
+    def _action(self, serializer: Serializer) -> Response:
+        response = super()._action(serializer)
+        if signed_tokens_enabled():
+            response.data.update(issue_tokens(serializer.user))
+        return response
+
+
+class TokenDestroyView(djoser_views.TokenDestroyView):
+    """Delete opaque token and revoke signed tokens."""
+
+    def post(self, request: Request) -> Response:
+        revoke_tokens(request.user)
+        return super().post(request)
+
+
+class TokenRefreshView(generics.GenericAPIView):
+    """Exchange signed refresh token for a new access token."""
+
+    serializer_class = TokenRefreshSerializer
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+
+    def post(self, request: Request) -> Response:
+        if not signed_tokens_enabled():
+            raise NotFound
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(
+            {'access_token': issue_token(serializer.user, ACCESS_TOKEN)}
+        )
@@ -101,14 +101,30 @@ else:
         }
     }
 
+# Memcached servers shared by every process and node, comma separated,
+# e.g. "memcached:11211". Without them each process has its own memory
+# cache, so data cached across requests (recipe representations, viewer
+# state of conditional GET) is not cached at all, because one process
+# could not drop what another one has cached.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+        }
+    }
+SHARED_CACHE = bool(CACHE_LOCATION)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'users.authentication.CachedTokenAuthentication',
+        'users.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated'
     ],
-    'DEFAULT_PAGINATION_CLASS': 'common.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'common.pagination.OptionalCursorPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -162,6 +178,34 @@ else:
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
+# Uploaded images larger than this many bytes are rejected
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+# Where responsive image variants are rendered, see common.variants:
+# 'command' - by `generate_image_variants --watch` process only,
+# 'thread' - by background threads of web processes, 'inline' - by web
+# processes right after the upload is committed
+IMAGE_VARIANTS_RENDERING = os.getenv('IMAGE_VARIANTS_RENDERING', 'command')
+# Multipart files are streamed to disk whatever their size
+FILE_UPLOAD_HANDLERS = [
+    'common.uploadhandlers.CappedTemporaryFileUploadHandler',
+]
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Subscription feed strategy: 'read' merges followed authors' recipes on
+# every request, 'write' copies new recipes into followers' inboxes
+SUBSCRIPTION_FEED_STRATEGY = os.getenv('SUBSCRIPTION_FEED_STRATEGY', 'read')
+
+# Share users resolved by auth token between processes through the cache,
+# so a revoked token is rejected by every process at once. On by default
+# with a shared cache, requires it otherwise startup fails.
+AUTH_TOKEN_SHARED_CACHE = strtobool(
+    os.getenv('AUTH_TOKEN_SHARED_CACHE', str(SHARED_CACHE))
+)
+
+# Issue stateless signed access and refresh tokens on login along with
+# opaque ones and accept them as "Authorization: Bearer <token>"
+SIGNED_AUTH_TOKENS = strtobool(os.getenv('SIGNED_AUTH_TOKENS', 'false'))
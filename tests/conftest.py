@@ -6,13 +6,21 @@ from random import choice, choices, randint
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
 from django.urls import reverse
+from favorites.models import FavoriteRecipe
 from pytest import fixture
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
+from shopping_cart.models import ShoppingCartRecipe
+from subscriptions.const import FEED_STRATEGY_READ, FEED_STRATEGY_WRITE
+from subscriptions.models import Subscription
 
+from common.const import VARIANTS_RENDERING_INLINE
 from recipes.models import Ingredient, Recipe, Tag
+from users.authentication import clear_cached_users
 
-from .const import GIF_BASE64, RANDOM_NAME_POOL, SOME_IMAGE
+from .const import ANOTHER_GIF_BASE64, RANDOM_NAME_POOL, SOME_IMAGE
 from .util import create_recipe, create_user, create_user_client
 
 User = get_user_model()
@@ -25,6 +33,23 @@ def setup_media_root():
     shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
 
 
+@fixture(autouse=True)
+def shared_cache(settings):
+    # Tests run in a single process, so its memory cache is shared
+    settings.SHARED_CACHE = True
+
+
+@fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    clear_cached_users()
+
+
+@fixture
+def sync_image_variants(settings):
+    settings.IMAGE_VARIANTS_RENDERING = VARIANTS_RENDERING_INLINE
+
+
 @fixture
 def reader_user() -> AbstractUser:
     return create_user('reader', avatar=SOME_IMAGE)
@@ -50,6 +75,21 @@ def author_client(author_user) -> APIClient:
     return create_user_client(author_user)
 
 
+@fixture
+def signed_tokens(settings):
+    settings.SIGNED_AUTH_TOKENS = True
+
+
+@fixture
+def reader_token_client(reader_user) -> APIClient:
+    client = APIClient()
+    client.user = reader_user
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=reader_user)}'
+    )
+    return client
+
+
 @fixture
 def tag() -> Tag:
     return Tag.objects.create(
@@ -134,7 +174,8 @@ def new_recipe_data(
         'name': 'New recipe',
         'text': 'Some description',
         'cooking_time': 5,
-        'image': GIF_BASE64,
+        # Differs from images of existing recipes
+        'image': ANOTHER_GIF_BASE64,
     }
 
 
@@ -192,36 +233,81 @@ def create_recipes_with_overlapping_ingredients(
         )
 
 
+@fixture
+def create_recipes_for_search(author_user, tag, ingredient):
+    for name, text in (
+        ('Борщ', 'Красный суп со свёклой'),
+        ('Щи', 'Суп из капусты, почти как борщ'),
+        ('Блины', 'Тонкие блины на молоке'),
+    ):
+        create_recipe(
+            {
+                'name': name,
+                'author': author_user,
+                'cooking_time': 1,
+                'text': text,
+                'image': SOME_IMAGE,
+            },
+            [tag],
+            [(ingredient, 1)],
+        )
+
+
+@fixture
+def create_ingredients_for_autocomplete(author_user, tag):
+    ingredients = {
+        name: Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('Сало', 'Сахар', 'Сахарная пудра', 'Соль', 'Морская соль')
+    }
+    create_recipe(
+        {
+            'name': 'Сладкий чай',
+            'author': author_user,
+            'cooking_time': 1,
+            'text': 'Чай с сахаром',
+            'image': SOME_IMAGE,
+        },
+        [tag],
+        [(ingredients['Сахар'], 1)],
+    )
+
+
+@fixture(params=[FEED_STRATEGY_READ, FEED_STRATEGY_WRITE])
+def feed_strategy(request, settings) -> str:
+    settings.SUBSCRIPTION_FEED_STRATEGY = request.param
+    return request.param
+
+
 @fixture
 def subscribe_reader_to_author(
     reader_user,
     author_user,
 ):
-    reader_user.subscription_list.users.add(author_user)
+    Subscription.objects.create(user=reader_user, author=author_user)
 
 
 @fixture
 def add_many_subscriptions(reader_user):
     for i in range(15):
         user = create_user(f'user {i}')
-        reader_user.subscription_list.users.add(user)
+        Subscription.objects.create(user=reader_user, author=user)
 
 
 @fixture
 def add_recipe_to_reader_favorites(reader_user, recipe):
-    reader_user.favorites_list.recipes.add(recipe)
+    FavoriteRecipe.objects.create(user=reader_user, recipe=recipe)
 
 
 @fixture
 def add_random_recipes_to_reader_favorites(reader_user, create_many_recipes):
     recipes = set(choices(Recipe.objects.all(), k=7))
     for recipe in recipes:
-        reader_user.favorites_list.recipes.add(recipe)
+        FavoriteRecipe.objects.create(user=reader_user, recipe=recipe)
 
 
 @fixture
 def add_recipe_to_reader_shopping_cart(reader_user, recipe):
-    reader_user.shopping_cart.recipes.add(recipe)
+    ShoppingCartRecipe.objects.create(user=reader_user, recipe=recipe)
 
 
 @fixture
@@ -231,13 +317,13 @@ def add_random_recipes_to_reader_shopping_cart(
 ):
     recipes = set(choices(Recipe.objects.all(), k=7))
     for recipe in recipes:
-        reader_user.shopping_cart.recipes.add(recipe)
+        ShoppingCartRecipe.objects.create(user=reader_user, recipe=recipe)
 
 
 @fixture
 def add_all_recipes_to_reader_shopping_cart(reader_user):
     for recipe in Recipe.objects.all():
-        reader_user.shopping_cart.recipes.add(recipe)
+        ShoppingCartRecipe.objects.create(user=reader_user, recipe=recipe)
 
 
 @fixture
@@ -340,11 +426,36 @@ def avatar_url() -> str:
     return reverse('users-avatar')
 
 
+@fixture
+def set_password_url() -> str:
+    return reverse('users-set-password')
+
+
+@fixture
+def login_url() -> str:
+    return reverse('login')
+
+
+@fixture
+def logout_url() -> str:
+    return reverse('logout')
+
+
+@fixture
+def token_refresh_url() -> str:
+    return reverse('token-refresh')
+
+
 @fixture
 def subscription_list_url() -> str:
     return reverse('users-subscriptions')
 
 
+@fixture
+def subscription_feed_url() -> str:
+    return reverse('users-feed')
+
+
 @fixture
 def reader_subscribe_url(reader_user) -> str:
     return reverse('users-subscribe', kwargs={'pk': reader_user.id})
@@ -1,3 +1,5 @@
+from base64 import b64decode
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 RANDOM_NAME_POOL = (
@@ -28,6 +30,7 @@ GIF_BASE64 = (
 ANOTHER_GIF_BASE64 = (
     'data:image/gif;base64,R0lGODlhAQABAIAAAAUEBAAAACwAAAAAAQABAAACAkQBADs='
 )
+ANOTHER_SMALL_GIF = b64decode(ANOTHER_GIF_BASE64.partition(',')[2])
 
 SOME_IMAGE = SimpleUploadedFile(
     'small.gif',
@@ -38,6 +41,12 @@ SOME_IMAGE = SimpleUploadedFile(
 NEW_AVATAR_DATA = {'avatar': ANOTHER_GIF_BASE64}
 
 
+SRCSET_SCHEMA = {
+    'type': 'object',
+    'additionalProperties': {'type': 'string'},
+}
+
+
 USER_SCHEMA = {
     'type': 'object',
     'properties': {
@@ -47,6 +56,7 @@ USER_SCHEMA = {
         'first_name': {'type': 'string'},
         'last_name': {'type': 'string'},
         'avatar': {'type': ['string', 'null']},
+        'avatar_srcset': SRCSET_SCHEMA,
     },
 }
 
@@ -90,6 +100,7 @@ RECIPE_SCHEMA = {
         'author': USER_SCHEMA,
         'name': {'type': 'string'},
         'image': {'type': 'string'},
+        'image_srcset': SRCSET_SCHEMA,
         'text': {'type': 'string'},
         'cooking_time': {'type': 'number'},
     },
@@ -102,6 +113,7 @@ SHORT_RECIPE_SCHEMA = {
         'id': {'type': 'number'},
         'name': {'type': 'string'},
         'image': {'type': 'string'},
+        'image_srcset': SRCSET_SCHEMA,
         'cooking_time': {'type': 'number'},
     },
 }
@@ -1,8 +1,36 @@
-from pytest import mark
+import hashlib
+import os
+import struct
+import time
+import zlib
+from base64 import b64encode
+from io import BytesIO
 
-from common.const import TOKEN_SYMBOLS
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from pytest import mark, raises
+from rest_framework.serializers import ValidationError
+
+from common import images, variants
+from common.const import BLOB_GRACE_PERIOD, TOKEN_SYMBOLS
+from common.serializers import Base64ImageField
+from common.storage import blob_storage
 from common.util import contains_duplicates, generate_token
 
+from .const import GIF_BASE64, SMALL_GIF
+
+
+def _png_header(width: int, height: int) -> bytes:
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + struct.pack('>I', len(ihdr))
+        + b'IHDR'
+        + ihdr
+        + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    )
+
 
 @mark.parametrize(('length'), (5, 10, 15, 20))
 def test_generated_token_is_valid(length):
@@ -23,3 +51,119 @@ def test_generated_token_is_valid(length):
 )
 def test_contains_duplicates(test_data, key, result):
     assert contains_duplicates(test_data, key=key) is result
+
+
+def test_base64_decoded_by_chunks(monkeypatch):
+    monkeypatch.setattr(images, 'BASE64_CHUNK_SIZE', 8)
+    content = bytes(range(256)) * 3
+    encoded = b64encode(content).decode()
+    # Line breaks shift chunk boundaries off 4 character groups
+    encoded = '\n'.join(encoded[i : i + 7] for i in range(0, len(encoded), 7))
+    with images.decode_base64(encoded, len(content)) as file:
+        assert file.read() == content
+
+
+@mark.parametrize(
+    ('encoded', 'max_size'),
+    (
+        (b64encode(b'x' * 100).decode(), 99),
+        ('not base64!', 100),
+        (b64encode(b'x' * 10).decode()[:-1], 100),
+        ('', 100),
+    ),
+)
+def test_invalid_base64_rejected(encoded, max_size):
+    with raises(ValidationError):
+        images.decode_base64(encoded, max_size)
+
+
+def test_base64_image_field_decodes_image():
+    file = Base64ImageField().to_internal_value(GIF_BASE64)
+    assert file.name.endswith('.gif')
+    assert file.read() == SMALL_GIF
+
+
+@mark.parametrize(
+    'content',
+    (
+        # Decompression bomb, rejected by its header
+        _png_header(100_000, 100_000),
+        b'BM' + b'\x00' * 64,
+        b'not an image',
+    ),
+)
+def test_base64_image_field_rejects_invalid_images(content):
+    with raises(ValidationError):
+        Base64ImageField().to_internal_value(
+            'data:image/png;base64,' + b64encode(content).decode()
+        )
+
+
+def test_image_field_size_capped(settings):
+    settings.MAX_IMAGE_UPLOAD_SIZE = len(SMALL_GIF) - 1
+    for data in (
+        GIF_BASE64,
+        SimpleUploadedFile('small.gif', SMALL_GIF, content_type='image/gif'),
+    ):
+        with raises(ValidationError):
+            Base64ImageField().to_internal_value(data)
+    assert Base64ImageField(max_size=len(SMALL_GIF)).to_internal_value(
+        GIF_BASE64
+    )
+
+
+def test_variants_rendered_without_exif():
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    content = BytesIO()
+    Image.new('RGB', (700, 100)).save(content, 'JPEG', exif=exif.tobytes())
+    content.seek(0)
+
+    rendered = variants.render_variants(
+        content, 'recipes/images/photo.jpg', default_storage
+    )
+    assert list(rendered) == [
+        format.lower() for format in variants.variant_formats('JPEG')
+    ]
+    for format, sizes in rendered.items():
+        # Never wider than the original
+        assert [width for width, _ in sizes] == [160, 320, 640, 700]
+        for width, name in sizes:
+            assert name.startswith('recipes/images/variants/photo-')
+            with default_storage.open(name) as file, Image.open(file) as image:
+                assert image.format.lower() == format
+                assert image.width == width
+                assert not image.getexif()
+
+
+def test_blob_storage_names_files_by_content():
+    names = {
+        blob_storage.save('a.gif', SimpleUploadedFile('a.gif', SMALL_GIF))
+        for _ in range(2)
+    }
+    assert len(names) == 1
+    name = names.pop()
+    assert name.startswith('blobs/')
+    assert hashlib.sha256(SMALL_GIF).hexdigest() in name
+    with blob_storage.open(name) as file:
+        assert file.read() == SMALL_GIF
+    # Just saved, e.g. by an upload whose row is not committed yet
+    blob_storage.delete(name)
+    assert blob_storage.exists(name)
+    assert blob_storage.collect(name, time.time())
+    assert not blob_storage.exists(name)
+
+
+def test_blob_saved_again_is_not_deleted():
+    name = blob_storage.save('a.gif', SimpleUploadedFile('a.gif', SMALL_GIF))
+    path = blob_storage.path(name)
+    saved_at = time.time() - BLOB_GRACE_PERIOD - 1
+    os.utime(path, (saved_at, saved_at))
+    # Uploaded again by a request whose row is not committed yet
+    blob_storage.save('b.gif', SimpleUploadedFile('b.gif', SMALL_GIF))
+    blob_storage.delete(name)
+    assert blob_storage.exists(name)
+
+    os.utime(path, (saved_at, saved_at))
+    blob_storage.delete(name)
+    assert not blob_storage.exists(name)
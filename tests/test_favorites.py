@@ -1,4 +1,7 @@
 import jsonschema
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from favorites.models import FavoriteRecipe
 from pytest import lazy_fixture as lf, mark
 from rest_framework.status import (
     HTTP_201_CREATED,
@@ -9,8 +12,33 @@ from rest_framework.status import (
 )
 
 from common.util import contains_duplicates
+from recipes.models import Recipe
 
 from .const import SHORT_RECIPE_SCHEMA
+from .util import check_counters_consistent
+
+
+@mark.usefixtures('add_random_recipes_to_reader_favorites')
+def test_favorite_toggle_does_not_load_list(
+    reader_client,
+    recipe_favorite_url,
+    recipe,
+):
+    FavoriteRecipe.objects.filter(
+        user=reader_client.user, recipe=recipe
+    ).delete()
+    for method in (reader_client.post, reader_client.delete):
+        with CaptureQueriesContext(connection) as context:
+            response = method(recipe_favorite_url)
+        assert response.status_code in (HTTP_201_CREATED, HTTP_204_NO_CONTENT)
+        queries = [query['sql'] for query in context.captured_queries]
+        # Only the toggled row may be read, e.g. to update counters
+        assert all(
+            f'"recipe_id" = {recipe.id}' in sql
+            for sql in queries
+            if sql.startswith('SELECT') and 'favorites_favoriterecipe' in sql
+        )
+        assert not any('"recipes_recipe"."text"' in sql for sql in queries)
 
 
 def test_can_add_recipe_to_favorites(
@@ -21,7 +49,7 @@ def test_can_add_recipe_to_favorites(
     response = reader_client.post(recipe_favorite_url)
     assert response.status_code == HTTP_201_CREATED
     jsonschema.validate(response.data, SHORT_RECIPE_SCHEMA)
-    assert recipe in reader_client.user.favorites_list.recipes.all()
+    assert recipe.favorited_by.filter(user=reader_client.user).exists()
 
 
 @mark.usefixtures('add_recipe_to_reader_favorites')
@@ -32,7 +60,7 @@ def test_can_remove_recipe_from_favorites(
 ):
     response = reader_client.delete(recipe_favorite_url)
     assert response.status_code == HTTP_204_NO_CONTENT
-    assert recipe not in reader_client.user.favorites_list.recipes.all()
+    assert not recipe.favorited_by.filter(user=reader_client.user).exists()
 
 
 @mark.usefixtures('add_recipe_to_reader_favorites')
@@ -42,7 +70,7 @@ def test_cannot_favorite_twice(reader_client, recipe_favorite_url):
         == HTTP_400_BAD_REQUEST
     )
     assert not contains_duplicates(
-        reader_client.user.favorites_list.recipes.all()
+        Recipe.objects.filter(favorited_by__user=reader_client.user)
     )
 
 
@@ -113,3 +141,46 @@ def test_favorite_nonexistant_recipe(
         ).status_code
         == HTTP_404_NOT_FOUND
     )
+
+
+def test_favorited_count_follows_favorites(
+    reader_client,
+    recipe_favorite_url,
+    recipe,
+):
+    reader_client.post(recipe_favorite_url)
+    recipe.refresh_from_db()
+    assert recipe.favorited_count == 1
+
+    reader_client.delete(recipe_favorite_url)
+    recipe.refresh_from_db()
+    assert recipe.favorited_count == 0
+    check_counters_consistent()
+
+
+def test_stale_recipe_save_keeps_favorited_count(
+    reader_client,
+    recipe_favorite_url,
+    recipe,
+):
+    reader_client.post(recipe_favorite_url)
+    recipe.name = 'renamed'
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.name == 'renamed'
+    assert recipe.favorited_count == 1
+
+
+def test_favorited_count_does_not_drop_below_zero(
+    reader_client,
+    recipe_favorite_url,
+    recipe,
+):
+    reader_client.post(recipe_favorite_url)
+    Recipe.objects.filter(id=recipe.id).update(favorited_count=0)
+    assert (
+        reader_client.delete(recipe_favorite_url).status_code
+        == HTTP_204_NO_CONTENT
+    )
+    recipe.refresh_from_db()
+    assert recipe.favorited_count == 0
@@ -1,27 +1,56 @@
+import hashlib
+import json
+import os
+from base64 import urlsafe_b64encode
+from io import BytesIO, StringIO
 from random import choice, choices, randint
 
 import jsonschema
 from django.conf import settings
-from pytest import lazy_fixture as lf, mark
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from pytest import lazy_fixture as lf, mark, raises
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_403_FORBIDDEN,
     HTTP_404_NOT_FOUND,
 )
 
-from recipes.models import Recipe, Tag
+from common.const import IMAGE_VARIANT_WIDTHS
+from common.util import contains_duplicates
+from common.variants import variant_formats
+from recipes import cache as recipes_cache, filters
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.serializers import RecipeSerializer
 
 from .conftest import RANDOM_NAME_POOL
-from .const import INGREDIENT_SCHEMA, RECIPE_SCHEMA, TAG_SCHEMA
+from .const import (
+    ANOTHER_SMALL_GIF,
+    INGREDIENT_SCHEMA,
+    NEW_AVATAR_DATA,
+    RECIPE_SCHEMA,
+    TAG_SCHEMA,
+)
 from .util import (
+    check_counters_consistent,
     check_different_pages,
     check_recipe_is_the_same,
     check_recipe_updated,
     check_response_is_paginated,
+    collect_orphaned_blobs,
+    create_recipe,
+    gif_upload,
 )
 
 
@@ -104,6 +133,80 @@ def test_recipe_list_page_size(
     )
 
 
+@mark.usefixtures('create_many_recipes')
+def test_recipe_list_cursor_pagination(reader_client, recipe_list_url):
+    response = reader_client.get(recipe_list_url + '?pagination=cursor')
+    assert response.status_code == HTTP_200_OK
+    assert 'count' not in response.data
+    assert response.data['previous'] is None
+    page1_data = response.data['results']
+    assert len(page1_data) == settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    page2_data = reader_client.get(response.data['next']).data['results']
+    assert page2_data
+    assert not contains_duplicates(
+        page1_data + page2_data,
+        key=lambda x: x['id'],
+    )
+    pub_dates = [
+        Recipe.objects.get(id=recipe['id']).pub_date
+        for recipe in page1_data + page2_data
+    ]
+    assert sorted(pub_dates, reverse=True) == pub_dates
+
+
+@mark.usefixtures('create_many_recipes')
+def test_recipe_list_cursor_pages_through_equal_pub_dates(
+    reader_client,
+    recipe_list_url,
+):
+    Recipe.objects.update(pub_date=Recipe.objects.first().pub_date)
+    ids = []
+    url = recipe_list_url + '?pagination=cursor&limit=4'
+    with CaptureQueriesContext(connection) as context:
+        while url:
+            response = reader_client.get(url)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+    assert ids == list(
+        Recipe.objects.order_by('-id').values_list('id', flat=True)
+    )
+    assert not any('OFFSET' in query['sql'] for query in context)
+
+    last_page_size = len(response.data['results'])
+    previous_page = reader_client.get(response.data['previous']).data
+    assert [recipe['id'] for recipe in previous_page['results']] == (
+        ids[-last_page_size - 4 : -last_page_size]
+    )
+
+
+@mark.usefixtures('create_many_recipes')
+def test_recipe_list_cursor_pagination_limit(reader_client, recipe_list_url):
+    response = reader_client.get(
+        recipe_list_url + '?pagination=cursor&limit=4'
+    )
+    assert len(response.data['results']) == 4
+
+
+@mark.parametrize(
+    'cursor',
+    (
+        [False, [[1], {'a': 1}]],
+        [False, [None, None]],
+        [True, [1, 2]],
+        [False, ['not a date', '1']],
+        [False, ['2024-01-01T00:00:00+00:00']],
+        'not a pair',
+    ),
+)
+def test_recipe_list_malformed_cursor(reader_client, recipe_list_url, cursor):
+    encoded = urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+    response = reader_client.get(
+        recipe_list_url, {'pagination': 'cursor', 'cursor': encoded}
+    )
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
 @mark.usefixtures('create_many_recipes')
 def test_recipe_ordering(reader_client, recipe_list_url):
     response_data = reader_client.get(recipe_list_url + '?limit=50').data[
@@ -116,6 +219,39 @@ def test_recipe_ordering(reader_client, recipe_list_url):
     assert sorted(pub_dates, reverse=True) == pub_dates
 
 
+@mark.usefixtures(
+    'create_many_recipes',
+    'add_random_recipes_to_reader_favorites',
+    'add_random_recipes_to_reader_shopping_cart',
+    'subscribe_reader_to_author',
+)
+def test_recipe_list_query_count_is_constant(reader_client, recipe_list_url):
+    reader_client.get(recipe_list_url)
+    query_counts = []
+    for limit in (1, 15):
+        with CaptureQueriesContext(connection) as context:
+            reader_client.get(recipe_list_url + f'?limit={limit}')
+        query_counts.append(len(context))
+    assert query_counts[0] == query_counts[1]
+
+
+@mark.usefixtures(
+    'create_many_recipes',
+    'add_random_recipes_to_reader_favorites',
+    'add_random_recipes_to_reader_shopping_cart',
+)
+def test_recipe_list_state_skips_viewer_flags(reader_client, recipe_list_url):
+    with CaptureQueriesContext(connection) as context:
+        assert reader_client.get(recipe_list_url).status_code == HTTP_200_OK
+    state_sql = next(
+        query['sql']
+        for query in context.captured_queries
+        if 'MAX(' in query['sql']
+    )
+    assert 'favorites_favoriterecipe' not in state_sql
+    assert 'shopping_cart_shoppingcartrecipe' not in state_sql
+
+
 @mark.usefixtures('create_many_ingredients')
 def test_filter_ingredient_by_name(reader_client, ingredient_list_url):
     query = choice(RANDOM_NAME_POOL).lower()
@@ -127,6 +263,95 @@ def test_filter_ingredient_by_name(reader_client, ingredient_list_url):
     )
 
 
+@mark.usefixtures('create_ingredients_for_autocomplete')
+@mark.parametrize(
+    ('query', 'expected_names'),
+    (
+        ('соль', ['Соль', 'Морская соль']),
+        ('СА', ['Сахар', 'Сало', 'Сахарная пудра']),
+    ),
+)
+def test_ingredient_autocomplete_ranking(
+    anon_client,
+    ingredient_list_url,
+    query,
+    expected_names,
+):
+    response = anon_client.get(ingredient_list_url, {'name': query})
+    assert [ingredient['name'] for ingredient in response.data] == (
+        expected_names
+    )
+
+
+@mark.usefixtures('create_ingredients_for_autocomplete')
+def test_ingredient_autocomplete_limit(anon_client, ingredient_list_url):
+    response = anon_client.get(ingredient_list_url, {'name': 'с', 'limit': 2})
+    assert [ingredient['name'] for ingredient in response.data] == [
+        'Сахар',
+        'Сало',
+    ]
+
+
+@mark.usefixtures('create_many_ingredients')
+def test_ingredient_autocomplete_not_limited_by_default(
+    anon_client,
+    ingredient_list_url,
+):
+    # Every name matches
+    response = anon_client.get(ingredient_list_url, {'name': '_'})
+    assert len(response.data) == Ingredient.objects.count()
+    response = anon_client.get(ingredient_list_url, {'name': ''})
+    assert len(response.data) == Ingredient.objects.count()
+
+
+@mark.usefixtures('create_ingredients_for_autocomplete')
+def test_ingredient_autocomplete_does_not_query_database(
+    anon_client,
+    ingredient_list_url,
+):
+    anon_client.get(ingredient_list_url, {'name': 'са'})
+    with CaptureQueriesContext(connection) as context:
+        response = anon_client.get(ingredient_list_url, {'name': 'сах'})
+    assert response.status_code == HTTP_200_OK
+    assert len(context) == 0
+
+
+@mark.usefixtures('create_ingredients_for_autocomplete')
+def test_ingredient_autocomplete_sees_catalog_changes(
+    anon_client,
+    ingredient_list_url,
+):
+    anon_client.get(ingredient_list_url, {'name': 'соль'})
+    Ingredient.objects.filter(name='Морская соль').delete()
+    Ingredient.objects.create(name='Соль крупная', measurement_unit='г')
+    response = anon_client.get(ingredient_list_url, {'name': 'соль'})
+    assert [ingredient['name'] for ingredient in response.data] == [
+        'Соль',
+        'Соль крупная',
+    ]
+
+
+@mark.usefixtures('create_ingredients_for_autocomplete')
+def test_ingredient_autocomplete_sees_other_processes_without_shared_cache(
+    settings,
+    monkeypatch,
+    anon_client,
+    ingredient_list_url,
+):
+    settings.SHARED_CACHE = False
+    monkeypatch.setattr(recipes_cache, 'LOCAL_CATALOG_VERSION_TIMEOUT', 0)
+    # Version stored by the fixtures never expires
+    cache.clear()
+    response = anon_client.get(ingredient_list_url, {'name': 'соль'})
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+    # Changed by another process, whose bump does not reach this one
+    Ingredient.objects.filter(name='Соль').update(name='Соль мелкая')
+    response = anon_client.get(ingredient_list_url, {'name': 'соль'})
+    assert 'Соль мелкая' in [
+        ingredient['name'] for ingredient in response.data
+    ]
+
+
 @mark.usefixtures('create_many_recipes')
 def test_filter_recipe_by_author(reader_client, recipe_list_url):
     query = reader_client.user.id
@@ -149,6 +374,107 @@ def test_filter_recipe_by_tags(reader_client, recipe_list_url):
     )
 
 
+@mark.usefixtures('create_many_recipes')
+def test_filter_recipe_by_many_tags_has_no_duplicates(
+    reader_client,
+    recipe_list_url,
+):
+    tags = Tag.objects.all()[:5]
+    query = '&'.join(f'tags={tag.slug}' for tag in tags)
+    data = reader_client.get(recipe_list_url + f'?limit=50&{query}').data
+    expected_ids = set(
+        Recipe.objects.filter(tags__in=tags).values_list('id', flat=True)
+    )
+    assert not contains_duplicates(data['results'], key=lambda x: x['id'])
+    assert data['count'] == len(data['results']) == len(expected_ids)
+    assert {recipe['id'] for recipe in data['results']} == expected_ids
+
+
+@mark.usefixtures('create_many_recipes')
+def test_filter_recipe_by_tag_deleted_while_filtering(
+    monkeypatch,
+    reader_client,
+    recipe_list_url,
+):
+    tag = Tag.objects.first()
+    tag_map = recipes_cache.get_tag_ids_by_slug()
+
+    def get_tag_ids_by_slug() -> dict[str, int]:
+        current = dict(tag_map)
+        # Deleted by another request right after this read
+        tag_map.pop(tag.slug, None)
+        return current
+
+    monkeypatch.setattr(filters, 'get_tag_ids_by_slug', get_tag_ids_by_slug)
+    response = reader_client.get(recipe_list_url, {'tags': tag.slug})
+    # Either map will do as long as the same one validates and looks up
+    assert response.status_code in (HTTP_200_OK, HTTP_400_BAD_REQUEST)
+
+
+def test_filter_recipe_by_unknown_tag(reader_client, recipe_list_url):
+    response = reader_client.get(recipe_list_url + '?tags=unknown_tag')
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@mark.usefixtures('create_recipes_for_search')
+def test_search_recipes_ranked_by_relevance(reader_client, recipe_list_url):
+    data = reader_client.get(recipe_list_url, {'search': 'борщ'}).data
+    assert [recipe['name'] for recipe in data['results']] == ['Борщ', 'Щи']
+
+
+@mark.usefixtures('create_recipes_for_search')
+def test_search_recipes_cursor_pagination(reader_client, recipe_list_url):
+    response = reader_client.get(
+        recipe_list_url,
+        {'search': 'суп', 'pagination': 'cursor', 'limit': 1},
+    )
+    assert 'count' not in response.data
+    page1_data = response.data['results']
+    with CaptureQueriesContext(connection) as context:
+        response = reader_client.get(response.data['next'])
+    assert not any('OFFSET' in query['sql'] for query in context)
+    page2_data = response.data['results']
+    assert [recipe['name'] for recipe in page1_data + page2_data] == [
+        'Борщ',
+        'Щи',
+    ]
+    assert not response.data['next']
+    previous_data = reader_client.get(response.data['previous']).data
+    assert previous_data['results'] == page1_data
+
+
+@mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Search vector column is only used with PostgreSQL',
+)
+@mark.usefixtures('create_recipes_for_search')
+def test_search_vector_updated_by_trigger(reader_client, recipe_list_url):
+    # Queryset updates bypass model signals, the trigger still fires
+    Recipe.objects.filter(name='Блины').update(name='Оладьи')
+    data = reader_client.get(recipe_list_url, {'search': 'оладьи'}).data
+    assert [recipe['name'] for recipe in data['results']] == ['Оладьи']
+    data = reader_client.get(recipe_list_url, {'search': 'борщ'}).data
+    assert [recipe['name'] for recipe in data['results']] == ['Борщ', 'Щи']
+
+
+@mark.usefixtures('create_recipes_for_search')
+def test_search_index_updated_on_write(
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+):
+    recipe = Recipe.objects.get(name='Блины')
+    author_client.patch(
+        reverse('recipes-detail', kwargs={'pk': recipe.id}),
+        data=new_recipe_data | {'name': 'Оладьи'},
+        format='json',
+    )
+    data = author_client.get(recipe_list_url, {'search': 'оладьи'}).data
+    assert [recipe['id'] for recipe in data['results']] == [recipe.id]
+    data = author_client.get(recipe_list_url, {'search': 'блины'}).data
+    assert not data['results']
+
+
 def test_authorized_user_can_create_recipes(
     author_client,
     recipe_list_url,
@@ -176,6 +502,108 @@ def test_authorized_user_can_create_recipes(
     )
 
 
+def test_can_create_recipe_with_multipart_image(
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+):
+    fields = new_recipe_data.copy()
+    del fields['image']
+    response = author_client.post(
+        recipe_list_url,
+        data={'data': json.dumps(fields), 'image': gif_upload()},
+        format='multipart',
+    )
+    assert response.status_code == HTTP_201_CREATED
+    recipe = Recipe.objects.get(id=response.data['id'])
+    assert recipe.image.name.endswith('.gif')
+    check_recipe_updated(recipe, fields | {'author': author_client.user})
+
+
+def test_can_update_recipe_image_with_multipart(
+    author_client,
+    recipe,
+    recipe_detail_url,
+    new_recipe_data,
+):
+    old_image = recipe.image.name
+    fields = new_recipe_data.copy()
+    del fields['image']
+    response = author_client.patch(
+        recipe_detail_url,
+        data={
+            'data': json.dumps(fields),
+            'image': gif_upload('new.gif', ANOTHER_SMALL_GIF),
+        },
+        format='multipart',
+    )
+    assert response.status_code == HTTP_200_OK
+    recipe.refresh_from_db()
+    assert recipe.image.name != old_image
+
+
+@mark.parametrize(
+    'data',
+    (
+        {'data': '{not json', 'image': gif_upload()},
+        {'data': '[]', 'image': gif_upload()},
+    ),
+)
+def test_create_recipe_invalid_multipart(author_client, recipe_list_url, data):
+    assert (
+        author_client.post(
+            recipe_list_url, data=data, format='multipart'
+        ).status_code
+        == HTTP_400_BAD_REQUEST
+    )
+
+
+def test_oversized_multipart_image_rejected(
+    settings,
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+):
+    settings.MAX_IMAGE_UPLOAD_SIZE = 10
+    fields = new_recipe_data.copy()
+    del fields['image']
+    response = author_client.post(
+        recipe_list_url,
+        data={'data': json.dumps(fields), 'image': gif_upload()},
+        format='multipart',
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert 'image' in response.data
+
+
+@mark.usefixtures('create_many_tags', 'create_many_ingredients')
+def test_recipe_write_query_count_is_constant(
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+):
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    query_counts = []
+    for count in (1, 10):
+        recipe_data = new_recipe_data | {
+            'tags': tag_ids[:count],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 5}
+                for ingredient_id in ingredient_ids[:count]
+            ],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = author_client.post(
+                recipe_list_url,
+                data=recipe_data,
+                format='json',
+            )
+        assert response.status_code == HTTP_201_CREATED
+        query_counts.append(len(context))
+    assert query_counts[0] == query_counts[1]
+
+
 def test_anon_cannot_create_recipes(
     anon_client,
     recipe_list_url,
@@ -358,6 +786,294 @@ def test_nonexistant_recipe_delete(
     )
 
 
+def test_recipe_update_keeps_unchanged_relations(
+    author_client,
+    recipe,
+    recipe_detail_url,
+    tag,
+    ingredient,
+):
+    row_id = recipe.recipe_to_ingredient.get().id
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.patch(
+            recipe_detail_url,
+            data={
+                'tags': [tag.id],
+                'ingredients': [{'id': ingredient.id, 'amount': 1}],
+                'name': 'Renamed recipe',
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+            },
+            format='json',
+        )
+    assert response.status_code == HTTP_200_OK
+    assert recipe.recipe_to_ingredient.get().id == row_id
+    relation_writes = [
+        query['sql']
+        for query in context.captured_queries
+        if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        and (
+            'recipeingredient' in query['sql'] or 'recipe_tags' in query['sql']
+        )
+    ]
+    assert not relation_writes
+
+
+@mark.usefixtures('create_many_ingredients')
+def test_recipe_update_applies_ingredient_changes(
+    author_client,
+    recipe,
+    recipe_detail_url,
+    tag,
+    ingredient,
+    another_ingredient,
+):
+    new_ingredient = Ingredient.objects.exclude(
+        id__in=[ingredient.id, another_ingredient.id]
+    ).first()
+    recipe.ingredients.add(another_ingredient, through_defaults={'amount': 3})
+    kept_row_id = recipe.recipe_to_ingredient.get(ingredient=ingredient).id
+    response = author_client.patch(
+        recipe_detail_url,
+        data={
+            'tags': [tag.id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 7},
+                {'id': new_ingredient.id, 'amount': 2},
+            ],
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        },
+        format='json',
+    )
+    assert response.status_code == HTTP_200_OK
+    amounts = dict(
+        recipe.recipe_to_ingredient.values_list('ingredient_id', 'amount')
+    )
+    assert amounts == {ingredient.id: 7, new_ingredient.id: 2}
+    assert (
+        recipe.recipe_to_ingredient.get(ingredient=ingredient).id
+        == kept_row_id
+    )
+
+
+def test_recipe_written_without_request(author_user, new_recipe_data):
+    serializer = RecipeSerializer(data=new_recipe_data)
+    assert serializer.is_valid(), serializer.errors
+    recipe = serializer.save(author=author_user)
+    assert recipe.name == new_recipe_data['name']
+    assert recipe.image
+
+
+def test_new_image_deleted_when_write_fails(
+    monkeypatch,
+    author_user,
+    recipe,
+    new_recipe_data,
+):
+    def fail(*args, **kwargs):
+        raise RuntimeError
+
+    monkeypatch.setattr(RecipeSerializer, '_write_ingredients', fail)
+    serializer = RecipeSerializer(recipe, data=new_recipe_data)
+    assert serializer.is_valid(), serializer.errors
+    storage = recipe.image.storage
+    digest = hashlib.sha256(ANOTHER_SMALL_GIF).hexdigest()
+    new_name = f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.gif'
+    with raises(RuntimeError):
+        serializer.save()
+    collect_orphaned_blobs()
+    assert not storage.exists(new_name)
+    recipe.refresh_from_db()
+    assert storage.exists(recipe.image.name)
+
+
+@mark.usefixtures(
+    'add_recipe_to_reader_favorites',
+    'add_recipe_to_reader_shopping_cart',
+)
+def test_cached_recipe_keeps_viewer_fields(
+    author_client,
+    reader_client,
+    recipe_detail_url,
+):
+    author_data = author_client.get(recipe_detail_url).data
+    reader_data = reader_client.get(recipe_detail_url).data
+    assert not author_data['is_favorited']
+    assert not author_data['is_in_shopping_cart']
+    assert reader_data['is_favorited']
+    assert reader_data['is_in_shopping_cart']
+    assert reader_data['name'] == author_data['name']
+
+
+def test_cached_recipe_invalidated_on_update(
+    author_client,
+    recipe_detail_url,
+    new_recipe_data,
+):
+    author_client.get(recipe_detail_url)
+    author_client.patch(recipe_detail_url, data=new_recipe_data, format='json')
+    assert (
+        author_client.get(recipe_detail_url).data['name']
+        == new_recipe_data['name']
+    )
+
+
+def test_cached_recipe_invalidated_on_author_avatar_change(
+    author_client,
+    recipe_detail_url,
+    avatar_url,
+):
+    response = author_client.get(recipe_detail_url)
+    assert response.data['author']['avatar'] is None
+    author_client.put(avatar_url, data=NEW_AVATAR_DATA, format='json')
+    assert author_client.get(recipe_detail_url).data['author']['avatar']
+
+
+def test_cached_recipe_urls_built_for_every_host(
+    reader_client,
+    recipe_detail_url,
+):
+    reader_client.get(recipe_detail_url, HTTP_HOST='localhost')
+    data = reader_client.get(recipe_detail_url, HTTP_HOST='127.0.0.1').data
+    assert data['image'].startswith('http://127.0.0.1/')
+    assert all(
+        srcset.startswith('http://127.0.0.1/')
+        for srcset in data['image_srcset'].values()
+    )
+
+
+def test_recipe_not_cached_without_shared_cache(
+    settings,
+    reader_client,
+    recipe,
+    recipe_detail_url,
+):
+    settings.SHARED_CACHE = False
+    reader_client.get(recipe_detail_url)
+    # Changed by another process, which can not drop caches of this one
+    Recipe.objects.filter(id=recipe.id).update(name='Renamed')
+    assert reader_client.get(recipe_detail_url).data['name'] == 'Renamed'
+
+
+@mark.parametrize(
+    ('url'),
+    (
+        lf('tag_list_url'),
+        lf('tag_detail_url'),
+        lf('ingredient_list_url'),
+        lf('ingredient_detail_url'),
+        lf('recipe_list_url'),
+        lf('recipe_detail_url'),
+    ),
+)
+def test_conditional_get_not_modified(reader_client, url):
+    response = reader_client.get(url)
+    assert response.status_code == HTTP_200_OK
+    assert (etag := response.headers['ETag'])
+    response = reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert not response.content
+
+
+@mark.parametrize(('url'), (lf('recipe_list_url'), lf('recipe_detail_url')))
+def test_viewer_dependent_get_unconditional_without_shared_cache(
+    settings,
+    reader_client,
+    anon_client,
+    url,
+):
+    settings.SHARED_CACHE = False
+    assert 'ETag' not in reader_client.get(url).headers
+    assert 'ETag' in anon_client.get(url).headers
+
+
+@mark.parametrize(
+    ('url'),
+    (
+        lf('tag_list_url'),
+        lf('tag_detail_url'),
+        lf('ingredient_list_url'),
+        lf('ingredient_detail_url'),
+    ),
+)
+def test_catalog_served_from_snapshot(anon_client, url):
+    expected_data = anon_client.get(url).data
+    with CaptureQueriesContext(connection) as context:
+        response = anon_client.get(url)
+    assert len(context) == 0
+    assert response.json() == expected_data
+    assert 'max-age' in response.headers['Cache-Control']
+
+
+def test_catalog_snapshot_updated_on_change(anon_client, tag, tag_list_url):
+    etag = anon_client.get(tag_list_url).headers['ETag']
+    tag.name = 'Renamed tag'
+    tag.save()
+    response = anon_client.get(tag_list_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTP_200_OK
+    assert response.headers['ETag'] != etag
+    assert response.json()[0]['name'] == 'Renamed tag'
+
+
+def test_catalog_changes_by_other_processes_seen_without_shared_cache(
+    settings,
+    monkeypatch,
+    anon_client,
+    tag,
+    tag_list_url,
+):
+    settings.SHARED_CACHE = False
+    monkeypatch.setattr(recipes_cache, 'LOCAL_CATALOG_VERSION_TIMEOUT', 0)
+    # Version stored by the fixtures never expires
+    cache.clear()
+    response = anon_client.get(tag_list_url)
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+    # Saved by another process, whose bump does not reach this one
+    Tag.objects.filter(id=tag.id).update(name='Renamed tag')
+    response = anon_client.get(tag_list_url)
+    assert response.json()[0]['name'] == 'Renamed tag'
+
+
+@mark.usefixtures('recipe')
+@mark.parametrize(
+    ('url'),
+    (
+        lf('recipe_list_url'),
+        lf('recipe_detail_url'),
+    ),
+)
+def test_conditional_get_if_modified_since(reader_client, url):
+    last_modified = reader_client.get(url).headers['Last-Modified']
+    response = reader_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+
+def test_recipe_etag_changes_on_update(
+    author_client,
+    recipe_detail_url,
+    new_recipe_data,
+):
+    etag = author_client.get(recipe_detail_url).headers['ETag']
+    author_client.patch(recipe_detail_url, data=new_recipe_data, format='json')
+    response = author_client.get(recipe_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTP_200_OK
+    assert response.headers['ETag'] != etag
+
+
+def test_recipe_etag_changes_on_favorite(
+    reader_client,
+    recipe_detail_url,
+    recipe_favorite_url,
+):
+    etag = reader_client.get(recipe_detail_url).headers['ETag']
+    reader_client.post(recipe_favorite_url)
+    response = reader_client.get(recipe_detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTP_200_OK
+    assert response.data['is_favorited']
+
+
 @mark.parametrize(
     ('url'),
     (
@@ -369,3 +1085,218 @@ def test_nonexistant_recipe_delete(
 )
 def test_get_nonexistant_object(reader_client, url):
     assert reader_client.get(url).status_code == HTTP_404_NOT_FOUND
+
+
+@mark.parametrize('client', (lf('anon_client'), lf('reader_client')))
+def test_get_recipe_with_non_numeric_id(client):
+    assert client.get('/api/recipes/abc/').status_code == HTTP_404_NOT_FOUND
+
+
+@mark.usefixtures(
+    'add_recipe_to_reader_favorites',
+    'add_recipe_to_reader_shopping_cart',
+)
+def test_counters_follow_recipe_create_and_delete(
+    author_client,
+    author_user,
+    recipe_detail_url,
+):
+    author_user.refresh_from_db()
+    assert author_user.recipes_count == 1
+    check_counters_consistent()
+
+    assert author_client.delete(recipe_detail_url).status_code == (
+        HTTP_204_NO_CONTENT
+    )
+    author_user.refresh_from_db()
+    assert author_user.recipes_count == 0
+    check_counters_consistent()
+
+
+@mark.usefixtures(
+    'create_many_recipes',
+    'add_random_recipes_to_reader_favorites',
+)
+def test_reconcile_counters_command():
+    Recipe.objects.update(favorited_count=F('favorited_count') + 1)
+    with raises(CommandError):
+        call_command('reconcile_counters', '--check', stdout=StringIO())
+    call_command('reconcile_counters', stdout=StringIO())
+    check_counters_consistent()
+
+
+@mark.usefixtures('sync_image_variants')
+def test_image_variants_generated_after_commit(
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            recipe_list_url, data=new_recipe_data, format='json'
+        )
+    assert response.status_code == HTTP_201_CREATED
+    # Rendered after the response, which points to the original meanwhile
+    assert response.data['image_srcset'] == {'gif': response.data['image']}
+
+    recipe_url = reverse('recipes-detail', args=[response.data['id']])
+    srcset = author_client.get(recipe_url).data['image_srcset']
+    assert list(srcset) == [
+        format.lower() for format in variant_formats('GIF')
+    ]
+    assert srcset['gif'].endswith('-1w.gif 1w')
+
+
+@mark.usefixtures('sync_image_variants')
+def test_stale_image_variants_ignored(
+    author_client,
+    recipe,
+    recipe_detail_url,
+    new_recipe_data,
+    django_capture_on_commit_callbacks,
+):
+    call_command('generate_image_variants', stdout=StringIO())
+    recipe.refresh_from_db()
+    old_variants = recipe.image_variants
+    assert old_variants['source'] == recipe.image.name
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        response = author_client.patch(
+            recipe_detail_url, data=new_recipe_data, format='json'
+        )
+    # New image is served as is until its variants are rendered
+    assert list(response.data['image_srcset'].values()) == [
+        response.data['image']
+    ]
+    for callback in callbacks:
+        callback()
+    recipe.refresh_from_db()
+    assert recipe.image_variants['source'] == recipe.image.name
+    collect_orphaned_blobs()
+    assert not any(
+        recipe.image.storage.exists(name)
+        for sizes in old_variants['formats'].values()
+        for _, name in sizes
+    )
+
+
+def test_image_variants_not_rendered_by_web_process(
+    author_client,
+    recipe_list_url,
+    new_recipe_data,
+    django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            recipe_list_url, data=new_recipe_data, format='json'
+        )
+    recipe = Recipe.objects.get(id=response.data['id'])
+    assert recipe.image_variants == {}
+
+    stdout = StringIO()
+    call_command('generate_image_variants', stdout=stdout)
+    assert 'recipes.Recipe.image: обработано записей: 1' in stdout.getvalue()
+    recipe.refresh_from_db()
+    assert recipe.image_variants['source'] == recipe.image.name
+
+    # Up to date rows are skipped
+    stdout = StringIO()
+    call_command('generate_image_variants', stdout=stdout)
+    assert 'recipes.Recipe.image: обработано записей: 0' in stdout.getvalue()
+
+
+def test_image_variants_not_wider_than_widths(recipe):
+    recipe.image.save('photo.png', ContentFile(_noise_png(1500, 100)))
+    call_command('generate_image_variants', stdout=StringIO())
+    recipe.refresh_from_db()
+    for sizes in recipe.image_variants['formats'].values():
+        assert [width for width, _ in sizes] == list(IMAGE_VARIANT_WIDTHS)
+
+
+def test_shared_image_deleted_with_last_reference(
+    author_user,
+    recipe,
+    reader_user,
+):
+    copy = create_recipe(
+        {
+            'name': 'copy',
+            'author': author_user,
+            'cooking_time': 1,
+            'text': 'Lorem ipsum',
+            'image': recipe.image.name,
+        },
+        [],
+        [],
+    )
+    # The same content as the avatar, stored once
+    assert recipe.image.name == copy.image.name == reader_user.avatar.name
+    storage = recipe.image.storage
+
+    recipe.delete()
+    reader_user.avatar.delete()
+    assert reader_user.avatar.name is None
+    assert storage.exists(copy.image.name)
+
+    copy.delete()
+    collect_orphaned_blobs()
+    assert not storage.exists(copy.image.name)
+
+
+def _noise_png(width: int, height: int) -> bytes:
+    content = BytesIO()
+    image = Image.frombytes(
+        'RGB', (width, height), os.urandom(width * height * 3)
+    )
+    image.save(content, 'PNG')
+    return content.getvalue()
+
+
+def test_reencode_images_dry_run_changes_nothing(recipe):
+    recipe.image.save('photo.png', ContentFile(_noise_png(300, 200)))
+    name = recipe.image.name
+    stdout = StringIO()
+    call_command('reencode_images', '--dry-run', '--workers=1', stdout=stdout)
+    assert 'recipes.Recipe.image: файлов: 1, будет заменено: 1' in (
+        stdout.getvalue()
+    )
+    recipe.refresh_from_db()
+    assert recipe.image.name == name
+    assert recipe.image.storage.exists(name)
+
+
+@mark.usefixtures('sync_image_variants')
+def test_reencode_images_resumes_from_checkpoint(
+    recipe,
+    tmp_path,
+    django_capture_on_commit_callbacks,
+):
+    recipe.image.save('photo.png', ContentFile(_noise_png(1200, 300)))
+    old_name = recipe.image.name
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    options = (
+        '--max-dimension=600',
+        '--workers=1',
+        f'--checkpoint={checkpoint}',
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('reencode_images', *options, stdout=StringIO())
+
+    recipe.refresh_from_db()
+    assert recipe.image.name.endswith('.jpg')
+    assert (recipe.image.width, recipe.image.height) == (600, 150)
+    assert recipe.image_variants['source'] == recipe.image.name
+    collect_orphaned_blobs()
+    assert not recipe.image.storage.exists(old_name)
+
+    stdout = StringIO()
+    call_command('reencode_images', *options, stdout=stdout)
+    assert 'recipes.Recipe.image: файлов: 0' in stdout.getvalue()
+    with raises(CommandError):
+        call_command(
+            'reencode_images',
+            '--quality=50',
+            f'--checkpoint={checkpoint}',
+            stdout=StringIO(),
+        )
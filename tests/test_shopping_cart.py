@@ -1,7 +1,15 @@
+import gzip
+import json
 import re
+from io import StringIO
 
 import jsonschema
-from pytest import lazy_fixture as lf, mark
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from pytest import lazy_fixture as lf, mark, raises
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
@@ -10,11 +18,17 @@ from rest_framework.status import (
     HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND,
 )
+from shopping_cart.models import ShoppingCartRecipe, ShoppingListItem
 
 from common.util import contains_duplicates
+from recipes.models import Recipe
 
 from .const import SHOPPING_LIST_REGEX, SHORT_RECIPE_SCHEMA
-from .util import parse_shopping_list
+from .util import (
+    check_counters_consistent,
+    check_shopping_totals_consistent,
+    parse_shopping_list,
+)
 
 
 def test_can_add_recipe_to_cart(
@@ -25,7 +39,7 @@ def test_can_add_recipe_to_cart(
     response = reader_client.post(recipe_shopping_cart_url)
     assert response.status_code == HTTP_201_CREATED
     jsonschema.validate(response.data, SHORT_RECIPE_SCHEMA)
-    assert recipe in reader_client.user.shopping_cart.recipes.all()
+    assert recipe.in_shopping_carts.filter(user=reader_client.user).exists()
 
 
 @mark.usefixtures('add_recipe_to_reader_shopping_cart')
@@ -36,7 +50,9 @@ def test_can_remove_recipe_from_cart(
 ):
     response = reader_client.delete(recipe_shopping_cart_url)
     assert response.status_code == HTTP_204_NO_CONTENT
-    assert recipe not in reader_client.user.shopping_cart.recipes.all()
+    assert not recipe.in_shopping_carts.filter(
+        user=reader_client.user
+    ).exists()
 
 
 @mark.usefixtures('add_recipe_to_reader_shopping_cart')
@@ -46,7 +62,7 @@ def test_cannot_add_to_cart_twice(reader_client, recipe_shopping_cart_url):
         == HTTP_400_BAD_REQUEST
     )
     assert not contains_duplicates(
-        reader_client.user.shopping_cart.recipes.all()
+        Recipe.objects.filter(in_shopping_carts__user=reader_client.user)
     )
 
 
@@ -115,6 +131,21 @@ def test_can_download_shopping_list(
     assert response.headers['Content-Type'] == 'text/plain; charset=UTF-8'
 
 
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+def test_txt_shopping_list_lines_separated(
+    reader_client,
+    download_shopping_cart_url,
+):
+    content = reader_client.get(download_shopping_cart_url).getvalue()
+    assert not content.endswith(b'\n')
+    assert len(content.splitlines()) == len(
+        parse_shopping_list(content.decode())
+    )
+
+
 @mark.usefixtures(
     'create_recipes_with_overlapping_ingredients',
     'add_all_recipes_to_reader_shopping_cart',
@@ -125,7 +156,7 @@ def test_shopping_list_is_valid(
 ):
     assert re.search(
         SHOPPING_LIST_REGEX,
-        reader_client.get(download_shopping_cart_url).content.decode(),
+        reader_client.get(download_shopping_cart_url).getvalue().decode(),
     )
 
 
@@ -138,7 +169,7 @@ def test_ingredients_are_summed_up(
     download_shopping_cart_url,
 ):
     ingredients_with_amounts = parse_shopping_list(
-        reader_client.get(download_shopping_cart_url).content.decode()
+        reader_client.get(download_shopping_cart_url).getvalue().decode()
     )
     assert not contains_duplicates(
         ingredients_with_amounts, key=lambda x: x[0]
@@ -149,6 +180,198 @@ def test_ingredients_are_summed_up(
     )
 
 
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+def test_shopping_list_is_sorted_by_name(
+    reader_client,
+    download_shopping_cart_url,
+):
+    names = [
+        name
+        for name, _ in parse_shopping_list(
+            reader_client.get(download_shopping_cart_url).getvalue().decode()
+        )
+    ]
+    assert names == sorted(names)
+
+
+@mark.usefixtures('create_recipes_with_overlapping_ingredients')
+def test_shopping_list_query_count_is_constant(
+    reader_client,
+    download_shopping_cart_url,
+):
+    query_counts = []
+    for recipes in (Recipe.objects.all()[:1], Recipe.objects.all()):
+        ShoppingCartRecipe.objects.filter(user=reader_client.user).delete()
+        for recipe in recipes:
+            ShoppingCartRecipe.objects.create(
+                user=reader_client.user, recipe=recipe
+            )
+        with CaptureQueriesContext(connection) as context:
+            reader_client.get(download_shopping_cart_url)
+        query_counts.append(len(context))
+    assert query_counts[0] == query_counts[1]
+
+
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+@mark.parametrize(
+    ('export_format', 'content_type', 'filename'),
+    (
+        ('txt', 'text/plain', 'shopping_list.txt'),
+        ('csv', 'text/csv', 'shopping_list.csv'),
+        ('markdown', 'text/markdown', 'shopping_list.md'),
+        ('jsonl', 'application/x-ndjson', 'shopping_list.jsonl'),
+    ),
+)
+def test_shopping_list_export_formats(
+    reader_client,
+    download_shopping_cart_url,
+    export_format,
+    content_type,
+    filename,
+):
+    response = reader_client.get(
+        download_shopping_cart_url, {'format': export_format}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.streaming
+    assert response.headers['Content-Type'] == (
+        f'{content_type}; charset=UTF-8'
+    )
+    assert filename in response.headers['Content-Disposition']
+    assert response.getvalue()
+
+
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+def test_shopping_list_jsonl_matches_text(
+    reader_client,
+    download_shopping_cart_url,
+):
+    text_rows = parse_shopping_list(
+        reader_client.get(download_shopping_cart_url).getvalue().decode()
+    )
+    jsonl = reader_client.get(download_shopping_cart_url, {'format': 'jsonl'})
+    json_rows = [
+        (row['name'], row['amount'])
+        for row in map(json.loads, jsonl.getvalue().decode().splitlines())
+    ]
+    assert json_rows == text_rows
+
+
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+def test_shopping_list_gzip(reader_client, download_shopping_cart_url):
+    plain = reader_client.get(download_shopping_cart_url).getvalue()
+    response = reader_client.get(
+        download_shopping_cart_url, HTTP_ACCEPT_ENCODING='gzip'
+    )
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.getvalue()) == plain
+
+
+def test_shopping_list_unknown_format(
+    reader_client,
+    download_shopping_cart_url,
+):
+    response = reader_client.get(
+        download_shopping_cart_url, {'format': 'docx'}
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@mark.usefixtures('create_recipes_with_overlapping_ingredients')
+def test_shopping_totals_follow_cart_changes(reader_client):
+    recipes = list(Recipe.objects.all())
+    for recipe in recipes:
+        reader_client.post(
+            reverse('recipes-shopping-cart', kwargs={'pk': recipe.id})
+        )
+    assert ShoppingListItem.objects.filter(user=reader_client.user).exists()
+    check_shopping_totals_consistent()
+    check_counters_consistent()
+
+    reader_client.delete(
+        reverse('recipes-shopping-cart', kwargs={'pk': recipes[0].id})
+    )
+    check_shopping_totals_consistent()
+
+    recipes[1].in_shopping_carts.all().delete()
+    check_shopping_totals_consistent()
+
+    reader_client.user.shopping_cart_recipes.all().delete()
+    assert not ShoppingListItem.objects.exists()
+    check_counters_consistent()
+
+
+@mark.usefixtures('add_recipe_to_reader_shopping_cart')
+def test_shopping_totals_follow_recipe_update(
+    author_client,
+    recipe_detail_url,
+    new_recipe_data,
+):
+    response = author_client.patch(
+        recipe_detail_url,
+        data=new_recipe_data,
+        format='json',
+    )
+    assert response.status_code == HTTP_200_OK
+    check_shopping_totals_consistent()
+
+
+@mark.usefixtures('add_recipe_to_reader_shopping_cart')
+def test_shopping_totals_follow_recipe_delete(recipe):
+    assert ShoppingListItem.objects.exists()
+    recipe.delete()
+    assert not ShoppingListItem.objects.exists()
+
+
+def test_recipe_delete_updates_totals_once(recipe, reader_user):
+    for user in (recipe.author, reader_user):
+        ShoppingCartRecipe.objects.create(user=user, recipe=recipe)
+    with CaptureQueriesContext(connection) as context:
+        recipe.delete()
+    assert not ShoppingListItem.objects.exists()
+    totals_queries = [
+        query
+        for query in context.captured_queries
+        if ShoppingListItem._meta.db_table in query['sql']
+    ]
+    # Update and delete of emptied items
+    assert len(totals_queries) == 2
+
+
+@mark.usefixtures('create_recipes_with_overlapping_ingredients')
+def test_shopping_totals_follow_single_cart_row_delete(reader_user):
+    for recipe in Recipe.objects.all():
+        ShoppingCartRecipe.objects.create(user=reader_user, recipe=recipe)
+    ShoppingCartRecipe.objects.first().delete()
+    check_shopping_totals_consistent()
+
+
+@mark.usefixtures(
+    'create_recipes_with_overlapping_ingredients',
+    'add_all_recipes_to_reader_shopping_cart',
+)
+def test_rebuild_shopping_totals_command():
+    ShoppingListItem.objects.filter(
+        id=ShoppingListItem.objects.first().id
+    ).update(amount=F('amount') + 1)
+    with raises(CommandError):
+        call_command('rebuild_shopping_totals', '--check', stdout=StringIO())
+    call_command('rebuild_shopping_totals', stdout=StringIO())
+    check_shopping_totals_consistent()
+
+
 @mark.parametrize(('method'), ('POST', 'DELETE'))
 def test_shopping_cart_nonexistant_recipe(
     reader_client,
@@ -1,5 +1,11 @@
+from io import StringIO
+
 import jsonschema
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from pytest import lazy_fixture as lf, mark
 from rest_framework.status import (
     HTTP_200_OK,
@@ -9,9 +15,19 @@ from rest_framework.status import (
     HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND,
 )
+from subscriptions import feed
+from subscriptions.const import FEED_STRATEGY_READ, FEED_STRATEGY_WRITE
+from subscriptions.models import FeedEntry
+
+from .const import NEW_AVATAR_DATA, SOME_IMAGE, SUBSCRIPTION_USER_SCHEMA
+from .util import (
+    check_counters_consistent,
+    check_different_pages,
+    check_response_is_paginated,
+    create_recipe,
+)
 
-from .const import SUBSCRIPTION_USER_SCHEMA
-from .util import check_different_pages, check_response_is_paginated
+User = get_user_model()
 
 
 @mark.parametrize(
@@ -93,6 +109,54 @@ def test_limit_recipes_count_in_subscription_list(
     assert len(response.data['results'][0]['recipes']) <= limit
 
 
+@mark.usefixtures('subscribe_reader_to_author', 'create_many_recipes')
+def test_subscription_list_shows_most_recent_recipes(
+    reader_client,
+    subscription_list_url,
+    author_user,
+):
+    response = reader_client.get(subscription_list_url, {'recipes_limit': 3})
+    author_data = response.data['results'][0]
+    assert [recipe['id'] for recipe in author_data['recipes']] == list(
+        author_user.recipes.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )[:3]
+    )
+    assert author_data['recipes_count'] == author_user.recipes.count()
+
+
+@mark.usefixtures('add_many_subscriptions')
+def test_subscription_list_query_count_is_constant(
+    reader_client,
+    subscription_list_url,
+):
+    for author in User.objects.filter(subscribers__user=reader_client.user):
+        for i in range(3):
+            create_recipe(
+                {
+                    'name': f'recipe {i}',
+                    'author': author,
+                    'cooking_time': 1,
+                    'text': 'Lorem ipsum',
+                    'image': SOME_IMAGE,
+                },
+                [],
+                [],
+            )
+
+    query_counts = []
+    for limit in (1, 10):
+        with CaptureQueriesContext(connection) as context:
+            response = reader_client.get(
+                subscription_list_url, {'limit': limit, 'recipes_limit': 2}
+            )
+        assert all(
+            len(author['recipes']) == 2 for author in response.data['results']
+        )
+        query_counts.append(len(context))
+    assert query_counts[0] == query_counts[1]
+
+
 def test_anon_cannot_subscribe(anon_client, author_subscribe_url):
     assert (
         anon_client.post(author_subscribe_url).status_code
@@ -114,7 +178,7 @@ def test_user_can_subscribe_to_someone(
 ):
     response = reader_client.post(author_subscribe_url)
     assert response.status_code == HTTP_201_CREATED
-    assert author_user in reader_client.user.subscription_list.users.all()
+    assert author_user.subscribers.filter(user=reader_client.user).exists()
 
 
 @mark.usefixtures('subscribe_reader_to_author')
@@ -125,7 +189,7 @@ def test_user_can_unsubscribe_from_someone(
 ):
     response = reader_client.delete(author_subscribe_url)
     assert response.status_code == HTTP_204_NO_CONTENT
-    assert author_user not in reader_client.user.subscription_list.users.all()
+    assert not author_user.subscribers.filter(user=reader_client.user).exists()
 
 
 def test_user_cannot_subscribe_to_themselves(
@@ -134,9 +198,8 @@ def test_user_cannot_subscribe_to_themselves(
 ):
     response = reader_client.post(reader_subscribe_url)
     assert response.status_code == HTTP_400_BAD_REQUEST
-    assert (
-        reader_client.user
-        not in reader_client.user.subscription_list.users.all()
+    assert reader_client.user not in User.objects.filter(
+        subscribers__user=reader_client.user
     )
 
 
@@ -145,20 +208,20 @@ def test_user_cannot_subscribe_twice(
     reader_client,
     author_subscribe_url,
 ):
-    assert reader_client.user.subscription_list.users.count() == 1
+    assert reader_client.user.subscriptions.count() == 1
     response = reader_client.post(author_subscribe_url)
     assert response.status_code == HTTP_400_BAD_REQUEST
-    assert reader_client.user.subscription_list.users.count() == 1
+    assert reader_client.user.subscriptions.count() == 1
 
 
 def test_user_cannot_unsubscribe_when_not_subscribed(
     reader_client,
     author_subscribe_url,
 ):
-    assert reader_client.user.subscription_list.users.count() == 0
+    assert reader_client.user.subscriptions.count() == 0
     response = reader_client.delete(author_subscribe_url)
     assert response.status_code == HTTP_400_BAD_REQUEST
-    assert reader_client.user.subscription_list.users.count() == 0
+    assert reader_client.user.subscriptions.count() == 0
 
 
 @mark.parametrize(
@@ -189,3 +252,203 @@ def test_subcribe_nonexistant_user(
         ).status_code
         == HTTP_404_NOT_FOUND
     )
+
+
+@mark.usefixtures('recipe')
+def test_counters_follow_subscriptions(
+    reader_client,
+    author_user,
+    author_subscribe_url,
+):
+    response = reader_client.post(author_subscribe_url)
+    assert response.data['recipes_count'] == 1
+    author_user.refresh_from_db()
+    assert author_user.followers_count == 1
+
+    reader_client.user.delete()
+    author_user.refresh_from_db()
+    assert author_user.followers_count == 0
+    check_counters_consistent()
+
+
+def test_stale_user_save_keeps_followers_count(
+    reader_client,
+    author_client,
+    author_subscribe_url,
+    avatar_url,
+):
+    # author_client.user was read before the subscription
+    reader_client.post(author_subscribe_url)
+    response = author_client.put(
+        avatar_url,
+        data=NEW_AVATAR_DATA,
+        format='json',
+    )
+    assert response.status_code == HTTP_200_OK
+    author_client.user.refresh_from_db()
+    assert author_client.user.followers_count == 1
+    check_counters_consistent()
+
+
+def _feed_ids(client, url: str) -> list[int]:
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == HTTP_200_OK
+        ids += [recipe['id'] for recipe in response.data['results']]
+        url = response.data['next']
+    return ids
+
+
+def _create_author_recipes(author, count: int) -> None:
+    for i in range(count):
+        create_recipe(
+            {
+                'name': f'recipe {i}',
+                'author': author,
+                'cooking_time': 1,
+                'text': 'Lorem ipsum',
+                'image': SOME_IMAGE,
+            },
+            [],
+            [],
+        )
+
+
+def _expected_feed_ids(author) -> list[int]:
+    return list(
+        author.recipes.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )
+    )
+
+
+def test_anon_cannot_read_feed(anon_client, subscription_feed_url):
+    assert (
+        anon_client.get(subscription_feed_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+@mark.usefixtures(
+    'feed_strategy',
+    'subscribe_reader_to_author',
+    'create_many_recipes',
+)
+def test_feed_lists_recipes_of_followed_authors(
+    reader_client,
+    author_user,
+    subscription_feed_url,
+):
+    _create_author_recipes(author_user, 3)
+    response = reader_client.get(subscription_feed_url, {'limit': 2})
+    assert 'count' not in response.data
+    assert 'cursor=' in response.data['next']
+    assert _feed_ids(
+        reader_client, subscription_feed_url + '?limit=2'
+    ) == _expected_feed_ids(author_user)
+
+
+@mark.usefixtures('feed_strategy', 'create_many_recipes')
+def test_feed_follows_subscription_changes(
+    reader_client,
+    author_user,
+    author_subscribe_url,
+    subscription_feed_url,
+):
+    assert reader_client.post(author_subscribe_url).status_code == (
+        HTTP_201_CREATED
+    )
+    assert _feed_ids(
+        reader_client, subscription_feed_url
+    ) == _expected_feed_ids(author_user)
+
+    reader_client.delete(author_subscribe_url)
+    assert _feed_ids(reader_client, subscription_feed_url) == []
+
+
+@mark.usefixtures('subscribe_reader_to_author', 'create_many_recipes')
+def test_feed_inbox_is_paged_by_its_own_index(
+    settings,
+    reader_client,
+    author_user,
+    subscription_feed_url,
+):
+    settings.SUBSCRIPTION_FEED_STRATEGY = FEED_STRATEGY_WRITE
+    _create_author_recipes(author_user, 3)
+    next_url = reader_client.get(subscription_feed_url, {'limit': 2}).data[
+        'next'
+    ]
+    with CaptureQueriesContext(connection) as context:
+        assert reader_client.get(next_url).status_code == HTTP_200_OK
+    entry_table = FeedEntry._meta.db_table
+    page_sql = next(
+        query['sql']
+        for query in context.captured_queries
+        if f'"{entry_table}"' in query['sql']
+    )
+    # Sought and ordered by the copied publication date, not the recipe's
+    assert f'"{entry_table}"."pub_date" < ' in page_sql
+    assert f'"{entry_table}"."pub_date" AS "feed_pub_date"' in page_sql
+    assert 'ORDER BY "feed_pub_date" DESC' in page_sql
+
+
+@mark.usefixtures('subscribe_reader_to_author')
+def test_feed_inbox_is_capped(
+    settings,
+    monkeypatch,
+    reader_client,
+    author_user,
+    subscription_feed_url,
+    create_many_recipes,
+):
+    settings.SUBSCRIPTION_FEED_STRATEGY = FEED_STRATEGY_WRITE
+    monkeypatch.setattr(feed, 'FEED_INBOX_SIZE', 2)
+    monkeypatch.setattr(feed, 'FEED_INBOX_SLACK', 0)
+    _create_author_recipes(author_user, 3)
+    assert FeedEntry.objects.filter(user=reader_client.user).count() == 2
+    assert (
+        _feed_ids(reader_client, subscription_feed_url)
+        == _expected_feed_ids(author_user)[:2]
+    )
+
+    call_command('rebuild_subscription_feeds', stdout=StringIO())
+    assert (
+        _feed_ids(reader_client, subscription_feed_url)
+        == _expected_feed_ids(author_user)[:2]
+    )
+
+
+@mark.usefixtures('subscribe_reader_to_author', 'create_many_recipes')
+def test_feed_merges_hot_authors_on_read(
+    settings,
+    monkeypatch,
+    reader_client,
+    author_user,
+    subscription_feed_url,
+):
+    settings.SUBSCRIPTION_FEED_STRATEGY = FEED_STRATEGY_WRITE
+    monkeypatch.setattr(feed, 'FEED_FANOUT_MAX_FOLLOWERS', 0)
+    call_command('rebuild_subscription_feeds', stdout=StringIO())
+    assert not FeedEntry.objects.exists()
+    assert _feed_ids(
+        reader_client, subscription_feed_url
+    ) == _expected_feed_ids(author_user)
+
+
+def test_benchmark_subscription_feed_command():
+    users_count = User.objects.count()
+    output = StringIO()
+    call_command(
+        'benchmark_subscription_feed',
+        authors=3,
+        followers=3,
+        follows=2,
+        recipes=3,
+        pages=2,
+        page_size=2,
+        readers=2,
+        stdout=output,
+    )
+    assert FEED_STRATEGY_READ in output.getvalue()
+    assert User.objects.count() == users_count
@@ -1,13 +1,24 @@
 import jsonschema
-from pytest import lazy_fixture as lf, mark
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pytest import lazy_fixture as lf, mark, raises
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_204_NO_CONTENT,
+    HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
+    HTTP_404_NOT_FOUND,
 )
+from rest_framework.test import APIClient
 
-from .const import NEW_AVATAR_DATA, USER_SCHEMA
-from .util import check_response_is_paginated
+from users import authentication, tokens
+from users.authentication import check_shared_cache, clear_cached_users
+from users.models import FoodgramUser
+
+from .const import ANOTHER_SMALL_GIF, NEW_AVATAR_DATA, USER_SCHEMA
+from .util import check_response_is_paginated, gif_upload
 
 
 @mark.parametrize(
@@ -50,6 +61,18 @@ def test_can_add_avatar(reader_client, avatar_url):
     assert reader_client.user.avatar is not old_avatar
 
 
+def test_can_add_avatar_with_multipart(reader_client, avatar_url):
+    old_avatar = reader_client.user.avatar.name
+    response = reader_client.put(
+        avatar_url,
+        data={'avatar': gif_upload(content=ANOTHER_SMALL_GIF)},
+        format='multipart',
+    )
+    assert response.status_code == HTTP_200_OK
+    reader_client.user.refresh_from_db()
+    assert reader_client.user.avatar.name != old_avatar
+
+
 def test_can_delete_avatar(reader_client, avatar_url):
     assert reader_client.user.avatar
     assert reader_client.delete(avatar_url).status_code == HTTP_204_NO_CONTENT
@@ -68,3 +91,340 @@ def test_anon_cannot_access_avatar_endpoints(
         == HTTP_401_UNAUTHORIZED
     )
     assert anon_client.delete(avatar_url).status_code == HTTP_401_UNAUTHORIZED
+
+
+def _queries_token(client, url) -> bool:
+    with CaptureQueriesContext(connection) as context:
+        assert client.get(url).status_code == HTTP_200_OK
+    return any(
+        'authtoken_token' in query['sql'] for query in context.captured_queries
+    )
+
+
+@mark.parametrize('shared_cache', (False, True))
+def test_token_user_is_cached(
+    settings,
+    reader_token_client,
+    current_user_url,
+    shared_cache,
+):
+    settings.AUTH_TOKEN_SHARED_CACHE = shared_cache
+    assert _queries_token(reader_token_client, current_user_url)
+    assert not _queries_token(reader_token_client, current_user_url)
+    if shared_cache:
+        # Another process finds the user in the shared cache
+        clear_cached_users()
+        assert not _queries_token(reader_token_client, current_user_url)
+
+
+@mark.parametrize('shared_cache', (False, True))
+def test_logout_revokes_cached_token(
+    settings,
+    reader_token_client,
+    current_user_url,
+    logout_url,
+    shared_cache,
+):
+    settings.AUTH_TOKEN_SHARED_CACHE = shared_cache
+    reader_token_client.get(current_user_url)
+    assert (
+        reader_token_client.post(logout_url).status_code == HTTP_204_NO_CONTENT
+    )
+    assert (
+        reader_token_client.get(current_user_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+def test_password_change_drops_cached_user(
+    reader_token_client,
+    current_user_url,
+    set_password_url,
+):
+    user = reader_token_client.user
+    user.set_password('old-Passw0rd')
+    user.save()
+    _queries_token(reader_token_client, current_user_url)
+    assert (
+        reader_token_client.post(
+            set_password_url,
+            data={
+                'current_password': 'old-Passw0rd',
+                'new_password': 'new-Passw0rd',
+            },
+        ).status_code
+        == HTTP_204_NO_CONTENT
+    )
+    assert _queries_token(reader_token_client, current_user_url)
+
+
+@mark.parametrize('shared_cache', (False, True))
+def test_deactivation_revokes_cached_token(
+    settings,
+    reader_token_client,
+    current_user_url,
+    shared_cache,
+):
+    settings.AUTH_TOKEN_SHARED_CACHE = shared_cache
+    reader_token_client.get(current_user_url)
+    user = reader_token_client.user
+    user.is_active = False
+    user.save()
+    assert (
+        reader_token_client.get(current_user_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+def test_deactivation_by_other_process_seen_without_shared_cache(
+    settings,
+    monkeypatch,
+    reader_token_client,
+    current_user_url,
+):
+    settings.SHARED_CACHE = False
+    settings.AUTH_TOKEN_SHARED_CACHE = False
+    monkeypatch.setattr(authentication, 'LOCAL_AUTH_TOKEN_CACHE_TTL', 0)
+    reader_token_client.get(current_user_url)
+    # Signals of another process do not reach this one
+    FoodgramUser.objects.filter(id=reader_token_client.user.id).update(
+        is_active=False
+    )
+    assert (
+        reader_token_client.get(current_user_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+def test_deletion_revokes_cached_token(reader_token_client, current_user_url):
+    reader_token_client.get(current_user_url)
+    reader_token_client.user.delete()
+    assert (
+        reader_token_client.get(current_user_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+def test_cached_user_refreshed_before_avatar_write(
+    reader_token_client,
+    current_user_url,
+    avatar_url,
+):
+    reader_token_client.get(current_user_url)
+    # Changed without signals, so the cached user is stale
+    revoked_at = timezone.now()
+    FoodgramUser.objects.filter(id=reader_token_client.user.id).update(
+        tokens_valid_after=revoked_at
+    )
+    response = reader_token_client.put(
+        avatar_url,
+        data=NEW_AVATAR_DATA,
+        format='json',
+    )
+    assert response.status_code == HTTP_200_OK
+    reader_token_client.user.refresh_from_db()
+    assert reader_token_client.user.tokens_valid_after == revoked_at
+
+
+def test_shared_token_cache_requires_shared_cache(settings):
+    settings.AUTH_TOKEN_SHARED_CACHE = True
+    settings.SHARED_CACHE = False
+    with raises(ImproperlyConfigured):
+        check_shared_cache()
+
+    settings.SHARED_CACHE = True
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    with raises(ImproperlyConfigured):
+        check_shared_cache()
+
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': ['memcached:11211'],
+        }
+    }
+    check_shared_cache()
+
+
+PASSWORD = 'Passw0rd-reader'
+
+
+def _login(client, login_url, user) -> dict:
+    user.set_password(PASSWORD)
+    user.save()
+    response = client.post(
+        login_url, data={'email': user.email, 'password': PASSWORD}
+    )
+    assert response.status_code == HTTP_200_OK
+    return response.data
+
+
+def _bearer_client(access_token: str) -> APIClient:
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+    return client
+
+
+def test_login_issues_only_opaque_token_by_default(
+    anon_client,
+    login_url,
+    reader_user,
+):
+    assert set(_login(anon_client, login_url, reader_user)) == {'auth_token'}
+
+
+@mark.usefixtures('signed_tokens')
+def test_signed_token_authenticates_without_db(
+    anon_client,
+    login_url,
+    current_user_url,
+    reader_user,
+):
+    data = _login(anon_client, login_url, reader_user)
+    assert set(data) == {'auth_token', 'access_token', 'refresh_token'}
+    client = _bearer_client(data['access_token'])
+    response = client.get(current_user_url)
+    assert response.status_code == HTTP_200_OK
+    assert response.data['id'] == reader_user.id
+    with CaptureQueriesContext(connection) as context:
+        assert client.get(current_user_url).status_code == HTTP_200_OK
+    assert not any(
+        'users_foodgramuser' in query['sql']
+        or 'authtoken_token' in query['sql']
+        for query in context.captured_queries
+    )
+    # The opaque token keeps working side by side
+    opaque_client = APIClient()
+    opaque_client.credentials(HTTP_AUTHORIZATION=f'Token {data["auth_token"]}')
+    assert opaque_client.get(current_user_url).status_code == HTTP_200_OK
+
+
+def test_signed_token_rejected_when_disabled(
+    settings,
+    reader_user,
+    current_user_url,
+):
+    token = tokens.issue_token(reader_user, tokens.ACCESS_TOKEN)
+    settings.SIGNED_AUTH_TOKENS = False
+    assert (
+        _bearer_client(token).get(current_user_url).status_code
+        == HTTP_401_UNAUTHORIZED
+    )
+
+
+@mark.usefixtures('signed_tokens')
+def test_invalid_signed_tokens_rejected(
+    monkeypatch,
+    reader_user,
+    current_user_url,
+):
+    access = tokens.issue_token(reader_user, tokens.ACCESS_TOKEN)
+    refresh = tokens.issue_token(reader_user, tokens.REFRESH_TOKEN)
+    monkeypatch.setitem(tokens.TOKEN_TTLS, tokens.ACCESS_TOKEN, -1)
+    expired = tokens.issue_token(reader_user, tokens.ACCESS_TOKEN)
+    for token in (access[:-1] + 'x', refresh, expired):
+        assert (
+            _bearer_client(token).get(current_user_url).status_code
+            == HTTP_401_UNAUTHORIZED
+        )
+
+
+@mark.usefixtures('signed_tokens')
+def test_refresh_issues_access_token(
+    anon_client,
+    token_refresh_url,
+    current_user_url,
+    reader_user,
+):
+    refresh = tokens.issue_token(reader_user, tokens.REFRESH_TOKEN)
+    response = anon_client.post(
+        token_refresh_url, data={'refresh_token': refresh}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert (
+        _bearer_client(response.data['access_token'])
+        .get(current_user_url)
+        .status_code
+        == HTTP_200_OK
+    )
+    access = tokens.issue_token(reader_user, tokens.ACCESS_TOKEN)
+    assert (
+        anon_client.post(
+            token_refresh_url, data={'refresh_token': access}
+        ).status_code
+        == HTTP_400_BAD_REQUEST
+    )
+
+
+def test_refresh_unavailable_when_disabled(
+    anon_client,
+    token_refresh_url,
+    reader_user,
+):
+    refresh = tokens.issue_token(reader_user, tokens.REFRESH_TOKEN)
+    assert (
+        anon_client.post(
+            token_refresh_url, data={'refresh_token': refresh}
+        ).status_code
+        == HTTP_404_NOT_FOUND
+    )
+
+
+@mark.usefixtures('signed_tokens')
+@mark.parametrize('shared_cache', (False, True))
+def test_logout_revokes_signed_tokens(
+    settings,
+    anon_client,
+    login_url,
+    logout_url,
+    token_refresh_url,
+    current_user_url,
+    reader_user,
+    shared_cache,
+):
+    settings.AUTH_TOKEN_SHARED_CACHE = shared_cache
+    data = _login(anon_client, login_url, reader_user)
+    client = _bearer_client(data['access_token'])
+    client.get(current_user_url)
+    assert client.post(logout_url).status_code == HTTP_204_NO_CONTENT
+    assert client.get(current_user_url).status_code == HTTP_401_UNAUTHORIZED
+    assert (
+        anon_client.post(
+            token_refresh_url, data={'refresh_token': data['refresh_token']}
+        ).status_code
+        == HTTP_400_BAD_REQUEST
+    )
+    # Logging in again issues valid tokens
+    data = _login(anon_client, login_url, reader_user)
+    assert (
+        _bearer_client(data['access_token']).get(current_user_url).status_code
+        == HTTP_200_OK
+    )
+
+
+@mark.usefixtures('signed_tokens')
+def test_password_change_revokes_signed_tokens(
+    anon_client,
+    login_url,
+    set_password_url,
+    current_user_url,
+    reader_user,
+):
+    client = _bearer_client(
+        _login(anon_client, login_url, reader_user)['access_token']
+    )
+    assert (
+        client.post(
+            set_password_url,
+            data={
+                'current_password': PASSWORD,
+                'new_password': 'new-Passw0rd',
+            },
+        ).status_code
+        == HTTP_204_NO_CONTENT
+    )
+    assert client.get(current_user_url).status_code == HTTP_401_UNAUTHORIZED
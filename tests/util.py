@@ -1,17 +1,25 @@
 import re
+from io import StringIO
 from typing import Iterable, Optional
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK
 from rest_framework.test import APIClient
+from shopping_cart.totals import (
+    compute_totals,
+    find_mismatches,
+    get_stored_totals,
+)
 
+from common.counters import COUNTERS, find_drift
 from common.util import contains_duplicates
 from recipes.models import Ingredient, Recipe, Tag
 
-from .const import SHOPPING_LIST_REGEX
+from .const import SHOPPING_LIST_REGEX, SMALL_GIF
 
 User = get_user_model()
 
@@ -28,6 +36,12 @@ def create_user(
     )
 
 
+def gif_upload(
+    name: str = 'upload.gif', content: bytes = SMALL_GIF
+) -> SimpleUploadedFile:
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
 def create_user_client(user: AbstractUser) -> APIClient:
     client = APIClient()
     client.force_authenticate(user)
@@ -131,3 +145,17 @@ def parse_shopping_list(shopping_list: str) -> list[tuple[str, int]]:
             shopping_list,
         )
     ]
+
+
+def check_shopping_totals_consistent() -> None:
+    assert not find_mismatches(compute_totals(), get_stored_totals())
+
+
+def check_counters_consistent() -> None:
+    for counter in COUNTERS:
+        assert not find_drift(counter).exists(), counter
+
+
+def collect_orphaned_blobs() -> None:
+    # Unused files are kept for a grace period after they are saved
+    call_command('collect_orphaned_blobs', '--grace=0', stdout=StringIO())